@@ -1,15 +1,34 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Any, Optional, Dict
+from typing import List, Any, Optional, Dict, Callable
 import os
 from bookbuy_agent import UserPersonalDetails, BookBuyAgentRunner
 from config import OPENAI_API_KEY, OPENAI_BASE_URL, LLM_MODEL
 from langchain_openai import ChatOpenAI
+from metrics import REGISTRY
+from find_and_buy_tools import price_flight
+from recommendation_tool import recommendation_flight
+from jobs import JobStore, QueueFullError
+from cache_backend import get_cache
 
 app = FastAPI()
 
+BATCH_MAX_ITEMS = 1000
+BATCH_MAX_CONCURRENCY = 8
+
+# Shared by every batch so the total number of concurrent agent runs stays bounded.
+_batch_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_CONCURRENCY, thread_name_prefix="batch-execute")
+
+job_store = JobStore()
+
 # Configure CORS - Allow ALL origins for Render deployment
 app.add_middleware(
     CORSMiddleware,
@@ -55,6 +74,72 @@ class ExecuteResponse(BaseModel):
     steps: List[Dict[str, Any]]
 
 
+class BatchExecuteRequest(BaseModel):
+    items: List[ExecuteRequest]
+    max_concurrency: int = BATCH_MAX_CONCURRENCY
+
+
+class JobCreatedResponse(BaseModel):
+    job_id: str
+    status: str
+
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str
+    created_at: float
+    started_at: Optional[float]
+    finished_at: Optional[float]
+    steps: List[Dict[str, Any]]
+    result: Optional[ExecuteResponse]
+
+
+@lru_cache(maxsize=None)
+def get_agent_llm() -> ChatOpenAI:
+    """Shared per process; each runner binds its tools on top of it."""
+    return ChatOpenAI(
+        model=LLM_MODEL,
+        api_key=OPENAI_API_KEY,
+        base_url=OPENAI_BASE_URL,
+        max_tokens=1024,
+        temperature=1,
+    )
+
+
+def run_execute_request(
+    request: ExecuteRequest,
+    on_step: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """Run the agent for one request and shape the result as an ExecuteResponse."""
+    steps = []
+    try:
+        user = UserPersonalDetails(
+            user_preferences=request.user_preferences,
+            disliked_titles=request.disliked_titles,
+            already_read_titles=request.already_read_titles,
+            address=request.address,
+            payment_token=request.payment_token
+        )
+
+        runner = BookBuyAgentRunner(get_agent_llm(), user)
+        result = runner.run(request.prompt, on_step=on_step)
+
+        return {
+            "status": result.get("status"),
+            "error": None,
+            "response": result.get("response"),
+            "steps": result.get("steps", []),
+        }
+
+    except Exception as e:
+        return {
+            "status": "error",
+            "error": str(e),
+            "response": None,
+            "steps": steps,
+        }
+
+
 # --- API Endpoints ---
 @app.get("/team_info", response_model=TeamInfo)
 async def get_team_info():
@@ -714,43 +799,111 @@ async def get_model_architecture():
         raise HTTPException(status_code=404, detail="Architecture diagram not found.")
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Per-stage latency histograms in the Prometheus text format."""
+    return PlainTextResponse(
+        REGISTRY.render_prometheus(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@app.get("/metrics/singleflight")
+async def get_singleflight_metrics():
+    """Per-key single-flight counts for the most recently seen keys."""
+    return {
+        flight.name: flight.key_stats()
+        for flight in (price_flight, recommendation_flight)
+    }
+
+
+@app.get("/metrics/cache")
+async def get_cache_metrics():
+    """Hit-rate stats per cache namespace for this worker."""
+    cache = get_cache()
+    return {"backend": type(cache).__name__, "namespaces": cache.stats()}
+
+
 @app.post("/execute", response_model=ExecuteResponse)
 async def execute_agent(request: ExecuteRequest):
-    steps = []
+    return await run_in_threadpool(run_execute_request, request)
+
+
+@app.post("/execute/batch")
+async def execute_batch(batch: BatchExecuteRequest):
+    """
+    Run many independent prompts with bounded concurrency.
+
+    Streams newline-delimited JSON: one {"index", "elapsed_ms", "result"} line per
+    item as it completes (result is an ExecuteResponse), then a final {"summary"} line.
+    """
+    if len(batch.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=422, detail=f"A batch can hold at most {BATCH_MAX_ITEMS} items.")
+
+    concurrency = max(1, min(batch.max_concurrency, BATCH_MAX_CONCURRENCY))
+
+    async def stream():
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(concurrency)
+        batch_start = time.perf_counter()
+
+        async def run_one(index: int, item: ExecuteRequest):
+            async with semaphore:
+                start = time.perf_counter()
+                result = await loop.run_in_executor(_batch_executor, run_execute_request, item)
+                return index, time.perf_counter() - start, result
+
+        tasks = [asyncio.create_task(run_one(i, item)) for i, item in enumerate(batch.items)]
+        statuses: Dict[str, int] = {}
+
+        for next_done in asyncio.as_completed(tasks):
+            index, elapsed, result = await next_done
+            statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+            line = {
+                "index": index,
+                "elapsed_ms": round(elapsed * 1000, 1),
+                "result": ExecuteResponse(**result).model_dump(),
+            }
+            yield json.dumps(line, ensure_ascii=False, default=str) + "\n"
+
+        total = time.perf_counter() - batch_start
+        summary = {
+            "items": len(batch.items),
+            "statuses": statuses,
+            "concurrency": concurrency,
+            "elapsed_s": round(total, 3),
+            "items_per_sec": round(len(batch.items) / total, 3) if total > 0 else None,
+        }
+        yield json.dumps({"summary": summary}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.post("/jobs", response_model=JobCreatedResponse, status_code=202)
+async def create_job(request: ExecuteRequest):
+    """Queue an agent run; poll GET /jobs/{job_id} for progress and the result."""
     try:
-        user = UserPersonalDetails(
-            user_preferences=request.user_preferences,
-            disliked_titles=request.disliked_titles,
-            already_read_titles=request.already_read_titles,
-            address=request.address,
-            payment_token=request.payment_token
+        job = job_store.submit(
+            request.model_dump(),
+            lambda payload, on_step: run_execute_request(ExecuteRequest(**payload), on_step),
         )
-
-        llm = ChatOpenAI(
-            model=LLM_MODEL,
-            api_key=OPENAI_API_KEY,
-            base_url=OPENAI_BASE_URL,
-            max_tokens=1024,
-            temperature=1,
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Job queue is full ({e}). Retry later.",
+            headers={"Retry-After": "5"},
         )
 
-        runner = BookBuyAgentRunner(llm, user)
-        result = runner.run(request.prompt)
+    return {"job_id": job.job_id, "status": job.status}
 
-        return {
-            "status": result.get("status"),
-            "error": None,
-            "response": result.get("response"),
-            "steps": result.get("steps", []),
-        }
 
-    except Exception as e:
-        return {
-            "status": "error",
-            "error": str(e),
-            "response": None,
-            "steps": steps,
-        }
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    """Job status, the steps recorded so far, and the ExecuteResponse once finished."""
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 
 if __name__ == "__main__":
@@ -0,0 +1,309 @@
+"""
+Offline end-to-end benchmark for the BookBuy agent.
+
+Every external service (LLM, embeddings, Pinecone, Supabase) is replaced with a
+deterministic fake from benchmarks/fakes.py, while shop search and buying go
+through the real mock_retailer served over HTTP.
+
+Usage (from the repository root):
+    python -m benchmarks.agent_benchmark --prompts requests.jsonl --runs 40 \
+        --concurrency 1,4,16 --llm-latency lognormal:600:0.4
+"""
+import argparse
+import json
+import math
+import os
+import secrets
+import socket
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Callable
+
+import requests
+import uvicorn
+from fastapi import FastAPI
+
+from benchmarks.fakes import install_fakes
+from cache_backend import CacheBackend, MemoryCache, NullCache, SQLiteCache, set_cache, get_cache
+from metrics import REGISTRY, STAGE_DURATION
+from user_personal_details import UserPersonalDetails
+
+DEFAULT_PROMPTS = [
+    {"prompt": "I want a cozy fantasy novel with dragons"},
+    {"prompt": "Buy me a biography of a famous scientist", "user_preferences": ["under 400 pages"]},
+    {"prompt": "Looking for a funny book for a teenager"},
+    {"prompt": "A history book about ancient Rome", "disliked_titles": ["The Twelve Caesars"]},
+    {"prompt": "Buy Outrageously Alice by Phyllis Reynolds Naylor"},
+]
+
+
+class StageTimer:
+    """
+    Collects exact per-stage samples from the metrics registry, keyed as
+    stage or stage:label (e.g. shop_search:fiction_boutique).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    def __call__(self, name: str, seconds: float, labels: Dict[str, str]) -> None:
+        if name != STAGE_DURATION:
+            return
+        stage = labels.pop("stage", name)
+        key = ":".join([stage] + [labels[k] for k in sorted(labels)])
+        with self._lock:
+            self.samples[key].append(seconds)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.samples = defaultdict(list)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+    }
+
+
+def load_prompts(path: Optional[str]) -> List[Dict[str, Any]]:
+    """Read ExecuteRequest-shaped JSON lines; lines without a prompt are skipped."""
+    prompts = []
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(record, dict) and record.get("prompt"):
+                    prompts.append(record)
+
+    if not prompts:
+        print(f"No prompts found in {path!r}, using the built-in sample prompts.")
+        return list(DEFAULT_PROMPTS)
+    return prompts
+
+
+def build_user(record: Dict[str, Any]) -> UserPersonalDetails:
+    """Build the user the same way agent_server does for an ExecuteRequest."""
+    return UserPersonalDetails(
+        user_preferences=record.get("user_preferences"),
+        disliked_titles=record.get("disliked_titles"),
+        already_read_titles=record.get("already_read_titles"),
+        address=record.get("address", "Technion, Haifa"),
+        payment_token=record.get("payment_token", "card123456"),
+    )
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def build_asgi_app() -> FastAPI:
+    """Return app.app, or the same /api + /mock mounts when the frontend is not built."""
+    try:
+        from app import app
+        return app
+    except RuntimeError as e:
+        print(f"app.py could not be imported ({e}); serving /api and /mock without the frontend.")
+        from agent_server import app as agent_app
+        from mock_retailer.main import app as mock_app
+
+        app = FastAPI()
+        app.mount("/api", agent_app)
+        app.mount("/mock", mock_app)
+        return app
+
+
+def start_server(app: FastAPI) -> str:
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def run_load(fn: Callable[[Dict[str, Any]], str], prompts: List[Dict[str, Any]], runs: int, concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    outcomes: Dict[str, int] = defaultdict(int)
+    lock = threading.Lock()
+
+    def one(i: int) -> None:
+        record = prompts[i % len(prompts)]
+        start = time.perf_counter()
+        try:
+            outcome = fn(record)
+        except Exception as e:
+            outcome = f"exception:{type(e).__name__}"
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            outcomes[outcome] += 1
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(runs)))
+    wall = time.perf_counter() - wall_start
+
+    return {
+        "concurrency": concurrency,
+        "runs": runs,
+        "wall_s": round(wall, 3),
+        "runs_per_sec": round(runs / wall, 2) if wall > 0 else 0.0,
+        "overall": summarize(latencies),
+        "outcomes": dict(outcomes),
+    }
+
+
+def _outcome(result: Dict[str, Any]) -> str:
+    if result.get("status") != "ok":
+        return "error"
+    return "purchased" if (result.get("response") or "").startswith("Success") else "no_purchase"
+
+
+def build_cache(kind: str, path: Optional[str] = None) -> CacheBackend:
+    if kind == "memory":
+        return MemoryCache()
+    if kind == "sqlite":
+        if path is None:
+            fd, path = tempfile.mkstemp(suffix=".sqlite3")
+            os.close(fd)
+        return SQLiteCache(path)
+    return NullCache()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prompts", default="requests.jsonl")
+    parser.add_argument("--runs", type=int, default=40, help="runs per concurrency level")
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--mode", choices=["runner", "asgi", "both"], default="both")
+    parser.add_argument("--llm-latency", default="lognormal:600:0.4")
+    parser.add_argument("--embedding-latency", default="lognormal:80:0.3")
+    parser.add_argument("--vector-latency", default="lognormal:60:0.3")
+    parser.add_argument("--reviews-latency", default="lognormal:40:0.3")
+    parser.add_argument(
+        "--shop-profiles",
+        default=None,
+        help='mock retailer profiles as JSON, e.g. \'{"mega_market1": {"latency": "const:2000", "timeout_rate": 0.1}}\'; '
+        "turns the best-offer fast path off so each shop is searched (deadline, hedging, breakers)",
+    )
+    parser.add_argument(
+        "--cache",
+        choices=["none", "memory", "sqlite"],
+        default="none",
+        help="cache backend; the default keeps every run paying the fake latencies",
+    )
+    parser.add_argument("--cache-path", default=None, help="SQLite file for --cache sqlite (default: a temp file)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json-out", default=None)
+    args = parser.parse_args()
+
+    set_cache(build_cache(args.cache, args.cache_path))
+
+    fake_llm, restore_fakes = install_fakes(
+        llm_latency=args.llm_latency,
+        embedding_latency=args.embedding_latency,
+        vector_latency=args.vector_latency,
+        reviews_latency=args.reviews_latency,
+        seed=args.seed,
+    )
+
+    import find_and_buy_tools
+    from bookbuy_agent import BookBuyAgentRunner
+
+    timer = StageTimer()
+    REGISTRY.add_observer(timer)
+
+    # The mock retailer's /admin endpoints are off unless it has a token.
+    admin_token = os.environ.setdefault("MOCK_RETAILER_ADMIN_TOKEN", secrets.token_hex(16))
+    admin_headers = {"X-Admin-Token": admin_token}
+    base_url = start_server(build_asgi_app())
+    # Stock bought by earlier benchmark runs would otherwise turn purchases into out-of-stock.
+    requests.post(f"{base_url}/mock/admin/restock", headers=admin_headers, timeout=30).raise_for_status()
+
+    if args.shop_profiles:
+        for shop_id, profile in json.loads(args.shop_profiles).items():
+            res = requests.put(f"{base_url}/mock/admin/profiles/{shop_id}", json=profile, headers=admin_headers, timeout=30)
+            res.raise_for_status()
+        # The profiles are there to exercise the per-shop sweep; one best-offer
+        # request would answer for every shop at once.
+        find_and_buy_tools.BEST_OFFER_FAST_PATH = False
+    find_and_buy_tools.RETAILER_API_URL = f"{base_url}/mock"
+
+    prompts = load_prompts(args.prompts)
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+
+    def run_direct(record: Dict[str, Any]) -> str:
+        runner = BookBuyAgentRunner(fake_llm(), build_user(record))
+        return _outcome(runner.run(record["prompt"]))
+
+    session = requests.Session()
+
+    def run_asgi(record: Dict[str, Any]) -> str:
+        res = session.post(f"{base_url}/api/execute", json=record, timeout=600)
+        res.raise_for_status()
+        return _outcome(res.json())
+
+    modes = {"runner": run_direct, "asgi": run_asgi}
+    selected = ["runner", "asgi"] if args.mode == "both" else [args.mode]
+
+    report = {"prompts": len(prompts), "results": []}
+    try:
+        for mode in selected:
+            for level in levels:
+                timer.reset()
+                result = run_load(modes[mode], prompts, args.runs, level)
+                result["mode"] = mode
+                result["stages"] = {stage: summarize(v) for stage, v in sorted(timer.samples.items())}
+                result["cache"] = get_cache().stats()
+                report["results"].append(result)
+                print_result(result)
+    finally:
+        REGISTRY.remove_observer(timer)
+        restore_fakes()
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.json_out}")
+
+
+def print_result(result: Dict[str, Any]) -> None:
+    overall = result["overall"]
+    print(
+        f"\n[{result['mode']}] concurrency={result['concurrency']} runs={result['runs']} "
+        f"runs/sec={result['runs_per_sec']} outcomes={result['outcomes']}"
+    )
+    print(f"  {'stage':<34}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, s in list(result["stages"].items()) + [("overall", overall)]:
+        print(f"  {stage:<34}{s['count']:>7}{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}")
+    for namespace, s in sorted(result.get("cache", {}).items()):
+        print(f"  cache {namespace:<28}hits={s['hits']} misses={s['misses']} hit_rate={s['hit_rate']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+QPS and recall of the local vector index with IVF lists (local_index.py) versus
+scanning every row, as the number of vectors grows.
+
+For every size it builds synthetic embeddings (see vector_quantization.py),
+trains int8 codes and IVF lists with sqrt(n) lists, then runs the same queries
+exhaustively and with each --nprobe. Recall@k is against exact float32 search;
+the "excluded" rows repeat the default probe with the 100 nearest titles of
+every query excluded, checking that filtering still returns k rows.
+
+Usage (from the repository root):
+    python -m benchmarks.ann_index --sizes 10000,100000,300000 --dim 384 --nprobe 1,4,16,64
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.vector_quantization import exact_neighbours, make_queries, synthetic_vectors
+from local_index import NPROBE, VECTORS_FILE, Int8Quantizer, IVFLists, LocalVectorIndex, top_rows
+
+
+def run(index: LocalVectorIndex, queries, truth, k: int, nprobe=None, excluded=None) -> dict:
+    hits = 0
+    returned = 0
+    start = time.perf_counter()
+    for i, q in enumerate(queries):
+        metadata_filter = {"title": {"$nin": excluded[i]}} if excluded else None
+        found = index.search(q, k=k, metadata_filter=metadata_filter, nprobe=nprobe)
+        hits += len({row for row, _ in found} & truth[i])
+        returned += len(found)
+    elapsed = time.perf_counter() - start
+    return {"qps": len(queries) / elapsed, "recall": hits / (k * len(queries)), "returned": returned / len(queries)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,300000")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--nprobe", default="1,4,16,64")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.5)
+    parser.add_argument("--k", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"  {'vectors':>9}{'lists':>7}{'search':>12}{'train s':>9}{'QPS':>9}{'recall':>9}{'returned':>10}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        vectors = synthetic_vectors(size, args.dim, seed=args.seed)
+        queries = make_queries(vectors, args.queries, args.noise, args.seed)
+        truth = exact_neighbours(vectors, queries, args.k)
+
+        # Exclude each query's 100 nearest rows (one title per row) and compare
+        # against exact search over the rest.
+        excluded_rows = [top_rows(vectors @ q, 100) for q in queries]
+        excluded = [[str(r) for r in rows] for rows in excluded_rows]
+        excluded_truth = []
+        for q, rows in zip(queries, excluded_rows):
+            scores = vectors @ q
+            scores[rows] = -np.inf
+            excluded_truth.append(set(top_rows(scores, args.k).tolist()))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            np.save(os.path.join(tmp, VECTORS_FILE), vectors)
+            mapped = np.load(os.path.join(tmp, VECTORS_FILE), mmap_mode="r")
+            metadatas = [{"title": str(i)} for i in range(size)]
+            index = LocalVectorIndex(mapped, [""] * size, metadatas, quantizer=Int8Quantizer.train(mapped))
+
+            r = run(index, queries, truth, args.k)
+            print(f"  {size:>9,}{'-':>7}{'all rows':>12}{'-':>9}{r['qps']:>9.0f}{r['recall']:>9.3f}{r['returned']:>10.1f}")
+
+            lists = int(np.sqrt(size))
+            start = time.perf_counter()
+            index.ivf = IVFLists.train(mapped, lists, seed=args.seed)
+            train_s = time.perf_counter() - start
+
+            for nprobe in (int(n) for n in args.nprobe.split(",")):
+                r = run(index, queries, truth, args.k, nprobe=nprobe)
+                print(f"  {size:>9,}{lists:>7}{f'nprobe={nprobe}':>12}{train_s:>9.1f}{r['qps']:>9.0f}{r['recall']:>9.3f}{r['returned']:>10.1f}")
+
+            r = run(index, queries, excluded_truth, args.k, nprobe=NPROBE, excluded=excluded)
+            print(f"  {size:>9,}{lists:>7}{'excluded':>12}{train_s:>9.1f}{r['qps']:>9.0f}{r['recall']:>9.3f}{r['returned']:>10.1f}")
+
+            del index, mapped
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Record real agent runs into a cassette, then replay them offline.
+
+Record (needs OpenAI/Pinecone/Supabase credentials and a running mock retailer):
+    python -m benchmarks.cassette_replay record --prompts requests.jsonl --cassette cassettes/prod.json
+
+Replay with the original vendor latencies, or with --latency-scale 0 to
+profile only our own overhead:
+    python -m benchmarks.cassette_replay replay --cassette cassettes/prod.json --latency-scale 0
+"""
+import argparse
+import time
+from typing import List, Dict, Any
+
+from benchmarks.agent_benchmark import StageTimer, load_prompts, build_user, summarize, print_result
+from cache_backend import NullCache, set_cache
+from cassette import Cassette, use_cassette
+from metrics import REGISTRY
+
+
+def record(prompts: List[Dict[str, Any]], path: str) -> None:
+    from bookbuy_agent import BookBuyAgentRunner
+
+    cassette = Cassette(path, mode="record")
+    with use_cassette(cassette) as agent_llm:
+        for item in prompts:
+            result = BookBuyAgentRunner(agent_llm(), build_user(item)).run(item["prompt"])
+            cassette.add_run(item, result)
+            print(f"recorded: {item['prompt'][:60]!r} -> {result.get('status')}")
+
+    cassette.save()
+    print(f"Wrote {len(cassette.interactions)} interactions for {len(cassette.runs)} runs to {path}")
+
+
+def replay(path: str, latency_scale: float) -> None:
+    from bookbuy_agent import BookBuyAgentRunner
+
+    cassette = Cassette(path, mode="replay", latency_scale=latency_scale)
+    timer = StageTimer()
+    REGISTRY.add_observer(timer)
+
+    latencies = []
+    mismatches = 0
+    wall_start = time.perf_counter()
+    try:
+        with use_cassette(cassette) as agent_llm:
+            for run in cassette.runs:
+                item = run["request"]
+                start = time.perf_counter()
+                result = BookBuyAgentRunner(agent_llm(), build_user(item)).run(item["prompt"])
+                latencies.append(time.perf_counter() - start)
+
+                if result.get("response") != run["result"].get("response"):
+                    mismatches += 1
+                    print(f"MISMATCH: {item['prompt'][:60]!r}: {result.get('error') or result.get('response')}")
+    finally:
+        REGISTRY.remove_observer(timer)
+    wall = time.perf_counter() - wall_start
+
+    print_result({
+        "mode": f"replay x{latency_scale}",
+        "concurrency": 1,
+        "runs": len(latencies),
+        "runs_per_sec": round(len(latencies) / wall, 2) if wall > 0 else 0.0,
+        "outcomes": {"matched": len(latencies) - mismatches, "mismatched": mismatches},
+        "overall": summarize(latencies),
+        "stages": {stage: summarize(v) for stage, v in sorted(timer.samples.items())},
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--cassette", required=True)
+    parser.add_argument("--prompts", default="requests.jsonl")
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    args = parser.parse_args()
+
+    # Cache hits would skip recorded calls (or, with a warm shared cache, miss them entirely).
+    set_cache(NullCache())
+
+    if args.mode == "record":
+        record(load_prompts(args.prompts), args.cassette)
+    else:
+        replay(args.cassette, args.latency_scale)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Memory and lookup-speed comparison of the mock retailer catalog representations.
+
+Builds one synthetic shop with --books titles as:
+  dict     - the original {title_lower: {"Title", "price", "stock", "categories", "quantity"}}
+  compact  - mock_retailer/compact_catalog.py (struct of arrays, one process)
+  shared   - mock_retailer/shared_catalog.py (memory-mapped file, shared by workers)
+
+Python heap usage is measured with tracemalloc after the structure is built;
+for the shared catalog the file size is what the page cache holds once for
+all workers.
+
+Usage (from the repository root):
+    python -m benchmarks.catalog_memory --books 1000000
+"""
+import argparse
+import gc
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+from mock_retailer.compact_catalog import CompactCatalog
+from mock_retailer.shared_catalog import build_shared_catalog, SharedCatalog
+
+CATEGORIES = [
+    "Fiction", "Juvenile Fiction", "History", "Biography & Autobiography", "Science",
+    "Business & Economics", "Religion", "Computers", "Poetry", "Cooking", "Education",
+]
+WORDS = ["the", "of", "a", "night", "river", "house", "last", "secret", "garden", "war", "king", "city",
+         "stone", "winter", "light", "shadow", "empire", "song", "road", "sea", "fire", "ghost", "daughter"]
+
+
+def synthetic_rows(count: int, seed: int = 0) -> Iterator[Tuple[str, float, int, str]]:
+    """(title, price, quantity, categories) rows; about 80% of the books are in stock."""
+    rng = random.Random(seed)
+    for i in range(count):
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 6))).title() + f" {i}"
+        quantity = rng.randint(1, 20) if rng.random() < 0.8 else 0
+        yield title, round(rng.uniform(20, 250), 2), quantity, rng.choice(CATEGORIES)
+
+
+def build_dict(rows: Iterable[Tuple[str, float, int, str]]) -> Dict[str, Dict[str, Any]]:
+    catalog = {}
+    for title, price, quantity, categories in rows:
+        catalog[title.lower()] = {
+            "Title": title,
+            "price": price,
+            "stock": quantity > 0,
+            "categories": categories,
+            "quantity": quantity,
+        }
+    return catalog
+
+
+def measure(name: str, build: Callable[[], Any], keys: List[str]) -> Dict[str, Any]:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    catalog = build()
+    build_seconds = time.perf_counter() - start
+    gc.collect()
+    heap_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for key in keys:
+        book = catalog.get(key)
+        _ = (book["Title"], book["price"], book["stock"], book["quantity"])
+    lookup_us = (time.perf_counter() - start) / len(keys) * 1e6
+
+    result = {
+        "name": name,
+        "books": len(catalog),
+        "heap_mb": heap_bytes / 2 ** 20,
+        "peak_mb": peak_bytes / 2 ** 20,
+        "build_s": build_seconds,
+        "lookup_us": lookup_us,
+    }
+    del catalog
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=1_000_000, help="books per shop")
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rows = list(synthetic_rows(args.books, args.seed))
+    rng = random.Random(args.seed)
+    keys = [rows[rng.randrange(len(rows))][0].lower() for _ in range(args.lookups)]
+
+    fd, path = tempfile.mkstemp(suffix=".bbcat")
+    os.close(fd)
+    try:
+        def build_shared():
+            build_shared_catalog(rows, path)
+            return SharedCatalog(path)
+
+        results = [
+            measure("dict", lambda: build_dict(rows), keys),
+            measure("compact", lambda: CompactCatalog.from_rows(rows), keys),
+        ]
+        shared = measure("shared", build_shared, keys)
+        # The build's temporary arrays are freed; what stays is the mapping itself.
+        shared["file_mb"] = os.path.getsize(path) / 2 ** 20
+        results.append(shared)
+    finally:
+        os.remove(path)
+
+    print(f"{args.books:,} books per shop")
+    print(f"  {'catalog':<10}{'heap MB':>10}{'peak MB':>10}{'file MB':>10}{'build s':>10}{'lookup us':>11}")
+    for r in results:
+        file_mb = f"{r['file_mb']:.1f}" if "file_mb" in r else "-"
+        print(
+            f"  {r['name']:<10}{r['heap_mb']:>10.1f}{r['peak_mb']:>10.1f}{file_mb:>10}"
+            f"{r['build_s']:>10.2f}{r['lookup_us']:>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Scale benchmark for the sharded mock retailer catalog (mock_retailer/sharding.py).
+
+For every catalog size and shard count it reports the load time (rows are
+generated once and streamed to the shards, which build in parallel), resident memory of the shard processes,
+and router lookup latency for single titles and for batches.
+
+Usage (from the repository root):
+    python -m benchmarks.catalog_scale --titles 1000000,5000000,10000000 --shards 1,4
+"""
+import argparse
+import functools
+import random
+import time
+from typing import Iterator, List, Tuple
+
+from benchmarks.agent_benchmark import percentile
+from benchmarks.catalog_memory import CATEGORIES, WORDS
+from mock_retailer.sharding import ShardedCatalogService
+
+
+def title_for(i: int) -> str:
+    n = len(WORDS)
+    return f"{WORDS[i % n]} {WORDS[(i // n) % n]} {WORDS[(i // (n * n)) % n]} volume {i}"
+
+
+def scale_rows(count: int) -> Iterator[Tuple[str, float, int, str]]:
+    """Cheap deterministic rows, so that generating 10M titles stays fast."""
+    for i in range(count):
+        yield title_for(i), 20 + (i * 7919 % 23000) / 100, 0 if i % 5 == 0 else 20, CATEGORIES[i % len(CATEGORIES)]
+
+
+def bench(titles: int, shards: int, lookups: int, batch: int, seed: int) -> dict:
+    start = time.perf_counter()
+    service = ShardedCatalogService({"scale": functools.partial(scale_rows, titles)}, shards=shards)
+    load_seconds = time.perf_counter() - start
+    try:
+        catalog = service.catalog("scale")
+        memory = service.memory()
+
+        rng = random.Random(seed)
+        keys = [title_for(rng.randrange(titles)) for _ in range(lookups)]
+
+        latencies: List[float] = []
+        for key in keys:
+            t = time.perf_counter()
+            book = catalog.get(key)
+            latencies.append(time.perf_counter() - t)
+            assert book is not None, key
+
+        t = time.perf_counter()
+        for i in range(0, len(keys), batch):
+            catalog.get_many(keys[i:i + batch])
+        batch_us = (time.perf_counter() - t) / len(keys) * 1e6
+    finally:
+        service.close()
+
+    return {
+        "titles": titles,
+        "shards": shards,
+        "load_s": load_seconds,
+        "memory_mb": sum(memory) / 2 ** 20,
+        "max_shard_mb": max(memory) / 2 ** 20,
+        "p50_us": percentile(latencies, 50) * 1e6,
+        "p99_us": percentile(latencies, 99) * 1e6,
+        "batch_us_per_title": batch_us,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--titles", default="1000000,5000000,10000000")
+    parser.add_argument("--shards", default="1,4")
+    parser.add_argument("--lookups", type=int, default=20_000)
+    parser.add_argument("--batch", type=int, default=100, help="titles per get_many() call")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"  {'titles':>11}{'shards':>8}{'load s':>9}{'RSS MB':>9}{'max shard':>11}"
+          f"{'p50 us':>9}{'p99 us':>9}{'batch us/title':>16}")
+    for titles in (int(t) for t in args.titles.split(",")):
+        for shards in (int(s) for s in args.shards.split(",")):
+            r = bench(titles, shards, args.lookups, args.batch, args.seed)
+            print(
+                f"  {r['titles']:>11,}{r['shards']:>8}{r['load_s']:>9.1f}{r['memory_mb']:>9.0f}"
+                f"{r['max_shard_mb']:>11.0f}{r['p50_us']:>9.1f}{r['p99_us']:>9.1f}{r['batch_us_per_title']:>16.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark of excluded-title filtering in recommendation_tool.search_excluding
+as exclusion lists grow from 10 to 10,000 titles.
+
+Modes:
+  server  - the whole list as a Pinecone $nin filter (the previous behaviour)
+  hybrid  - the newest EXCLUSION_SERVER_FILTER_MAX_TITLES server-side, the rest locally
+  local   - no server filter; over-fetch and filter everything locally
+
+The vector store is the offline FakeVectorStore over the mock retailer
+catalogs, wrapped in a simple cost model of a hosted index: a base latency plus
+a cost per KB of filter payload and per returned match (tunable below).
+Each exclusion list mixes the query's nearest books (a heavy reader has read
+many related books) with random catalog titles and titles outside the index.
+
+Usage (from the repository root):
+    python -m benchmarks.exclusion_filter --sizes 10,100,1000,10000
+"""
+import argparse
+import json
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+import recommendation_tool
+from benchmarks.agent_benchmark import DEFAULT_PROMPTS
+from benchmarks.fakes import FakeEmbeddings, FakeVectorStore, load_catalog_books
+from config import TOP_K_RETURN_BOOKS
+
+MODES = {"server": 10 ** 9, "hybrid": None, "local": 0}
+
+
+class CostModelStore:
+    """Adds modelled service time to every search of the wrapped store."""
+    def __init__(self, store: FakeVectorStore, base_ms: float, per_kb_ms: float, per_match_ms: float):
+        self.store = store
+        self.base_ms = base_ms
+        self.per_kb_ms = per_kb_ms
+        self.per_match_ms = per_match_ms
+        self.calls = 0
+        self.payload_bytes = 0
+
+    @property
+    def embeddings(self):
+        return self.store.embeddings
+
+    def similarity_search_by_vector_with_score(self, embedding, k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs):
+        payload = len(json.dumps(filter, ensure_ascii=False).encode("utf-8")) if filter else 0
+        self.calls += 1
+        self.payload_bytes += payload
+        time.sleep((self.base_ms + self.per_kb_ms * payload / 1024 + self.per_match_ms * k) / 1000.0)
+        return self.store.similarity_search_by_vector_with_score(embedding, k=k, filter=filter)
+
+
+def exclusion_list(store: FakeVectorStore, embedding: List[float], size: int, rng: random.Random) -> List[str]:
+    scores = store.matrix @ np.asarray(embedding, dtype=np.float32)
+    nearest = [store.docs[int(i)].metadata["title"] for i in np.argsort(-scores)[:max(1, size // 5)]]
+    titles = [d.metadata["title"] for d in store.docs]
+    random_titles = rng.sample(titles, min(len(titles), size // 2))
+    excluded = list(dict.fromkeys(nearest + random_titles))
+    excluded += [f"Unindexed Title {i}" for i in range(size - len(excluded))]
+    rng.shuffle(excluded)
+    return excluded[:size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,1000,10000")
+    parser.add_argument("--base-ms", type=float, default=30.0)
+    parser.add_argument("--per-kb-ms", type=float, default=0.5)
+    parser.add_argument("--per-match-ms", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    base_store = FakeVectorStore(load_catalog_books(), FakeEmbeddings())
+    prompts = [p["prompt"] for p in DEFAULT_PROMPTS]
+    embeddings = [base_store.embeddings.embed_query(p) for p in prompts]
+    hybrid_max = recommendation_tool.EXCLUSION_SERVER_FILTER_MAX_TITLES
+
+    print(f"{len(base_store.docs)} indexed books, k={TOP_K_RETURN_BOOKS}, {len(prompts)} queries per cell")
+    print(f"  {'excluded':>9}{'mode':>8}{'ms/query':>10}{'searches':>10}{'filter KB':>11}{'same as server':>16}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        rng = random.Random(args.seed + size)
+        lists = [exclusion_list(base_store, e, size, rng) for e in embeddings]
+        expected = None
+
+        for mode, server_max in MODES.items():
+            recommendation_tool.EXCLUSION_SERVER_FILTER_MAX_TITLES = hybrid_max if server_max is None else server_max
+            store = CostModelStore(base_store, args.base_ms, args.per_kb_ms, args.per_match_ms)
+
+            results = []
+            start = time.perf_counter()
+            for embedding, excluded in zip(embeddings, lists):
+                docs = recommendation_tool.search_excluding(store, embedding, excluded)
+                results.append([d.metadata["title"] for d, _ in docs])
+            elapsed_ms = (time.perf_counter() - start) * 1000 / len(prompts)
+
+            for titles, excluded in zip(results, lists):
+                assert not set(titles) & set(excluded), "excluded title returned"
+            if expected is None:
+                expected = results
+
+            print(
+                f"  {size:>9}{mode:>8}{elapsed_ms:>10.1f}{store.calls / len(prompts):>10.1f}"
+                f"{store.payload_bytes / len(prompts) / 1024:>11.1f}{str(results == expected):>16}"
+            )
+
+    recommendation_tool.EXCLUSION_SERVER_FILTER_MAX_TITLES = hybrid_max
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple, Callable
+
+import numpy as np
+import pandas as pd
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, ToolMessage, HumanMessage, SystemMessage
+
+from book_store import split_names
+from constraints import published_year
+from local_index import matches_filter
+
+CATALOG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mock_retailer", "catalogs")
+EMBEDDING_DIM = 256
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+class LatencyDistribution:
+    """
+    Seeded latency source used by every fake backend.
+
+    Spec strings (all values in milliseconds):
+      "none" | "const:MS" | "uniform:LO:HI" | "normal:MEAN:STD"
+      | "lognormal:MEDIAN:SIGMA" | "exp:MEAN"
+    """
+    def __init__(self, spec: str = "none", seed: int = 0):
+        self.spec = spec
+        parts = spec.split(":")
+        self.kind = parts[0].strip().lower()
+        self.params = [float(p) for p in parts[1:]]
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+        expected = {"none": 0, "const": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exp": 1}
+        if self.kind not in expected:
+            raise ValueError(f"Unknown latency distribution: {spec}")
+        if len(self.params) != expected[self.kind]:
+            raise ValueError(f"Latency distribution '{self.kind}' needs {expected[self.kind]} parameters: {spec}")
+
+    def sample_ms(self) -> float:
+        with self._lock:
+            if self.kind == "none":
+                return 0.0
+            if self.kind == "const":
+                return self.params[0]
+            if self.kind == "uniform":
+                return self._rng.uniform(self.params[0], self.params[1])
+            if self.kind == "normal":
+                return max(0.0, self._rng.gauss(self.params[0], self.params[1]))
+            if self.kind == "lognormal":
+                return self.params[0] * math.exp(self._rng.gauss(0.0, self.params[1]))
+            return self._rng.expovariate(1.0 / self.params[0]) if self.params[0] > 0 else 0.0
+
+    def sleep(self) -> float:
+        delay_ms = self.sample_ms()
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000.0)
+        return delay_ms
+
+
+def _stable_hash(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def load_catalog_books() -> List[Dict[str, Any]]:
+    """Load one record per distinct title from the mock retailer catalogs."""
+    books: Dict[str, Dict[str, Any]] = {}
+
+    for file_name in sorted(os.listdir(CATALOG_DIR)):
+        if not file_name.endswith(".csv"):
+            continue
+
+        df = pd.read_csv(os.path.join(CATALOG_DIR, file_name))
+        for _, row in df.iterrows():
+            title = str(row["Title"]).strip()
+            description = row.get("description")
+            if not title or title in books or not isinstance(description, str):
+                continue
+
+            books[title] = {
+                "title": title,
+                "description": description,
+                "authors": str(row["authors"]) if pd.notna(row.get("authors")) else "",
+                "categories": str(row["categories"]) if pd.notna(row.get("categories")) else "",
+                "publishedDate": str(row["publishedDate"]) if pd.notna(row.get("publishedDate")) else "",
+                "bookLength": int(row["pages_count"]) if pd.notna(row.get("pages_count")) else None,
+            }
+
+    return list(books.values())
+
+
+class FakeEmbeddings:
+    """Deterministic hashed bag-of-words embeddings."""
+    def __init__(self, latency: Optional[LatencyDistribution] = None, dim: int = EMBEDDING_DIM):
+        self.latency = latency or LatencyDistribution()
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in _TOKEN_RE.findall(text.lower()):
+            h = _stable_hash(token)
+            vector[h % self.dim] += 1.0 if (h >> 32) & 1 else -1.0
+
+        norm = float(np.linalg.norm(vector))
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        self.latency.sleep()
+        return self._embed(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.latency.sleep()
+        return [self._embed(t) for t in texts]
+
+
+class FakeVectorStore:
+    """
+    In-memory stand-in for PineconeVectorStore over the mock retailer catalogs.
+    """
+    def __init__(
+        self,
+        books: List[Dict[str, Any]],
+        embeddings: FakeEmbeddings,
+        latency: Optional[LatencyDistribution] = None,
+    ):
+        self._embedding = embeddings
+        self.latency = latency or LatencyDistribution()
+        self.docs: List[Document] = []
+
+        for book in books:
+            text = f"Title: {book['title']}, Categories: {book['categories']}\n Description: {book['description']}"
+            # Same metadata fields as ingest.py writes.
+            self.docs.append(Document(page_content=text, metadata={
+                "title": book["title"],
+                "authors": book["authors"],
+                "categories": list(split_names(book["categories"])),
+                "publishedDate": book["publishedDate"],
+                "publishedYear": published_year(book["publishedDate"]),
+                "bookLength": book["bookLength"],
+            }))
+
+        self.matrix = np.array(
+            [embeddings._embed(d.page_content) for d in self.docs],
+            dtype=np.float32,
+        ).reshape(len(self.docs), embeddings.dim)
+
+    @property
+    def embeddings(self) -> FakeEmbeddings:
+        return self._embedding
+
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        self.latency.sleep()
+
+        scores = self.matrix @ np.asarray(embedding, dtype=np.float32)
+        results = []
+        for i in np.argsort(-scores):
+            doc = self.docs[int(i)]
+            if not matches_filter(doc.metadata, filter):
+                continue
+            results.append((doc, float(scores[i])))
+            if len(results) >= k:
+                break
+        return results
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter=None, **kwargs) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k=k, filter=filter)
+
+    def similarity_search(self, query: str, k: int = 4, filter=None, **kwargs) -> List[Document]:
+        return [d for d, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+
+class _FakeQueryResult:
+    def __init__(self, data: List[Dict[str, Any]]):
+        self.data = data
+
+
+class _FakeReviewsQuery:
+    def __init__(self, client: "FakeReviewsClient"):
+        self.client = client
+        self.titles: List[str] = []
+
+    def select(self, columns: str) -> "_FakeReviewsQuery":
+        return self
+
+    def in_(self, column: str, values: List[str]) -> "_FakeReviewsQuery":
+        self.titles = list(values)
+        return self
+
+    def execute(self) -> _FakeQueryResult:
+        self.client.latency.sleep()
+        rows = []
+        for title in self.titles:
+            rows.extend(self.client.reviews_for(title))
+        return _FakeQueryResult(rows)
+
+
+class FakeReviewsClient:
+    """Mimics the supabase `books_ratings` query chain with deterministic reviews."""
+    SUMMARIES = [
+        "Could not put it down",
+        "Slow start but worth it",
+        "Beautifully written",
+        "Not for me",
+        "A classic for a reason",
+        "Too long",
+    ]
+
+    def __init__(self, latency: Optional[LatencyDistribution] = None):
+        self.latency = latency or LatencyDistribution()
+
+    def reviews_for(self, title: str) -> List[Dict[str, Any]]:
+        h = _stable_hash(title)
+        return [
+            {
+                "title": title,
+                "review_summary": self.SUMMARIES[(h >> (8 * i)) % len(self.SUMMARIES)],
+                "review_score": float(1 + (h >> (8 * i + 4)) % 5),
+            }
+            for i in range(h % 5)
+        ]
+
+    def table(self, name: str) -> _FakeReviewsQuery:
+        return _FakeReviewsQuery(self)
+
+
+def _context_value(system_context: str, key: str) -> str:
+    for line in system_context.splitlines():
+        line = line.strip()
+        if line.startswith(f"{key}:"):
+            return line.split(":", 1)[1].strip()
+    return ""
+
+
+class FakeChatLLM:
+    """
+    Scripted chat model.
+
+    - Called with a plain string it plays the two curator steps, reading the
+      candidate JSON at the end of the prompt.
+    - Called with a message list it plays the ReAct runner:
+      recommendationTool -> findPricesTool -> buyBookTool.
+    """
+    def __init__(self, latency: Optional[LatencyDistribution] = None):
+        self.latency = latency or LatencyDistribution()
+        self._call_ids = 0
+        self._lock = threading.Lock()
+
+    def bind_tools(self, tools: List[Any]) -> "FakeChatLLM":
+        return self
+
+    def invoke(self, messages: Any) -> AIMessage:
+        self.latency.sleep()
+        if isinstance(messages, str):
+            return AIMessage(content=self._curate(messages))
+        return self._react(messages)
+
+    def _next_call_id(self) -> str:
+        with self._lock:
+            self._call_ids += 1
+            return f"call_{self._call_ids}"
+
+    def _curate(self, prompt: str) -> str:
+        if "Candidate books with reviews:" in prompt:
+            books = json.loads(prompt.split("Candidate books with reviews:", 1)[1].strip())
+            if not books:
+                return json.dumps({"title": ""})
+            best = max(books, key=lambda b: b.get("avg_score") or 0)
+            return json.dumps({"title": best.get("title", "")})
+
+        if "Candidate books:" in prompt:
+            books = json.loads(prompt.split("Candidate books:", 1)[1].strip())
+            return json.dumps({"titles": [b.get("title", "") for b in books[:3]]})
+
+        return ""
+
+    def _tool_call(self, name: str, args: Dict[str, Any]) -> AIMessage:
+        return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": self._next_call_id()}])
+
+    def _react(self, messages: List[Any]) -> AIMessage:
+        system_context = next((m.content for m in messages if isinstance(m, SystemMessage)), "")
+        user_prompt = next((m.content for m in messages if isinstance(m, HumanMessage)), "")
+
+        call_names = {}
+        for m in messages:
+            if isinstance(m, AIMessage):
+                for tc in m.tool_calls or []:
+                    call_names[tc["id"]] = tc["name"]
+
+        tool_messages = [m for m in messages if isinstance(m, ToolMessage)]
+        if not tool_messages:
+            return self._tool_call("recommendationTool", {
+                "user_prompt": user_prompt,
+                "excluded_titles": json.loads(_context_value(system_context, "excluded_titles") or "[]"),
+                "user_preferences": json.loads(_context_value(system_context, "user_preferences") or "[]"),
+            })
+
+        last = tool_messages[-1]
+        last_name = call_names.get(last.tool_call_id)
+        observation = json.loads(last.content)
+
+        if last_name == "recommendationTool" and observation.get("status") == "found":
+            return self._tool_call("findPricesTool", {"book_title": observation["title"]})
+
+        if last_name == "findPricesTool" and observation.get("status") == "found":
+            offers = [o for o in observation.get("offers", []) if o.get("in_stock") and o.get("price") is not None]
+            if offers:
+                best = min(offers, key=lambda o: o["price"])
+                return self._tool_call("buyBookTool", {
+                    "shop_id": best["shop"],
+                    "book_title": best.get("store_title") or observation.get("title"),
+                    "address": _context_value(system_context, "address"),
+                    "payment_token": _context_value(system_context, "payment_token"),
+                })
+
+        return AIMessage(content=f"Stopping after {last_name}: {observation.get('status')}")
+
+
+def install_fakes(
+    llm_latency: str = "none",
+    embedding_latency: str = "none",
+    vector_latency: str = "none",
+    reviews_latency: str = "none",
+    seed: int = 0,
+) -> Tuple[Callable[[], FakeChatLLM], Callable[[], None]]:
+    """
+    Patch recommendation_tool and agent_server to use the fake backends.
+
+    Returns:
+      - a factory for the runner LLM
+      - a restore function that undoes the patches
+    """
+    import recommendation_tool
+    import agent_server
+    from book_store import BookDocStore
+    from lexical_index import BM25Index
+
+    books = load_catalog_books()
+    book_store = BookDocStore.from_rows(books)
+    lexical = BM25Index.from_book_store(book_store)
+    embeddings = FakeEmbeddings(LatencyDistribution(embedding_latency, seed=seed + 1))
+    store = FakeVectorStore(books, embeddings, LatencyDistribution(vector_latency, seed=seed + 2))
+    reviews = FakeReviewsClient(LatencyDistribution(reviews_latency, seed=seed + 3))
+    llm_distribution = LatencyDistribution(llm_latency, seed=seed + 4)
+
+    llm = FakeChatLLM(llm_distribution)
+
+    def fake_llm() -> FakeChatLLM:
+        return llm
+
+    originals = [
+        (recommendation_tool, "get_vector_store", recommendation_tool.get_vector_store),
+        (recommendation_tool, "get_curator_llm", recommendation_tool.get_curator_llm),
+        (recommendation_tool, "supabase_client", recommendation_tool.supabase_client),
+        (recommendation_tool, "get_book_store", recommendation_tool.get_book_store),
+        (recommendation_tool, "get_lexical_index", recommendation_tool.get_lexical_index),
+        (agent_server, "get_agent_llm", agent_server.get_agent_llm),
+    ]
+
+    recommendation_tool.get_vector_store = lambda: store
+    recommendation_tool.get_curator_llm = fake_llm
+    recommendation_tool.supabase_client = reviews
+    recommendation_tool.get_book_store = lambda: book_store
+    recommendation_tool.get_lexical_index = lambda: lexical
+    agent_server.get_agent_llm = fake_llm
+
+    def restore() -> None:
+        for module, name, value in originals:
+            setattr(module, name, value)
+
+    return fake_llm, restore
@@ -0,0 +1,183 @@
+"""
+Contention benchmark for mock retailer purchases: many clients buy one hot title
+until it sells out. Reports buys/sec and checks that exactly the stocked
+quantity was sold (no oversell, no lost decrements).
+
+Modes:
+  threads    - threads calling decrement_stock() on a compact and a shared catalog
+  processes  - worker processes decrementing the same memory-mapped catalog file
+  http       - clients calling POST /shops/{shop}/buy on `uvicorn --workers N`
+
+Usage (from the repository root):
+    python -m benchmarks.stock_contention --mode threads,processes,http --quantity 20000 --clients 16
+"""
+import argparse
+import multiprocessing
+import os
+import secrets
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+import requests
+
+from benchmarks.agent_benchmark import _free_port
+from benchmarks.catalog_memory import synthetic_rows
+from mock_retailer.compact_catalog import CompactCatalog
+from mock_retailer.shared_catalog import build_shared_catalog, SharedCatalog
+
+HOT_SHOP = "fiction_boutique"
+
+
+def run_clients(clients: int, buy: Callable[[], bool]) -> Dict[str, Any]:
+    """Run buy() from `clients` threads until every one of them sees a sell-out."""
+    sold = [0] * clients
+
+    def client(i: int) -> None:
+        while buy():
+            sold[i] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return {"sold": sum(sold), "seconds": elapsed}
+
+
+def _process_buyer(path: str, key: str, threads: int, out) -> None:
+    catalog = SharedCatalog(path)
+    out.put(run_clients(threads, lambda: catalog.decrement_stock(key) is not None)["sold"])
+
+
+def bench_threads(rows, hot: str, quantity: int, clients: int, path: str) -> List[Dict[str, Any]]:
+    results = []
+    build_shared_catalog(rows, path)
+    for name, catalog in (("compact", CompactCatalog.from_rows(rows)), ("shared", SharedCatalog(path))):
+        catalog.set_quantity(hot, quantity)
+        run = run_clients(clients, lambda: catalog.decrement_stock(hot) is not None)
+        results.append({"mode": f"threads/{name}", **run, "left": catalog[hot].quantity})
+    return results
+
+
+def bench_processes(rows, hot: str, quantity: int, clients: int, processes: int, path: str) -> Dict[str, Any]:
+    build_shared_catalog(rows, path)
+    catalog = SharedCatalog(path)
+    catalog.set_quantity(hot, quantity)
+
+    out = multiprocessing.Queue()
+    per_process = max(1, clients // processes)
+    workers = [
+        multiprocessing.Process(target=_process_buyer, args=(path, hot, per_process, out))
+        for _ in range(processes)
+    ]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    sold = sum(out.get() for _ in workers)
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    return {"mode": f"processes x{processes}", "sold": sold, "seconds": elapsed, "left": catalog[hot].quantity}
+
+
+def bench_http(quantity: int, clients: int, workers: int) -> Dict[str, Any]:
+    shared_dir = tempfile.mkdtemp(prefix="bbcat-")
+    port = _free_port()
+    admin_headers = {"X-Admin-Token": secrets.token_hex(16)}
+    env = {
+        **os.environ,
+        "MOCK_RETAILER_CATALOG": "shared",
+        "MOCK_RETAILER_SHARED_CATALOG_DIR": shared_dir,
+        "MOCK_RETAILER_ADMIN_TOKEN": admin_headers["X-Admin-Token"],
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "mock_retailer.main:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(600):
+            try:
+                if requests.get(f"{base_url}/", timeout=1).ok:
+                    break
+            except requests.RequestException:
+                time.sleep(0.1)
+        else:
+            raise RuntimeError("mock retailer did not start")
+        requests.post(f"{base_url}/admin/restock", headers=admin_headers, timeout=30).raise_for_status()
+
+        catalog = SharedCatalog(os.path.join(shared_dir, f"{HOT_SHOP}.bbcat"))
+        hot = next(key for key in catalog if catalog[key].quantity > 0)
+        catalog.set_quantity(hot, quantity)
+        title = catalog[hot].Title
+
+        local = threading.local()
+
+        def buy() -> bool:
+            session = getattr(local, "session", None)
+            if session is None:
+                session = local.session = requests.Session()
+            res = session.post(
+                f"{base_url}/shops/{HOT_SHOP}/buy",
+                json={"title": title, "user_address": "bench", "payment_token": "tok"},
+                timeout=30,
+            )
+            return res.status_code == 200
+
+        run = run_clients(clients, buy)
+        return {"mode": f"http x{workers} workers", **run, "left": catalog[hot].quantity}
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", default="threads,processes,http")
+    parser.add_argument("--books", type=int, default=100_000, help="catalog size for threads/processes")
+    parser.add_argument("--quantity", type=int, default=20_000, help="copies of the hot title")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=2, help="uvicorn workers for --mode http")
+    parser.add_argument("--http-quantity", type=int, default=2_000)
+    args = parser.parse_args()
+    modes = {m.strip() for m in args.mode.split(",")}
+
+    rows = list(synthetic_rows(args.books))
+    hot = rows[0][0].lower()
+    fd, path = tempfile.mkstemp(suffix=".bbcat")
+    os.close(fd)
+
+    results = []
+    try:
+        if "threads" in modes:
+            results.extend(bench_threads(rows, hot, args.quantity, args.clients, path))
+        if "processes" in modes:
+            results.append(bench_processes(rows, hot, args.quantity, args.clients, args.processes, path))
+    finally:
+        os.remove(path)
+    if "http" in modes:
+        results.append(bench_http(args.http_quantity, args.clients, args.workers))
+
+    print(f"{args.clients} clients buying one hot title until it sells out")
+    print(f"  {'mode':<24}{'sold':>8}{'left':>6}{'buys/sec':>12}  oversell check")
+    failed = False
+    for r in results:
+        stocked = args.http_quantity if r["mode"].startswith("http") else args.quantity
+        ok = r["sold"] == stocked and r["left"] == 0
+        failed |= not ok
+        rate = r["sold"] / r["seconds"] if r["seconds"] > 0 else 0.0
+        print(f"  {r['mode']:<24}{r['sold']:>8}{r['left']:>6}{rate:>12.0f}  {'ok' if ok else 'FAILED'}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Memory / recall / latency of the local vector index (local_index.py) with
+float32, int8 and product-quantized vectors, with and without exact re-scoring.
+
+Recall@k is measured against exact float32 search. Queries are indexed vectors
+with added noise, so they can be generated for any corpus without an
+embedding model.
+
+Corpora:
+  --index DIR          an index written by `INGEST_TARGET=local python ingest.py`
+                       (the real books dataset and embedding model)
+  --synthetic N        N clustered random unit vectors of --dim dimensions
+  (default)            the mock retailer catalogs with the offline fake embeddings
+
+Usage (from the repository root):
+    python -m benchmarks.vector_quantization --index data/local_index
+    python -m benchmarks.vector_quantization --synthetic 200000 --dim 1536
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from benchmarks.fakes import FakeEmbeddings, FakeVectorStore, load_catalog_books
+from local_index import QUANTIZERS, VECTORS_FILE, LocalVectorIndex, normalize_rows, top_rows
+
+
+def synthetic_vectors(n: int, dim: int, clusters: int = 256, latent_dim: int = 64, seed: int = 0) -> np.ndarray:
+    """
+    Unit vectors around random cluster centres, varying mostly within a
+    latent_dim subspace: a rough stand-in for text embeddings, whose intrinsic
+    dimension is far below their size.
+    """
+    rng = np.random.default_rng(seed)
+    basis = rng.standard_normal((latent_dim, dim), dtype=np.float32) / np.sqrt(dim)
+    centres = rng.standard_normal((clusters, latent_dim), dtype=np.float32)
+    vectors = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 65536):
+        end = min(n, start + 65536)
+        latent = centres[rng.integers(clusters, size=end - start)] + rng.standard_normal((end - start, latent_dim), dtype=np.float32)
+        noise = rng.standard_normal((end - start, dim), dtype=np.float32) * (0.1 / np.sqrt(dim))
+        vectors[start:end] = normalize_rows(normalize_rows(latent @ basis) + noise)
+    return vectors
+
+
+def load_corpus(args) -> Tuple[str, np.ndarray]:
+    if args.index:
+        return args.index, normalize_rows(np.load(os.path.join(args.index, VECTORS_FILE)))
+    if args.synthetic:
+        return f"synthetic {args.dim}d", synthetic_vectors(args.synthetic, args.dim, seed=args.seed)
+    store = FakeVectorStore(load_catalog_books(), FakeEmbeddings())
+    return "mock catalogs, fake embeddings", normalize_rows(store.matrix)
+
+
+def make_queries(vectors: np.ndarray, count: int, noise: float, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed + 1)
+    rows = rng.integers(len(vectors), size=count)
+    jitter = rng.standard_normal((count, vectors.shape[1]), dtype=np.float32) * (noise / np.sqrt(vectors.shape[1]))
+    return normalize_rows(vectors[rows] + jitter)
+
+
+def exact_neighbours(vectors: np.ndarray, queries: np.ndarray, k: int) -> List[set]:
+    return [set(top_rows(vectors @ q, k).tolist()) for q in queries]
+
+
+def run(index: LocalVectorIndex, queries: np.ndarray, truth: List[set], k: int) -> Dict[str, float]:
+    latencies = []
+    hits = 0
+    for q, expected in zip(queries, truth):
+        start = time.perf_counter()
+        found = index.search(q, k=k)
+        latencies.append(time.perf_counter() - start)
+        hits += len({row for row, _ in found} & expected)
+    return {
+        "recall": hits / (k * len(queries)),
+        "ms": 1000 * float(np.mean(latencies)),
+        "p99_ms": 1000 * float(np.percentile(latencies, 99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index", help="directory of a local index written by ingest.py")
+    parser.add_argument("--synthetic", type=int, default=0, help="number of synthetic vectors")
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.5, help="query noise, relative to a unit vector")
+    parser.add_argument("--k", type=int, default=7)
+    parser.add_argument("--rescore-factors", default="4,16", help="shortlist sizes, as multiples of k")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    name, vectors = load_corpus(args)
+    queries = make_queries(vectors, args.queries, args.noise, args.seed)
+    truth = exact_neighbours(vectors, queries, args.k)
+    print(f"{name}: {len(vectors):,} vectors x {vectors.shape[1]} dims, {len(queries)} queries, recall@{args.k}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Quantized indexes re-score against the float32 matrix memory-mapped from disk.
+        np.save(os.path.join(tmp, VECTORS_FILE), vectors)
+        mapped = np.load(os.path.join(tmp, VECTORS_FILE), mmap_mode="r")
+        metadatas = [{"title": str(i)} for i in range(len(vectors))]
+        texts = [""] * len(vectors)
+
+        print(f"  {'mode':<16}{'build s':>9}{'resident MB':>13}{'recall':>9}{'ms/query':>10}{'p99 ms':>9}")
+        modes = [("float32", "none", 0)]
+        for kind in QUANTIZERS:
+            modes.append((kind, kind, 0))
+            modes += [(f"{kind}+rescore{f}", kind, int(f)) for f in args.rescore_factors.split(",")]
+
+        quantizers = {}
+        for label, kind, rescore in modes:
+            start = time.perf_counter()
+            if kind != "none" and kind not in quantizers:
+                quantizers[kind] = QUANTIZERS[kind].train(mapped)
+            build_s = time.perf_counter() - start
+
+            index = LocalVectorIndex(
+                vectors if kind == "none" else mapped,
+                texts,
+                metadatas,
+                quantizer=quantizers.get(kind),
+                rescore_factor=rescore,
+            )
+            r = run(index, queries, truth, args.k)
+            print(
+                f"  {label:<16}{build_s:>9.1f}{index.resident_bytes / 2 ** 20:>13.1f}"
+                f"{r['recall']:>9.3f}{r['ms']:>10.2f}{r['p99_ms']:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
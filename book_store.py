@@ -0,0 +1,156 @@
+"""
+Local store of full book records, keyed by title.
+
+ingest.py splits long descriptions into several chunks, so a vector match only
+carries part of the description, and its metadata holds authors and categories
+as raw strings. The store is read from the same CSV that was ingested
+(BOOKS_CSV_PATH) and gives back whole records, so vector matches only need
+the title (see INGEST_SLIM_METADATA in ingest.py).
+
+Records are kept as parallel arrays like mock_retailer/compact_catalog.py;
+author and category lists are shared between books that have the same ones.
+"""
+import ast
+import os
+import sys
+from array import array
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+BOOKS_CSV_PATH = os.getenv("BOOKS_CSV_PATH", "data/prepared_books_data.csv")
+
+
+def split_names(value: Any) -> Tuple[str, ...]:
+    """Authors / categories as stored in the CSV ("A, B" or "['A', 'B']") -> ("A", "B")."""
+    if isinstance(value, (list, tuple)):
+        return tuple(str(v).strip() for v in value if str(v).strip())
+    if not isinstance(value, str) or not value.strip():
+        return ()
+
+    value = value.strip()
+    if value.startswith("["):
+        try:
+            return split_names(ast.literal_eval(value))
+        except (ValueError, SyntaxError):
+            value = value.strip("[]")
+    return tuple(part.strip().strip("'\"") for part in value.split(",") if part.strip().strip("'\""))
+
+
+class BookDocStore:
+    """Book records by lower-cased title; get_many() resolves a whole result list at once."""
+
+    def __init__(self):
+        self.titles: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.descriptions: List[str] = []
+        self.published_dates: List[str] = []
+        # 0 when the book length is unknown
+        self.lengths = array("i")
+        self.author_codes = array("I")
+        self.category_codes = array("I")
+        self.names: List[Tuple[str, ...]] = []
+        self._names_index: Dict[Tuple[str, ...], int] = {}
+        self._category_names: Optional[List[str]] = None
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> "BookDocStore":
+        """Build from dicts with title, description, authors, categories, publishedDate, bookLength."""
+        store = cls()
+        for row in rows:
+            store.add(**row)
+        return store
+
+    @classmethod
+    def from_csv(cls, path: str) -> "BookDocStore":
+        df = pd.read_csv(path)
+        if "bookLength" not in df.columns and "pages_count" in df.columns:
+            df = df.rename(columns={"pages_count": "bookLength"})
+        if "title" not in df.columns and "Title" in df.columns:
+            df = df.rename(columns={"Title": "title"})
+
+        columns = ["title", "description", "authors", "categories", "publishedDate", "bookLength"]
+        df = df[[c for c in columns if c in df.columns]].astype(object).where(df.notna(), None)
+        return cls.from_rows(df.to_dict("records"))
+
+    def _names_code(self, names: Tuple[str, ...]) -> int:
+        code = self._names_index.get(names)
+        if code is None:
+            code = self._names_index[names] = len(self.names)
+            self.names.append(names)
+        return code
+
+    def add(
+        self,
+        title: Any,
+        description: Any = None,
+        authors: Any = None,
+        categories: Any = None,
+        publishedDate: Any = None,
+        bookLength: Any = None,
+    ) -> None:
+        """Add one book; the first record of a title wins, as in the ingested index."""
+        if not isinstance(title, str) or not title.strip() or not isinstance(description, str):
+            return
+        title = title.strip()
+        key = title.lower()
+        if key in self.index:
+            return
+
+        try:
+            length = int(float(bookLength)) if bookLength is not None else 0
+        except (TypeError, ValueError):
+            length = 0
+
+        self.index[key] = len(self.titles)
+        self.titles.append(title)
+        self.descriptions.append(description.strip())
+        self.published_dates.append(sys.intern(str(publishedDate)) if publishedDate is not None else "")
+        self.lengths.append(length)
+        self.author_codes.append(self._names_code(split_names(authors)))
+        self.category_codes.append(self._names_code(split_names(categories)))
+        self._category_names = None
+
+    def category_names(self) -> List[str]:
+        """Every distinct category of the books in the store."""
+        if self._category_names is None:
+            self._category_names = sorted({name for code in set(self.category_codes) for name in self.names[code]})
+        return self._category_names
+
+    def record(self, row: int) -> Dict[str, Any]:
+        return {
+            "title": self.titles[row],
+            "authors": list(self.names[self.author_codes[row]]),
+            "publishedDate": self.published_dates[row],
+            "categories": list(self.names[self.category_codes[row]]),
+            "bookLength": self.lengths[row] or None,
+            "description": self.descriptions[row],
+        }
+
+    def get(self, title: str) -> Optional[Dict[str, Any]]:
+        row = self.index.get(title.strip().lower())
+        return None if row is None else self.record(row)
+
+    def get_many(self, titles: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Records for the titles the store knows, keyed by the title as given."""
+        found = {}
+        for title in titles:
+            row = self.index.get(title.strip().lower())
+            if row is not None:
+                found[title] = self.record(row)
+        return found
+
+    def __contains__(self, title) -> bool:
+        return isinstance(title, str) and title.strip().lower() in self.index
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+
+@lru_cache(maxsize=None)
+def get_book_store() -> BookDocStore:
+    """Shared per process; empty when the CSV is not available."""
+    if not os.path.exists(BOOKS_CSV_PATH):
+        return BookDocStore()
+    return BookDocStore.from_csv(BOOKS_CSV_PATH)
@@ -1,11 +1,12 @@
 import json
-from typing import List, Optional, Any, Dict
+from typing import List, Optional, Any, Dict, Callable
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import ToolMessage, AIMessage, HumanMessage, SystemMessage
 from recommendation_tool import recommendation_tool
 from find_and_buy_tools import find_prices, buy_book
 from config import OPENAI_API_KEY, OPENAI_BASE_URL, LLM_MODEL
 from user_personal_details import UserPersonalDetails
+from metrics import timed
 import find_and_buy_tools
 
 
@@ -22,10 +23,32 @@ class BookBuyAgentRunner:
         # Bind tools natively to the LLM (OpenAI Tool Calling)
         self.llm_with_tools = self.llm.bind_tools(self.tools)
 
-    def run(self, user_prompt: str) -> Dict[str, Any]:
+    def run(
+        self,
+        user_prompt: str,
+        on_step: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        on_step, if given, is called with every trace step as soon as it is recorded
+        (used by the job API to expose partial progress).
+        """
+        with timed("agent_run"):
+            return self._run(user_prompt, on_step)
+
+    def _run(
+        self,
+        user_prompt: str,
+        on_step: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
         excluded_titles = self.user.initial_excluded_titles()
         all_steps = []
 
+        def add_steps(*steps: Dict[str, Any]) -> None:
+            all_steps.extend(steps)
+            if on_step is not None:
+                for s in steps:
+                    on_step(s)
+
         try:
             for attempt_number in range(1, 4):
                 last_tool_result_for_trace = None
@@ -35,7 +58,8 @@ class BookBuyAgentRunner:
 
     You have tools:
     - recommendationTool(user_prompt, excluded_titles, user_preferences) -> dict
-    - findPricesTool(book_title) -> dict (returns ALL offers)
+    - findPricesTool(book_title) -> dict (returns ALL offers received before its deadline;
+      complete=false and missing_shops list shops that did not answer in time)
     - buyBookTool(shop_id, book_title, address, payment_token) -> dict
 
     You have EXACTLY 3 attempts total.
@@ -83,15 +107,17 @@ class BookBuyAgentRunner:
                     if last_tool_result_for_trace is not None:
                         runner_prompt["last_tool_result"] = last_tool_result_for_trace
 
-                    ai_msg = self.llm_with_tools.invoke(messages)
+                    with timed("runner_llm") as span:
+                        ai_msg = self.llm_with_tools.invoke(messages)
 
-                    all_steps.append({
+                    add_steps({
                         "module": "BookBuyAgentRunner",
                         "prompt": runner_prompt,
                         "response": {
                             "content": ai_msg.content,
                             "tool_calls": ai_msg.tool_calls or []
-                        }
+                        },
+                        "duration_ms": span.duration_ms,
                     })
 
                     messages.append(ai_msg)
@@ -125,10 +151,11 @@ class BookBuyAgentRunner:
 
                         selected_tool = {t.name: t for t in self.tools}[tool_call["name"]]
                         tool_args = tool_call["args"]
-                        observation = selected_tool.invoke(tool_args)
+                        with timed("tool", tool=tool_call["name"]):
+                            observation = selected_tool.invoke(tool_args)
 
                         if tool_call["name"] == "recommendationTool":
-                            all_steps.extend(observation.get("llm_steps", []))
+                            add_steps(*observation.get("llm_steps", []))
 
                         tool_message_payload = dict(observation)
                         tool_message_payload.pop("llm_steps", None)
@@ -0,0 +1,324 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from metrics import REGISTRY
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_PATH = os.getenv("CACHE_PATH", os.path.join(tempfile.gettempdir(), "bookbuy_cache.sqlite3"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "100000"))
+
+_MISSING = object()
+
+
+def _hash_key(key: str) -> str:
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class CacheBackend:
+    """
+    Key/value cache shared by all caching layers, partitioned by namespace.
+    Values must be JSON-serializable. get() returns default on a miss or after expiry.
+    """
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        value = self._get(namespace, _hash_key(key))
+        hit = value is not _MISSING
+        self._count(namespace, "hits" if hit else "misses")
+        return value if hit else default
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        self._set(namespace, _hash_key(key), value, ttl)
+        self._count(namespace, "sets")
+
+    def delete(self, namespace: str, key: str) -> None:
+        self._delete(namespace, _hash_key(key))
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-namespace hits, misses, sets and hit rate, for this process."""
+        with self._stats_lock:
+            result = {}
+            for namespace, s in self._stats.items():
+                lookups = s["hits"] + s["misses"]
+                result[namespace] = {**s, "hit_rate": round(s["hits"] / lookups, 4) if lookups else None}
+            return result
+
+    def _count(self, namespace: str, field: str) -> None:
+        with self._stats_lock:
+            s = self._stats.setdefault(namespace, {"hits": 0, "misses": 0, "sets": 0})
+            s[field] += 1
+        REGISTRY.inc("bookbuy_cache_operations_total", labels={"namespace": namespace, "result": field})
+
+    def _get(self, namespace: str, key: str) -> Any:
+        raise NotImplementedError
+
+    def _set(self, namespace: str, key: str, value: Any, ttl: float) -> None:
+        raise NotImplementedError
+
+    def _delete(self, namespace: str, key: str) -> None:
+        raise NotImplementedError
+
+
+class NullCache(CacheBackend):
+    """Caching disabled."""
+    def _get(self, namespace: str, key: str) -> Any:
+        return _MISSING
+
+    def _set(self, namespace: str, key: str, value: Any, ttl: float) -> None:
+        pass
+
+    def _delete(self, namespace: str, key: str) -> None:
+        pass
+
+
+class MemoryCache(CacheBackend):
+    """Per-process LRU with TTL, bounded by entry count."""
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        super().__init__()
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, namespace: str, key: str) -> Any:
+        with self._lock:
+            entry = self._data.get((namespace, key))
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._data[(namespace, key)]
+                return _MISSING
+            self._data.move_to_end((namespace, key))
+        # Callers may mutate what they get back; hand out a copy like the SQLite backend does.
+        return json.loads(value)
+
+    def _set(self, namespace: str, key: str, value: Any, ttl: float) -> None:
+        encoded = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._data[(namespace, key)] = (time.time() + ttl, encoded)
+            self._data.move_to_end((namespace, key))
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def _delete(self, namespace: str, key: str) -> None:
+        with self._lock:
+            self._data.pop((namespace, key), None)
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Host-wide cache in one SQLite file (WAL mode), shared by every uvicorn worker.
+
+    Reads never block writers. Entries expire by TTL; when the stored payload
+    exceeds max_bytes the least recently used entries are evicted.
+
+    SQLite errors (e.g. "database is locked" past the busy timeout) never reach
+    callers: a failed get is a miss, a failed set or delete does nothing. They
+    are counted in bookbuy_cache_errors_total and printed at most once per
+    ERROR_LOG_INTERVAL_SECONDS.
+    """
+    # Access times are refreshed at most this often per entry, to keep hits read-only.
+    TOUCH_INTERVAL_SECONDS = 60.0
+    EVICTION_CHECK_EVERY = 200
+    ERROR_LOG_INTERVAL_SECONDS = 60.0
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES):
+        super().__init__()
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._sets_since_check = 0
+        self._sets_lock = threading.Lock()
+        self._last_error_log = 0.0
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            ) WITHOUT ROWID
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _failed(self, namespace: str, operation: str, error: sqlite3.Error) -> None:
+        # Do not leave a half-done write transaction holding the database lock.
+        try:
+            self._conn().rollback()
+        except sqlite3.Error:
+            pass
+        REGISTRY.inc("bookbuy_cache_errors_total", labels={"namespace": namespace, "operation": operation})
+        now = time.monotonic()
+        if now - self._last_error_log >= self.ERROR_LOG_INTERVAL_SECONDS:
+            self._last_error_log = now
+            print(f"Warning: cache {operation} in {namespace} failed ({self.path}): {error}")
+
+    def _get(self, namespace: str, key: str) -> Any:
+        try:
+            return self._read(namespace, key)
+        except sqlite3.Error as e:
+            self._failed(namespace, "get", e)
+            return _MISSING
+
+    def _set(self, namespace: str, key: str, value: Any, ttl: float) -> None:
+        try:
+            self._write(namespace, key, value, ttl)
+        except sqlite3.Error as e:
+            self._failed(namespace, "set", e)
+
+    def _delete(self, namespace: str, key: str) -> None:
+        try:
+            conn = self._conn()
+            conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+            conn.commit()
+        except sqlite3.Error as e:
+            self._failed(namespace, "delete", e)
+
+    def _read(self, namespace: str, key: str) -> Any:
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, expires_at, accessed_at FROM cache WHERE namespace = ? AND key = ?",
+            (namespace, key),
+        ).fetchone()
+        if row is None:
+            return _MISSING
+
+        value, expires_at, accessed_at = row
+        now = time.time()
+        if expires_at < now:
+            return _MISSING
+
+        if now - accessed_at > self.TOUCH_INTERVAL_SECONDS:
+            try:
+                conn.execute(
+                    "UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                    (now, namespace, key),
+                )
+                conn.commit()
+            except sqlite3.OperationalError:
+                pass
+        return json.loads(value)
+
+    def _write(self, namespace: str, key: str, value: Any, ttl: float) -> None:
+        encoded = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (namespace, key, value, size, expires_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (namespace, key, encoded, len(encoded), now + ttl, now),
+        )
+        conn.commit()
+
+        with self._sets_lock:
+            self._sets_since_check += 1
+            check = self._sets_since_check >= self.EVICTION_CHECK_EVERY
+            if check:
+                self._sets_since_check = 0
+        if check:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop expired entries, then LRU entries until the payload fits in max_bytes."""
+        conn = self._conn()
+        evicted = conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),)).rowcount
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        while total > self.max_bytes:
+            rows = conn.execute(
+                "SELECT namespace, key, size FROM cache ORDER BY accessed_at LIMIT 500"
+            ).fetchall()
+            if not rows:
+                break
+            for namespace, key, size in rows:
+                conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+                evicted += 1
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        conn.commit()
+
+        REGISTRY.set_gauge("bookbuy_cache_bytes", total)
+        if evicted:
+            REGISTRY.inc("bookbuy_cache_evictions_total", evicted)
+        return evicted
+
+
+_backend: Optional[CacheBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_cache() -> CacheBackend:
+    """Process-wide backend selected by CACHE_BACKEND: memory (default), sqlite or none."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if CACHE_BACKEND == "sqlite":
+                    _backend = SQLiteCache()
+                elif CACHE_BACKEND == "none":
+                    _backend = NullCache()
+                else:
+                    _backend = MemoryCache()
+    return _backend
+
+
+def set_cache(backend: CacheBackend) -> None:
+    """Swap the backend (benchmarks and tools)."""
+    global _backend
+    _backend = backend
+
+
+class CacheLayer:
+    """One caching layer: a namespace with its own TTL on top of the shared backend."""
+    def __init__(self, namespace: str, ttl: float):
+        self.namespace = namespace
+        self.ttl = ttl
+
+    def get(self, key: str) -> Any:
+        if self.ttl <= 0:
+            return None
+        return get_cache().get(self.namespace, key)
+
+    def set(self, key: str, value: Any) -> None:
+        if self.ttl > 0:
+            get_cache().set(self.namespace, key, value, self.ttl)
+
+    def delete(self, key: str) -> None:
+        if self.ttl > 0:
+            get_cache().delete(self.namespace, key)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
@@ -0,0 +1,335 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Callable, Iterator
+
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, BaseMessage
+
+
+class CassetteMiss(KeyError):
+    """Raised in replay mode when a request was never recorded."""
+
+
+class Cassette:
+    """
+    Records every external exchange made during an agent run, or replays them.
+
+    Each interaction is stored as:
+      {"kind": "llm" | "embedding" | "vector_search" | "supabase" | "http",
+       "key": sha256 of (kind, request), "request": ..., "response": ..., "latency_s": float}
+
+    In replay mode responses are served in recorded order per key, after
+    sleeping latency_s * latency_scale (0 disables the sleep).
+    """
+    def __init__(self, path: str, mode: str = "record", latency_scale: float = 1.0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.interactions: List[Dict[str, Any]] = []
+        self.runs: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._replay: Dict[str, deque] = defaultdict(deque)
+        self._last: Dict[str, Dict[str, Any]] = {}
+
+        if mode == "replay":
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.interactions = data.get("interactions", [])
+            self.runs = data.get("runs", [])
+            for interaction in self.interactions:
+                self._replay[interaction["key"]].append(interaction)
+
+    @staticmethod
+    def request_key(kind: str, request: Any) -> str:
+        payload = json.dumps([kind, request], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def call(
+        self,
+        kind: str,
+        request: Any,
+        fn: Callable[[], Any],
+        encode: Callable[[Any], Any],
+        decode: Callable[[Any], Any],
+    ) -> Any:
+        key = self.request_key(kind, request)
+
+        if self.mode == "replay":
+            with self._lock:
+                queue = self._replay.get(key)
+                if queue:
+                    interaction = queue.popleft()
+                    self._last[key] = interaction
+                else:
+                    interaction = self._last.get(key)
+            if interaction is None:
+                raise CassetteMiss(f"No recorded {kind} interaction for request {key[:12]}")
+
+            delay = interaction["latency_s"] * self.latency_scale
+            if delay > 0:
+                time.sleep(delay)
+            return decode(interaction["response"])
+
+        start = time.perf_counter()
+        result = fn()
+        latency = time.perf_counter() - start
+
+        with self._lock:
+            self.interactions.append({
+                "kind": kind,
+                "key": key,
+                "request": request,
+                "response": encode(result),
+                "latency_s": latency,
+            })
+        return result
+
+    def add_run(self, record: Dict[str, Any], result: Dict[str, Any]) -> None:
+        with self._lock:
+            self.runs.append({"request": record, "result": result})
+
+    def save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            data = {"interactions": self.interactions, "runs": self.runs}
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, default=str)
+
+
+def _encode_message(message: Any) -> Dict[str, Any]:
+    if isinstance(message, BaseMessage):
+        return {
+            "type": message.type,
+            "content": message.content,
+            "tool_calls": getattr(message, "tool_calls", None) or [],
+            "tool_call_id": getattr(message, "tool_call_id", None),
+        }
+    return {"type": "text", "content": message}
+
+
+def _encode_ai_message(message: AIMessage) -> Dict[str, Any]:
+    return {"content": message.content, "tool_calls": message.tool_calls or []}
+
+
+def _decode_ai_message(data: Dict[str, Any]) -> AIMessage:
+    return AIMessage(content=data["content"], tool_calls=data["tool_calls"])
+
+
+class CassetteChatModel:
+    """Chat model wrapper; in replay mode the wrapped model may be None."""
+    def __init__(self, llm: Any, cassette: Cassette):
+        self.llm = llm
+        self.cassette = cassette
+
+    def bind_tools(self, tools: List[Any]) -> "CassetteChatModel":
+        bound = self.llm.bind_tools(tools) if self.llm is not None else None
+        return CassetteChatModel(bound, self.cassette)
+
+    def invoke(self, messages: Any) -> AIMessage:
+        request = (
+            [_encode_message(m) for m in messages]
+            if isinstance(messages, list)
+            else _encode_message(messages)
+        )
+        return self.cassette.call(
+            "llm", request, lambda: self.llm.invoke(messages), _encode_ai_message, _decode_ai_message
+        )
+
+
+class CassetteEmbeddings:
+    def __init__(self, embeddings: Any, cassette: Cassette):
+        self.embeddings = embeddings
+        self.cassette = cassette
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.cassette.call(
+            "embedding", {"query": text}, lambda: self.embeddings.embed_query(text), list, list
+        )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.cassette.call(
+            "embedding", {"documents": texts}, lambda: self.embeddings.embed_documents(texts), list, list
+        )
+
+
+def _encode_scored_docs(results: List[Any]) -> List[Dict[str, Any]]:
+    return [{"page_content": d.page_content, "metadata": d.metadata, "score": s} for d, s in results]
+
+
+def _decode_scored_docs(data: List[Dict[str, Any]]) -> List[Any]:
+    return [(Document(page_content=r["page_content"], metadata=r["metadata"]), r["score"]) for r in data]
+
+
+class CassetteVectorStore:
+    """Vector store wrapper covering the calls made by rag_books_by_description."""
+    def __init__(self, store: Any, cassette: Cassette):
+        self.store = store
+        self.cassette = cassette
+        self._embeddings = CassetteEmbeddings(store.embeddings if store is not None else None, cassette)
+
+    @property
+    def embeddings(self) -> CassetteEmbeddings:
+        return self._embeddings
+
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Any]:
+        request = {
+            "embedding": hashlib.sha256(json.dumps(list(embedding)).encode("utf-8")).hexdigest(),
+            "k": k,
+            "filter": filter,
+        }
+        return self.cassette.call(
+            "vector_search",
+            request,
+            lambda: self.store.similarity_search_by_vector_with_score(embedding, k=k, filter=filter, **kwargs),
+            _encode_scored_docs,
+            _decode_scored_docs,
+        )
+
+    def similarity_search(self, query: str, k: int = 4, filter=None, **kwargs) -> List[Document]:
+        embedding = self.embeddings.embed_query(query)
+        return [d for d, _ in self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter)]
+
+
+class _CassetteQueryResult:
+    def __init__(self, data: Any):
+        self.data = data
+
+
+class _CassetteQuery:
+    """Records a supabase query-builder chain and resolves it on execute()."""
+    def __init__(self, client: Any, cassette: Cassette, chain: List[Any]):
+        self.client = client
+        self.cassette = cassette
+        self.chain = chain
+
+    def __getattr__(self, name: str) -> Callable[..., "_CassetteQuery"]:
+        def step(*args: Any) -> "_CassetteQuery":
+            return _CassetteQuery(self.client, self.cassette, self.chain + [[name, list(args)]])
+        return step
+
+    def execute(self) -> _CassetteQueryResult:
+        def run() -> Any:
+            query = self.client
+            for name, args in self.chain:
+                query = getattr(query, name)(*args)
+            return query.execute().data
+
+        return _CassetteQueryResult(self.cassette.call("supabase", self.chain, run, lambda d: d, lambda d: d))
+
+
+class CassetteSupabase:
+    def __init__(self, client: Any, cassette: Cassette):
+        self.client = client
+        self.cassette = cassette
+
+    def table(self, name: str) -> _CassetteQuery:
+        return _CassetteQuery(self.client, self.cassette, [["table", [name]]])
+
+
+class CassetteResponse:
+    def __init__(self, status_code: int, text: str):
+        self.status_code = status_code
+        self.text = text
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+
+class CassetteHTTP:
+    """Stands in for the pooled HTTP session inside find_and_buy_tools."""
+    def __init__(self, http: Any, cassette: Cassette, base_url: str):
+        self.http = http
+        self.cassette = cassette
+        self.base_url = base_url
+
+    def _call(self, method: str, url: str, **kwargs: Any) -> CassetteResponse:
+        request = {
+            "method": method,
+            "url": url.replace(self.base_url, "{RETAILER_API_URL}", 1),
+            "params": kwargs.get("params"),
+            "json": kwargs.get("json"),
+        }
+
+        def run() -> CassetteResponse:
+            res = getattr(self.http, method)(url, **kwargs)
+            return CassetteResponse(res.status_code, res.text)
+
+        return self.cassette.call(
+            "http",
+            request,
+            run,
+            lambda r: {"status_code": r.status_code, "text": r.text},
+            lambda d: CassetteResponse(d["status_code"], d["text"]),
+        )
+
+    def get(self, url: str, **kwargs: Any) -> CassetteResponse:
+        return self._call("get", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> CassetteResponse:
+        return self._call("post", url, **kwargs)
+
+
+@contextmanager
+def use_cassette(cassette: Cassette) -> Iterator[Callable[[], CassetteChatModel]]:
+    """
+    Route every external call of recommendation_tool, find_and_buy_tools and
+    agent_server through the cassette.
+
+    Yields a factory for the runner LLM.
+    """
+    import recommendation_tool
+    import find_and_buy_tools
+    import agent_server
+
+    replaying = cassette.mode == "replay"
+    original_get_vector_store = recommendation_tool.get_vector_store
+    original_get_curator_llm = recommendation_tool.get_curator_llm
+    original_get_agent_llm = agent_server.get_agent_llm
+
+    vector_store = CassetteVectorStore(None if replaying else original_get_vector_store(), cassette)
+    curator_llm = CassetteChatModel(None if replaying else original_get_curator_llm(), cassette)
+    agent_llm = CassetteChatModel(None if replaying else original_get_agent_llm(), cassette)
+
+    originals = [
+        (recommendation_tool, "get_vector_store", original_get_vector_store),
+        (recommendation_tool, "get_curator_llm", original_get_curator_llm),
+        (recommendation_tool, "supabase_client", recommendation_tool.supabase_client),
+        (find_and_buy_tools, "_http", find_and_buy_tools._http),
+        (agent_server, "get_agent_llm", original_get_agent_llm),
+    ]
+
+    recommendation_tool.get_vector_store = lambda: vector_store
+    recommendation_tool.get_curator_llm = lambda: curator_llm
+    if replaying:
+        if any(i["kind"] == "supabase" for i in cassette.interactions):
+            recommendation_tool.supabase_client = CassetteSupabase(None, cassette)
+        else:
+            recommendation_tool.supabase_client = None
+    elif recommendation_tool.supabase_client:
+        recommendation_tool.supabase_client = CassetteSupabase(recommendation_tool.supabase_client, cassette)
+    find_and_buy_tools._http = CassetteHTTP(
+        None if replaying else find_and_buy_tools._http, cassette, find_and_buy_tools.RETAILER_API_URL
+    )
+    agent_server.get_agent_llm = lambda: agent_llm
+
+    try:
+        yield lambda: agent_llm
+    finally:
+        for module, name, value in originals:
+            setattr(module, name, value)
@@ -27,8 +27,39 @@ else:
     supabase_client = None
 
 
+# Vector store for RAG: "pinecone", or "local" for the file-backed index that
+# INGEST_TARGET=local python ingest.py writes to LOCAL_INDEX_DIR (see local_index.py)
+VECTOR_STORE = os.getenv("VECTOR_STORE", "pinecone")
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "data/local_index")
+
 # RAG parameters
 CHUNK_SIZE = 300
 OVERLAP_RATIO = 0.1
 TOP_K_RETURN_BOOKS = 7
 TOP_K_REVIEWS = 5
+# Long descriptions are ingested as several chunks; RAG fetches this many matches per
+# wanted book and collapses them per title, scoring a book by its best chunk ("max")
+# or by the sum over its matched chunks ("sum").
+RAG_CHUNK_OVERFETCH = int(os.getenv("RAG_CHUNK_OVERFETCH", "3"))
+RAG_GROUP_SCORING = os.getenv("RAG_GROUP_SCORING", "max")
+# Prompts naming a specific book are resolved from the BM25 title/author index
+# (lexical_index.py) without RAG or curator LLM calls.
+NAMED_BOOK_FAST_PATH = os.getenv("NAMED_BOOK_FAST_PATH", "1") == "1"
+# Weight of the BM25 ranking when fused (RRF) with the vector ranking; 0 disables fusion.
+LEXICAL_FUSION_WEIGHT = float(os.getenv("LEXICAL_FUSION_WEIGHT", "0.5"))
+# RAG retrieves this many candidates, pre-ranks them locally (preranker.py) and sends
+# the top PRERANK_TOP_N to the curator LLM; 0 sends the TOP_K_RETURN_BOOKS RAG results.
+PRERANK_CANDIDATES = int(os.getenv("PRERANK_CANDIDATES", "50"))
+PRERANK_TOP_N = int(os.getenv("PRERANK_TOP_N", "5"))
+
+# Exclusion lists up to this size go to Pinecone as a $nin filter. Beyond it only
+# the most recent titles are sent; the rest are filtered locally after over-fetching.
+EXCLUSION_SERVER_FILTER_MAX_TITLES = int(os.getenv("EXCLUSION_SERVER_FILTER_MAX_TITLES", "100"))
+# Upper bound on the over-fetch (Pinecone allows top_k up to 10000).
+EXCLUSION_MAX_FETCH = int(os.getenv("EXCLUSION_MAX_FETCH", "400"))
+
+# Cache TTLs in seconds (see cache_backend.py; 0 disables a layer)
+EMBEDDING_CACHE_TTL_SECONDS = float(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+REVIEWS_CACHE_TTL_SECONDS = float(os.getenv("REVIEWS_CACHE_TTL_SECONDS", "3600"))
+# Off by default: the curator LLM samples at temperature 1, so a cached pick changes behaviour.
+RECOMMENDATION_CACHE_TTL_SECONDS = float(os.getenv("RECOMMENDATION_CACHE_TTL_SECONDS", "0"))
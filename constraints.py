@@ -0,0 +1,249 @@
+"""
+Rule-based extraction of constraints (page count, publication year, category)
+from the user's prompt and preferences, turned into vector-store metadata
+filters for RAG.
+
+Filters use the chunk metadata written by ingest.py: bookLength, publishedYear
+and categories. relaxations() lists progressively looser filters, so that
+retrieval can fall back when a constraint leaves too few books.
+
+Categories the user rejects ("no romance", "dislikes: horror") are excluded in
+every filter. Categories the user asks for are only a pre-ranking signal
+(preranker.py): a word such as "history" in a prompt is too weak a cue to
+drop every other book.
+"""
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_YEAR = r"((?:1[5-9]|20)\d\d)"
+
+PAGES_RANGE = re.compile(r"(?:between\s+)?(\d{2,4})\s*(?:-|–|to|and)\s*(\d{2,4})\s*pages", re.IGNORECASE)
+PAGES_AROUND = re.compile(r"(?:around|about|approximately|roughly|~)\s*(\d{2,4})\s*pages", re.IGNORECASE)
+# "no more than" is a maximum and "no less than" a minimum, not the other way round.
+PAGES_MAX = re.compile(
+    r"(?:under|below|(?<!no )(?<!not )(?:less|fewer) than|at most|(?:no|not) more than|up to|shorter than|max(?:imum)?)"
+    r"\s*(\d{2,4})\s*pages?",
+    re.IGNORECASE,
+)
+PAGES_MIN = re.compile(
+    r"(?:over|above|(?<!no )(?<!not )more than|(?:no|not) (?:less|fewer) than|at least|longer than|min(?:imum)?)"
+    r"\s*(\d{2,4})\s*pages?",
+    re.IGNORECASE,
+)
+SHORT_BOOK = re.compile(r"\b(?:short|quick)\s+(?:book|novel|read)\b", re.IGNORECASE)
+
+# "after 1945" alone often describes the story ("a novel set after 1945 in Berlin"),
+# so open-ended bounds need publication wording; "newer/older than" describe the book.
+_PUBLISHED = r"(?:published|written|released|came\s+out|publication\s+date)"
+YEAR_RANGE = re.compile(rf"between\s+{_YEAR}\s*(?:-|–|to|and)\s*{_YEAR}", re.IGNORECASE)
+YEAR_DECADE = re.compile(r"\b((?:1[5-9]|20)\d0)'?s\b", re.IGNORECASE)
+YEAR_EXACT = re.compile(rf"(?:published|written|released|from)\s+in\s+{_YEAR}\b", re.IGNORECASE)
+YEAR_AFTER = re.compile(rf"(?:{_PUBLISHED}\s+(?:after|since|later\s+than)|newer\s+than)\s+{_YEAR}\b", re.IGNORECASE)
+YEAR_BEFORE = re.compile(
+    rf"(?:{_PUBLISHED}\s+(?:before|prior\s+to|earlier\s+than)|older\s+than)\s+{_YEAR}\b", re.IGNORECASE
+)
+# Years after these describe when the story happens, not when the book came out.
+STORY_SETTING = re.compile(r"\b(?:set|takes?\s+place|taking\s+place|happens|during)\b[^,;.!?]*$", re.IGNORECASE)
+
+# "around N pages" allows this fraction either way.
+AROUND_TOLERANCE = 0.25
+SHORT_BOOK_MAX_PAGES = 250
+
+# A category mention is negated by one of these earlier in its clause
+# ("no romance or horror", "I don't want horror"); "not too long" is not a negation.
+NEGATION_CUES = re.compile(
+    r"\b(?:no|not(?!\s+(?:too|very|so|overly)\b)|without|never|nothing|except|excluding|avoid\w*|hate\w*|dislike\w*"
+    r"|don'?t\s+(?:want|like|enjoy)|anything\s+but)\b",
+    re.IGNORECASE,
+)
+# Clauses end at punctuation and at "but" ("not horror, but fantasy"), except in "anything but".
+CLAUSE_BREAK = re.compile(r"[,;.!?]|(?<!anything )\bbut\b", re.IGNORECASE)
+# A preference labelled as a dislike negates every category it lists.
+NEGATED_LIST = re.compile(r"^\s*(?:dislikes?|avoid|hates?|not interested in|no)\s*:", re.IGNORECASE)
+
+
+class Constraints:
+    """
+    Page range, publication year range, wanted and rejected categories;
+    None / empty means unconstrained. Wanted categories are not filtered on.
+    """
+
+    def __init__(self):
+        self.min_pages: Optional[int] = None
+        self.max_pages: Optional[int] = None
+        self.min_year: Optional[int] = None
+        self.max_year: Optional[int] = None
+        self.categories: List[str] = []
+        self.excluded_categories: List[str] = []
+
+    def is_empty(self) -> bool:
+        return not self.categories and not self.excluded_categories and all(
+            v is None for v in (self.min_pages, self.max_pages, self.min_year, self.max_year)
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "pages": [self.min_pages, self.max_pages],
+            "year": [self.min_year, self.max_year],
+            "categories": list(self.categories),
+            "excluded_categories": list(self.excluded_categories),
+        }
+
+    @staticmethod
+    def _range(low: Optional[int], high: Optional[int]) -> Dict[str, int]:
+        condition = {}
+        if low is not None:
+            condition["$gte"] = low
+        if high is not None:
+            condition["$lte"] = high
+        return condition
+
+    def to_filter(self, pages: bool = True, year: bool = True) -> Optional[Dict[str, Any]]:
+        metadata_filter: Dict[str, Any] = {}
+        if pages and (self.min_pages is not None or self.max_pages is not None):
+            metadata_filter["bookLength"] = self._range(self.min_pages, self.max_pages)
+        if year and (self.min_year is not None or self.max_year is not None):
+            metadata_filter["publishedYear"] = self._range(self.min_year, self.max_year)
+        if self.excluded_categories:
+            metadata_filter["categories"] = {"$nin": list(self.excluded_categories)}
+        return metadata_filter or None
+
+    def relaxations(self) -> List[Optional[Dict[str, Any]]]:
+        """
+        Filters from strictest to loosest: drop the year first, then pages.
+        Rejected categories stay excluded at every level.
+        """
+        levels = [
+            self.to_filter(),
+            self.to_filter(year=False),
+            self.to_filter(year=False, pages=False),
+        ]
+        return [f for i, f in enumerate(levels) if f not in levels[:i]]
+
+    def matches(self, book: Dict[str, Any]) -> bool:
+        """Check a book store record (bookLength, publishedDate, categories list)."""
+        length = book.get("bookLength")
+        if self.min_pages is not None and (length is None or length < self.min_pages):
+            return False
+        if self.max_pages is not None and (length is None or length > self.max_pages):
+            return False
+
+        year = published_year(book.get("publishedDate"))
+        if self.min_year is not None and (year is None or year < self.min_year):
+            return False
+        if self.max_year is not None and (year is None or year > self.max_year):
+            return False
+
+        if set(self.excluded_categories) & set(book.get("categories") or []):
+            return False
+        return True
+
+    def category_match(self, book: Dict[str, Any]) -> bool:
+        """Whether a book is in one of the wanted categories."""
+        return bool(set(self.categories) & set(book.get("categories") or []))
+
+
+def published_year(value: Any) -> Optional[int]:
+    """Year of a publishedDate such as "2014-06-05" or "1996"."""
+    match = re.match(r"\s*(\d{4})", str(value)) if value is not None else None
+    return int(match.group(1)) if match else None
+
+
+def _publication_years(pattern: "re.Pattern[str]", text: str) -> Optional["re.Match[str]"]:
+    """First match of a year pattern that is not about the story's setting ("set in the 1920s")."""
+    for m in pattern.finditer(text):
+        if not STORY_SETTING.search(text, 0, m.start()):
+            return m
+    return None
+
+
+def _category_mentions(text: str, categories: Iterable[str]) -> List[Tuple[str, int, int]]:
+    """
+    (category, start, end) for each category named in the text. A category like
+    "Biography & Autobiography" matches either part. Longer names are matched
+    first and their words are not matched again. Words inside hyphenated words
+    ("non-fiction") never match. Adjacent mentions ("science fiction") name a
+    genre that is neither, so they are dropped.
+    """
+    lowered = text.lower()
+    mentions: List[Tuple[str, int, int]] = []
+    for category in sorted(set(categories), key=len, reverse=True):
+        parts = [category] + [p for p in re.split(r"\s*[&,/]\s*", category) if p and p != category]
+        for part in parts:
+            if len(part) < 4:
+                continue
+            for m in re.finditer(rf"(?<![\w-]){re.escape(part.lower())}(?![\w-])", lowered):
+                if not any(m.start() < end and start < m.end() for _, start, end in mentions):
+                    mentions.append((category, m.start(), m.end()))
+
+    mentions.sort(key=lambda m: m[1])
+    compound = set()
+    for a, b in zip(mentions, mentions[1:]):
+        if not lowered[a[2]:b[1]].strip():
+            compound.update((a, b))
+    return [m for m in mentions if m not in compound]
+
+
+def _negated(text: str, start: int) -> bool:
+    """Whether the mention starting at start is in a negated clause of text."""
+    if NEGATED_LIST.match(text):
+        return True
+    breaks = [m.end() for m in CLAUSE_BREAK.finditer(text, 0, start)]
+    return bool(NEGATION_CUES.search(text, breaks[-1] if breaks else 0, start))
+
+
+def _match_categories(texts: Iterable[str], categories: Iterable[str]) -> Tuple[List[str], List[str]]:
+    """(wanted, rejected) categories named in the texts; a category both wanted and rejected is rejected."""
+    categories = list(categories)
+    wanted: List[str] = []
+    rejected: List[str] = []
+    for text in texts:
+        for category, start, _ in _category_mentions(text, categories):
+            target = rejected if _negated(text, start) else wanted
+            if category not in target:
+                target.append(category)
+    return [c for c in wanted if c not in rejected], rejected
+
+
+def extract_constraints(
+    user_prompt: str,
+    user_preferences: Optional[List[str]] = None,
+    categories: Iterable[str] = (),
+) -> Constraints:
+    """
+    Constraints stated in the prompt or preferences, e.g. "under 400 pages",
+    "book length: around 150-300 pages", "published after 2010", "from the 1990s".
+    Categories are matched against the known category names, each preference
+    separately, and sorted into wanted and rejected ("no horror") ones.
+    """
+    text = " ".join([user_prompt] + list(user_preferences or []))
+    c = Constraints()
+
+    if m := PAGES_RANGE.search(text):
+        low, high = sorted((int(m.group(1)), int(m.group(2))))
+        c.min_pages, c.max_pages = low, high
+    elif m := PAGES_AROUND.search(text):
+        pages = int(m.group(1))
+        c.min_pages, c.max_pages = int(pages * (1 - AROUND_TOLERANCE)), int(pages * (1 + AROUND_TOLERANCE))
+    else:
+        if m := PAGES_MAX.search(text):
+            c.max_pages = int(m.group(1))
+        if m := PAGES_MIN.search(text):
+            c.min_pages = int(m.group(1))
+        if c.max_pages is None and SHORT_BOOK.search(text):
+            c.max_pages = SHORT_BOOK_MAX_PAGES
+
+    if m := _publication_years(YEAR_RANGE, text):
+        c.min_year, c.max_year = sorted((int(m.group(1)), int(m.group(2))))
+    elif m := YEAR_EXACT.search(text):
+        c.min_year = c.max_year = int(m.group(1))
+    elif m := _publication_years(YEAR_DECADE, text):
+        c.min_year, c.max_year = int(m.group(1)), int(m.group(1)) + 9
+    else:
+        if m := YEAR_AFTER.search(text):
+            c.min_year = int(m.group(1)) + (0 if "since" in m.group(0).lower() else 1)
+        if m := YEAR_BEFORE.search(text):
+            c.max_year = int(m.group(1)) - 1
+
+    c.categories, c.excluded_categories = _match_categories([user_prompt] + list(user_preferences or []), categories)
+    return c
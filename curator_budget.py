@@ -0,0 +1,118 @@
+"""
+Latency budget for the curator LLM calls of one recommendation request.
+
+Off by default (CURATOR_LATENCY_BUDGET_SECONDS=0): degrading trades answer
+quality for latency, so a deployment opts in with a budget that fits its
+curator model. The clock starts at the first curator call, so retrieval time
+does not count against it.
+
+LatencyBudget.call() runs a curator call on a shared pool and waits at most for
+the time left in the request's budget. It raises CuratorUnavailable instead of
+waiting when:
+- "budget": the stage's recent latency (EWMA) exceeds the time left, so the
+  call is not started at all;
+- "timeout": the call is still running when the budget runs out (it finishes
+  in the background and still updates the EWMA);
+- "error": the OpenAI client raised an API or transport error (rate limits
+  after the client's own retries, connection failures). Other exceptions are
+  bugs and propagate.
+
+recommendation_tool then answers from the deterministic pre-ranker order and
+marks the result as degraded.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Optional
+
+from openai import APIError
+
+from metrics import REGISTRY
+
+# Seconds from a request's first curator call until the curator LLM must have answered; 0 disables.
+CURATOR_LATENCY_BUDGET_SECONDS = float(os.getenv("CURATOR_LATENCY_BUDGET_SECONDS", "0"))
+# A latency estimate older than this no longer skips calls, so one call probes whether the LLM recovered.
+CURATOR_LATENCY_STALE_SECONDS = float(os.getenv("CURATOR_LATENCY_STALE_SECONDS", "30"))
+LATENCY_EWMA_ALPHA = 0.2
+
+# Calls abandoned on timeout keep their thread until the LLM client gives up.
+_curator_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="curator-llm")
+
+_latency_ewma: Dict[str, float] = {}
+_latency_updated: Dict[str, float] = {}
+_latency_lock = threading.Lock()
+
+
+class CuratorUnavailable(Exception):
+    def __init__(self, stage: str, reason: str, remaining: float):
+        super().__init__(f"{stage}: {reason} ({remaining * 1000:.0f} ms of budget left)")
+        self.stage = stage
+        self.reason = reason
+        self.remaining = remaining
+
+
+def record_latency(stage: str, latency: float) -> None:
+    with _latency_lock:
+        previous = _latency_ewma.get(stage)
+        ewma = latency if previous is None else previous + LATENCY_EWMA_ALPHA * (latency - previous)
+        _latency_ewma[stage] = ewma
+        _latency_updated[stage] = time.monotonic()
+    REGISTRY.set_gauge("bookbuy_curator_latency_ewma_seconds", ewma, {"stage": stage})
+
+
+def expected_latency(stage: str) -> Optional[float]:
+    """The stage's latency EWMA, or None when unknown or stale."""
+    with _latency_lock:
+        updated = _latency_updated.get(stage)
+        if updated is None or time.monotonic() - updated > CURATOR_LATENCY_STALE_SECONDS:
+            return None
+        return _latency_ewma[stage]
+
+
+class LatencyBudget:
+    """
+    Deadline shared by the curator calls of one request, counted from the first
+    call; seconds <= 0 means unlimited.
+    """
+
+    def __init__(self, seconds: float = CURATOR_LATENCY_BUDGET_SECONDS):
+        self.seconds = seconds
+        self.start: Optional[float] = None
+
+    def remaining(self) -> Optional[float]:
+        if self.seconds <= 0:
+            return None
+        if self.start is None:
+            return self.seconds
+        return max(0.0, self.seconds - (time.monotonic() - self.start))
+
+    def call(self, stage: str, fn: Callable[..., Any], *args: Any) -> Any:
+        def measured():
+            start = time.monotonic()
+            result = fn(*args)
+            record_latency(stage, time.monotonic() - start)
+            return result
+
+        remaining = self.remaining()
+        if remaining is None:
+            return measured()
+        if self.start is None:
+            self.start = time.monotonic()
+
+        expected = expected_latency(stage)
+        if remaining <= 0 or (expected is not None and expected > remaining):
+            raise self._unavailable(stage, "budget", remaining)
+
+        future = _curator_executor.submit(measured)
+        try:
+            return future.result(timeout=remaining)
+        except FutureTimeout:
+            raise self._unavailable(stage, "timeout", 0.0) from None
+        except APIError as e:
+            raise self._unavailable(stage, "error", self.remaining() or 0.0) from e
+
+    @staticmethod
+    def _unavailable(stage: str, reason: str, remaining: float) -> CuratorUnavailable:
+        REGISTRY.inc("bookbuy_curator_degraded_total", labels={"stage": stage, "reason": reason})
+        return CuratorUnavailable(stage, reason, remaining)
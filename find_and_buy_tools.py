@@ -1,19 +1,81 @@
 import os
+import time
+import uuid
 import requests
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from langchain_core.tools import tool
+from metrics import timed, REGISTRY
+from shop_health import get_shop_health, OPEN
+from singleflight import SingleFlight
+from cache_backend import CacheLayer
 
 RETAILER_API_URL = os.getenv("RETAILER_API_URL", "http://127.0.0.1:10000")
 SHOPS = ["fiction_boutique", "knowledge_store", "mega_market1", "mega_market2"]
 
+SHOP_REQUEST_TIMEOUT_SECONDS = 40
+# Overall budget for one price sweep across all shops.
+FIND_PRICES_DEADLINE_SECONDS = float(os.getenv("FIND_PRICES_DEADLINE_SECONDS", "8"))
+# Send a second request to shops that have not answered after this many seconds (0 disables hedging).
+SHOP_HEDGE_AFTER_SECONDS = float(os.getenv("SHOP_HEDGE_AFTER_SECONDS", "0"))
+# Search threads per shop: one search and one hedge for each of up to 16 concurrent
+# price sweeps (same-title sweeps share one, see price_flight).
+SHOP_SEARCH_THREADS = int(os.getenv("SHOP_SEARCH_THREADS", "32"))
+# Ask the retailer's cross-shop best-offer index first; fan out to every shop only if it fails.
+BEST_OFFER_FAST_PATH = os.getenv("BEST_OFFER_FAST_PATH", "1") == "1"
+# Share of the price-sweep deadline the best-offer request may take; the rest is
+# left for searching each shop when it fails.
+BEST_OFFER_DEADLINE_FRACTION = float(os.getenv("BEST_OFFER_DEADLINE_FRACTION", "0.5"))
+# Purchases carry an Idempotency-Key, so transient failures are retried (and slow
+# purchases optionally hedged) without risking a second purchase.
+BUY_REQUEST_TIMEOUT_SECONDS = float(os.getenv("BUY_REQUEST_TIMEOUT_SECONDS", "15"))
+BUY_MAX_ATTEMPTS = int(os.getenv("BUY_MAX_ATTEMPTS", "3"))
+BUY_RETRY_BACKOFF_SECONDS = float(os.getenv("BUY_RETRY_BACKOFF_SECONDS", "0.2"))
+# Send the same purchase again if it has not answered after this many seconds (0 disables hedging).
+BUY_HEDGE_AFTER_SECONDS = float(os.getenv("BUY_HEDGE_AFTER_SECONDS", "0"))
+# Per-shop search answers are reused this long (0 disables); a purchase drops the shop's entry.
+OFFERS_CACHE_TTL_SECONDS = float(os.getenv("OFFERS_CACHE_TTL_SECONDS", "30"))
 
-def _search_shop(shop: str, book_title: str) -> dict:
+# One pooled HTTP session per process, sized for concurrent runs hitting every shop.
+_http = requests.Session()
+_http.mount("http://", HTTPAdapter(pool_connections=len(SHOPS), pool_maxsize=32))
+_http.mount("https://", HTTPAdapter(pool_connections=len(SHOPS), pool_maxsize=32))
+
+# One pool per shop: a stalled shop keeps its threads until its own timeout, so it can
+# use up its own pool but searches of the other shops never queue behind it.
+_shop_executors = {
+    shop: ThreadPoolExecutor(max_workers=SHOP_SEARCH_THREADS, thread_name_prefix=f"shop-search-{shop}")
+    for shop in SHOPS
+}
+
+# Concurrent price lookups for the same title share one sweep.
+price_flight = SingleFlight("find_prices")
+
+offers_cache = CacheLayer("offers", OFFERS_CACHE_TTL_SECONDS)
+
+
+def _offers_key(shop: str, book_title: str) -> str:
+    return f"{shop}|{book_title.strip().lower()}"
+
+
+def _search_shop(shop: str, book_title: str, timeout: float = SHOP_REQUEST_TIMEOUT_SECONDS) -> dict:
+    with timed("shop_search", shop=shop) as span:
+        result = _search_shop_request(shop, book_title, timeout)
+    get_shop_health(shop).record(not result.get("shop_failure"), span.duration)
+    # Cache offers and "not in this shop" answers, never failures.
+    if not result.get("shop_failure"):
+        offers_cache.set(_offers_key(shop, book_title), result)
+    return result
+
+
+def _search_shop_request(shop: str, book_title: str, timeout: float = SHOP_REQUEST_TIMEOUT_SECONDS) -> dict:
     try:
         url = f"{RETAILER_API_URL}/shops/{shop}/search"
-        res = requests.get(
+        res = _http.get(
             url,
             params={"title": book_title},
-            timeout=40,
+            timeout=timeout,
         )
 
         if res.status_code != 200:
@@ -21,6 +83,8 @@ def _search_shop(shop: str, book_title: str) -> dict:
                 "ok": False,
                 "shop": shop,
                 "error": f"HTTP {res.status_code}: {res.text}",
+                # 404 means "not in this shop"; only server errors count against its health.
+                "shop_failure": res.status_code >= 500 or res.status_code == 429,
             }
 
         data = res.json()
@@ -42,6 +106,7 @@ def _search_shop(shop: str, book_title: str) -> dict:
             "ok": False,
             "shop": shop,
             "error": str(e),
+            "shop_failure": True,
         }
 
 
@@ -49,22 +114,179 @@ def _search_shop(shop: str, book_title: str) -> dict:
 def find_prices(book_title: str) -> dict:
     """
     Search the book in all partner shops and return all offers.
+
+    Shops with a cached answer or an open circuit breaker are not asked. The
+    others are asked in one best-offer request when the retailer can answer it;
+    otherwise each is searched, bounded by a deadline: shops that have not
+    answered in time are listed in missing_shops (and in errors) and complete
+    is false.
+    """
+    with timed("find_prices"):
+        return price_flight.do(book_title.strip().lower(), lambda: _find_prices(book_title))
+
+
+def _best_offer_lookup(book_title: str, shops: List[str], timeout: float) -> Optional[dict]:
     """
+    Per-shop results (as _search_shop returns them) from one GET /best-offer for
+    the given shops, or None if the retailer could not answer within timeout.
+    Each shop's outcome feeds its breaker and the offers cache like a search of
+    that shop; shops the retailer gave up waiting for count as failures.
+    """
+    try:
+        with timed("best_offer_lookup") as span:
+            res = _http.get(
+                f"{RETAILER_API_URL}/best-offer",
+                # The retailer answers for the shops done by its deadline; the
+                # rest of the timeout covers the lookup and the response.
+                params={"title": book_title, "shops": ",".join(shops), "deadline": round(0.8 * timeout, 3)},
+                timeout=timeout,
+            )
+    except Exception:
+        return None
+
+    if res.status_code == 404:
+        data = {"offers": [], "errors": []}
+    elif res.status_code == 200:
+        data = res.json()
+    else:
+        return None
+
+    results = {
+        o["shop_id"]: {
+            "ok": True,
+            "offer": {
+                "shop": o["shop_id"],
+                "price": float(o["price"]) if o["stock"] else None,
+                "in_stock": bool(o["stock"]),
+                "store_title": o["title"],
+            },
+        }
+        for o in data.get("offers", [])
+        if o["shop_id"] in shops
+    }
+    for e in data.get("errors", []):
+        if e["shop_id"] in shops:
+            results[e["shop_id"]] = {
+                "ok": False,
+                "shop": e["shop_id"],
+                "error": f"HTTP {e['status_code']}: {e['detail']}",
+                "shop_failure": e["status_code"] >= 500 or e["status_code"] == 429,
+            }
+    for shop in shops:
+        # Not listed at all: the shop does not carry the title.
+        results.setdefault(shop, {
+            "ok": False,
+            "shop": shop,
+            "error": "HTTP 404: Book not found in this shop",
+            "shop_failure": False,
+        })
+
+    for shop, result in results.items():
+        get_shop_health(shop).record(not result.get("shop_failure"), span.duration)
+        if not result.get("shop_failure"):
+            offers_cache.set(_offers_key(shop, book_title), result)
+    return results
+
+
+def _find_prices(book_title: str) -> dict:
+    deadline = FIND_PRICES_DEADLINE_SECONDS
+    start = time.monotonic()
+    results = {}
+    allowed = []
+    for shop in SHOPS:
+        cached = offers_cache.get(_offers_key(shop, book_title))
+        if cached is not None:
+            results[shop] = cached
+        elif get_shop_health(shop).allow_request():
+            allowed.append(shop)
+        else:
+            results[shop] = {
+                "ok": False,
+                "shop": shop,
+                "error": "Skipped: circuit breaker is open after repeated failures",
+                "breaker_state": OPEN,
+            }
+
+    if BEST_OFFER_FAST_PATH and allowed:
+        indexed = _best_offer_lookup(
+            book_title, allowed, min(SHOP_REQUEST_TIMEOUT_SECONDS, deadline * BEST_OFFER_DEADLINE_FRACTION)
+        )
+        if indexed is not None:
+            results.update(indexed)
+            allowed = []
+        else:
+            REGISTRY.inc("bookbuy_best_offer_fallbacks_total")
+
+    hedge_after = SHOP_HEDGE_AFTER_SECONDS
+    # The deadline covers the whole sweep, a failed best-offer request included.
+    request_timeout = min(SHOP_REQUEST_TIMEOUT_SECONDS, deadline - (time.monotonic() - start))
+    if request_timeout <= 0:
+        allowed = []
+    searched_at = time.monotonic()
+
+    pending = {
+        _shop_executors[shop].submit(_search_shop, shop, book_title, request_timeout): shop for shop in allowed
+    }
+    hedged = set()
+
+    while pending:
+        now = time.monotonic()
+        remaining = deadline - (now - start)
+        if remaining <= 0:
+            break
+
+        wait_for = remaining
+        if hedge_after > 0 and now - searched_at < hedge_after:
+            wait_for = min(remaining, hedge_after - (now - searched_at))
+
+        done, _ = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+        for future in done:
+            shop = pending.pop(future)
+            if shop in results:
+                continue
+
+            result = future.result()
+            # A failed primary still has a chance if its hedge is in flight.
+            if not result["ok"] and shop in pending.values():
+                continue
+            results[shop] = result
+
+        pending = {f: s for f, s in pending.items() if s not in results}
+
+        if hedge_after > 0 and time.monotonic() - searched_at >= hedge_after:
+            for shop in set(pending.values()) - hedged:
+                hedged.add(shop)
+                REGISTRY.inc("bookbuy_shop_hedges_total", labels={"shop": shop})
+                pending[_shop_executors[shop].submit(_search_shop, shop, book_title, request_timeout)] = shop
+
     offers = []
     errors = []
+    for shop, result in results.items():
+        if result["ok"]:
+            offers.append(result["offer"])
+        else:
+            errors.append({
+                "shop": result["shop"],
+                "error": result["error"],
+                "breaker_state": get_shop_health(shop).state,
+            })
+
+    missing_shops = [shop for shop in SHOPS if shop not in results]
+    for shop in missing_shops:
+        REGISTRY.inc("bookbuy_find_prices_missing_shops_total", labels={"shop": shop})
+        errors.append({
+            "shop": shop,
+            "error": f"No response within the {deadline:g}s price-search deadline",
+            "breaker_state": get_shop_health(shop).state,
+        })
 
-    with ThreadPoolExecutor(max_workers=min(4, len(SHOPS))) as executor:
-        futures = [executor.submit(_search_shop, shop, book_title) for shop in SHOPS]
+    return _price_result(book_title, offers, errors, missing_shops)
 
-        for future in as_completed(futures):
-            result = future.result()
-            if result["ok"]:
-                offers.append(result["offer"])
-            else:
-                errors.append({
-                    "shop": result["shop"],
-                    "error": result["error"],
-                })
+
+def _price_result(book_title: str, offers: List[dict], errors: List[dict], missing_shops: List[str]) -> dict:
+    # Keep a stable shop order so the tool payload does not depend on thread timing.
+    offers.sort(key=lambda o: SHOPS.index(o["shop"]))
+    errors.sort(key=lambda e: SHOPS.index(e["shop"]))
 
     if not any(o["in_stock"] and o["price"] is not None for o in offers):
         return {
@@ -72,6 +294,9 @@ def find_prices(book_title: str) -> dict:
             "title": book_title,
             "offers": offers,
             "errors": errors,
+            "deadline_seconds": FIND_PRICES_DEADLINE_SECONDS,
+            "complete": not missing_shops,
+            "missing_shops": missing_shops,
         }
 
     return {
@@ -79,6 +304,9 @@ def find_prices(book_title: str) -> dict:
         "title": book_title,
         "offers": offers,
         "errors": errors,
+        "deadline_seconds": FIND_PRICES_DEADLINE_SECONDS,
+        "complete": not missing_shops,
+        "missing_shops": missing_shops,
     }
 
 
@@ -86,19 +314,70 @@ def find_prices(book_title: str) -> dict:
 def buy_book(shop_id: str, book_title: str, address: str, payment_token: str) -> dict:
     """
     Buy a book from a specific shop.
+
+    Transient failures (timeouts, 5xx, 429) are retried with the same
+    idempotency key, so the book is bought at most once.
     """
+    with timed("buy_book", shop=shop_id):
+        return _buy_book(shop_id, book_title, address, payment_token)
+
+
+def _buy_book(shop_id: str, book_title: str, address: str, payment_token: str) -> dict:
+    payload = {
+        "title": book_title,
+        "user_address": address,
+        "payment_token": payment_token,
+    }
+    idempotency_key = uuid.uuid4().hex
+
+    for attempt in range(1, BUY_MAX_ATTEMPTS + 1):
+        result = _buy_request_hedged(shop_id, payload, idempotency_key)
+        if not result.pop("retryable", False) or attempt == BUY_MAX_ATTEMPTS:
+            break
+        REGISTRY.inc("bookbuy_buy_retries_total", labels={"shop": shop_id})
+        time.sleep(BUY_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+
+    result["attempts"] = attempt
+    return result
+
+
+def _buy_request_hedged(shop_id: str, payload: dict, idempotency_key: str) -> dict:
+    if BUY_HEDGE_AFTER_SECONDS <= 0:
+        return _buy_request(shop_id, payload, idempotency_key)
+
+    first = _shop_executor.submit(_buy_request, shop_id, payload, idempotency_key)
+    done, _ = wait([first], timeout=BUY_HEDGE_AFTER_SECONDS)
+    if done:
+        return first.result()
+
+    # Same key: the shop runs the purchase once and hands both requests its result.
+    REGISTRY.inc("bookbuy_buy_hedges_total", labels={"shop": shop_id})
+    pending = {first, _shop_executor.submit(_buy_request, shop_id, payload, idempotency_key)}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            result = future.result()
+            if not result.get("retryable"):
+                return result
+    return result
+
+
+def _buy_request(shop_id: str, payload: dict, idempotency_key: str) -> dict:
+    book_title = payload["title"]
     try:
         buy_url = f"{RETAILER_API_URL}/shops/{shop_id}/buy"
-        payload = {
-            "title": book_title,
-            "user_address": address,
-            "payment_token": payment_token,
-        }
 
-        res = requests.post(buy_url, json=payload, timeout=40)
+        res = _http.post(
+            buy_url,
+            json=payload,
+            headers={"Idempotency-Key": idempotency_key},
+            timeout=BUY_REQUEST_TIMEOUT_SECONDS,
+        )
 
         if res.status_code == 200:
             data = res.json()
+            # Stock just changed at this shop.
+            offers_cache.delete(_offers_key(shop_id, book_title))
             return {
                 "status": "success",
                 "shop": shop_id,
@@ -111,6 +390,8 @@ def buy_book(shop_id: str, book_title: str, address: str, payment_token: str) ->
             "shop": shop_id,
             "title": book_title,
             "error": f"HTTP {res.status_code}: {res.text}",
+            # 409: the same purchase is still running at the shop.
+            "retryable": res.status_code >= 500 or res.status_code in (409, 429),
         }
 
     except Exception as e:
@@ -119,5 +400,6 @@ def buy_book(shop_id: str, book_title: str, address: str, payment_token: str) ->
             "shop": shop_id,
             "title": book_title,
             "error": str(e),
+            "retryable": True,
         }
 
@@ -1,3 +1,4 @@
+import os
 import pandas as pd
 from tqdm import tqdm
 from dotenv import load_dotenv
@@ -6,7 +7,7 @@ from langchain_openai import OpenAIEmbeddings
 from langchain_pinecone import PineconeVectorStore
 from langchain_text_splitters import TokenTextSplitter
 from langchain_core.documents import Document
-from typing import List
+from typing import Any, List
 
 from config import (
     OPENAI_API_KEY,
@@ -16,10 +17,22 @@ from config import (
     EMBEDDING_MODEL,
     CHUNK_SIZE,
     OVERLAP_RATIO,
+    LOCAL_INDEX_DIR,
 )
+from local_index import LocalVectorIndex
+from book_store import split_names
+from constraints import published_year
 
 load_dotenv()
 
+# With the local book store (book_store.py) serving full records, chunks only
+# need the title and the fields retrieval filters on (see constraints.py);
+# set INGEST_SLIM_METADATA=1 to upsert just those.
+SLIM_METADATA = os.getenv("INGEST_SLIM_METADATA", "0") == "1"
+# "pinecone", or "local" to write a LocalVectorIndex to LOCAL_INDEX_DIR instead.
+INGEST_TARGET = os.getenv("INGEST_TARGET", "pinecone")
+EMBED_BATCH_SIZE = 256
+
 
 def load_dataframe(csv_path: str) -> pd.DataFrame:
     """Loads the TED CSV file."""
@@ -31,7 +44,7 @@ def load_dataframe(csv_path: str) -> pd.DataFrame:
     return df
 
 
-def build_documents(df: pd.DataFrame) -> List[Document]:
+def build_documents(df: pd.DataFrame, slim_metadata: bool = SLIM_METADATA) -> List[Document]:
     splitter = TokenTextSplitter(
         chunk_size=CHUNK_SIZE,
         chunk_overlap=int(CHUNK_SIZE * OVERLAP_RATIO),
@@ -54,13 +67,17 @@ def build_documents(df: pd.DataFrame) -> List[Document]:
             f"Title: {title}, Categories: {categories}\n Description: {description}"
         )
 
+        # Filterable fields: numeric length and year, categories as a list for $in.
         base_metadata = {
             "title": title,
-            "authors": authors,
-            "categories": categories,
-            "publishedDate": row.get("publishedDate", ""),
+            "categories": list(split_names(categories)),
             "bookLength": row.get("bookLength", None),
+            "publishedYear": published_year(row.get("publishedDate")),
         }
+        if not slim_metadata:
+            base_metadata["authors"] = authors
+            base_metadata["publishedDate"] = row.get("publishedDate", "")
+        base_metadata = {k: v for k, v in base_metadata.items() if v is not None}
 
         book_docs = splitter.create_documents(
             texts=[text_for_embedding],
@@ -86,6 +103,25 @@ def get_pinecone_vectorstore(embeddings: OpenAIEmbeddings) -> PineconeVectorStor
     return vectorstore
 
 
+def _json_value(value: Any) -> Any:
+    """numpy scalars and NaN from pandas rows -> plain JSON values."""
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def build_local_index(documents: List[Document], embeddings: OpenAIEmbeddings) -> LocalVectorIndex:
+    texts = [d.page_content for d in documents]
+    vectors: List[List[float]] = []
+    for start in tqdm(range(0, len(texts), EMBED_BATCH_SIZE), desc="Embedding chunks"):
+        vectors.extend(embeddings.embed_documents(texts[start:start + EMBED_BATCH_SIZE]))
+
+    metadatas = [{k: _json_value(v) for k, v in d.metadata.items()} for d in documents]
+    return LocalVectorIndex.build(vectors, texts, metadatas)
+
+
 def main():
     if not OPENAI_API_KEY:
         raise ValueError("OPENAI_API_KEY is not set")
@@ -104,6 +140,11 @@ def main():
         base_url=OPENAI_BASE_URL,
     )
 
+    if INGEST_TARGET == "local":
+        print(f"🔹 Building local vector index in {LOCAL_INDEX_DIR}... {len(documents)}")
+        build_local_index(documents, embeddings).save(LOCAL_INDEX_DIR)
+        return
+
     print("🔹 Connecting to Pinecone index...")
     vectorstore = get_pinecone_vectorstore(embeddings)
 
@@ -0,0 +1,177 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics import REGISTRY
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Jobs waiting for a worker; POST /jobs answers 429 beyond this.
+JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", "100"))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+# Directory for job files, so every uvicorn worker on the host can answer GET /jobs/{id};
+# set it empty to keep jobs in the process that runs them.
+JOB_STORE_DIR = os.getenv("JOB_STORE_DIR", os.path.join(tempfile.gettempdir(), "bookbuy_jobs"))
+# The job directory is swept for expired files at most this often.
+JOB_SWEEP_INTERVAL_SECONDS = 60.0
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at JOB_QUEUE_LIMIT."""
+
+
+class Job:
+    def __init__(self, job_id: str, request: Dict[str, Any]):
+        self.job_id = job_id
+        self.request = request
+        self.status = QUEUED
+        self.steps: List[Dict[str, Any]] = []
+        self.result: Optional[Dict[str, Any]] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "steps": list(self.steps),
+            "result": self.result,
+        }
+
+
+class JobStore:
+    """
+    In-process job table with a bounded worker pool.
+
+    With JOB_STORE_DIR set, each job is also written to <dir>/<job_id>.json on
+    every status change and step, and lookups fall back to that file. Files
+    untouched for JOB_RETENTION_SECONDS are removed by whichever worker sweeps
+    the directory next, including files of jobs from other workers.
+    """
+    def __init__(
+        self,
+        workers: int = JOB_WORKERS,
+        queue_limit: int = JOB_QUEUE_LIMIT,
+        store_dir: Optional[str] = JOB_STORE_DIR,
+    ):
+        self.queue_limit = queue_limit
+        self.store_dir = store_dir
+        self.jobs: Dict[str, Job] = {}
+        self.queued = 0
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="agent-job")
+
+        if store_dir:
+            os.makedirs(store_dir, exist_ok=True)
+
+    def submit(self, request: Dict[str, Any], run: Callable[[Dict[str, Any], Callable[[Dict[str, Any]], None]], Dict[str, Any]]) -> Job:
+        """
+        Queue run(request, on_step) on the worker pool.
+        Raises QueueFullError when JOB_QUEUE_LIMIT jobs are already waiting.
+        """
+        with self._lock:
+            self._evict_expired()
+            if self.queued >= self.queue_limit:
+                REGISTRY.inc("bookbuy_jobs_rejected_total")
+                raise QueueFullError(f"{self.queued} jobs are already waiting")
+
+            job = Job(uuid.uuid4().hex, request)
+            self.jobs[job.job_id] = job
+            self.queued += 1
+            REGISTRY.set_gauge("bookbuy_jobs_queued", self.queued)
+
+        self._persist(job)
+        self._executor.submit(self._run, job, run)
+        return job
+
+    def _run(self, job: Job, run: Callable[..., Dict[str, Any]]) -> None:
+        with self._lock:
+            self.queued -= 1
+            REGISTRY.set_gauge("bookbuy_jobs_queued", self.queued)
+        job.status = RUNNING
+        job.started_at = time.time()
+        self._persist(job)
+
+        def on_step(step: Dict[str, Any]) -> None:
+            job.steps.append(step)
+            self._persist(job)
+
+        try:
+            job.result = run(job.request, on_step)
+            job.status = DONE if job.result.get("status") != "error" else FAILED
+        except Exception as e:
+            job.result = {"status": "error", "error": str(e), "response": None, "steps": list(job.steps)}
+            job.status = FAILED
+
+        job.finished_at = time.time()
+        REGISTRY.inc("bookbuy_jobs_finished_total", labels={"status": job.status})
+        self._persist(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+
+        path = self._path(job_id)
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        return None
+
+    def _path(self, job_id: str) -> Optional[str]:
+        if not self.store_dir or not all(c in "0123456789abcdef" for c in job_id):
+            return None
+        return os.path.join(self.store_dir, f"{job_id}.json")
+
+    def _persist(self, job: Job) -> None:
+        path = self._path(job.job_id)
+        if not path:
+            return
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job.to_dict(), f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+
+    def _evict_expired(self) -> None:
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+        now = time.time()
+        if self.store_dir and now - self._last_sweep >= JOB_SWEEP_INTERVAL_SECONDS:
+            self._last_sweep = now
+            self._sweep_store_dir(cutoff)
+
+    def _sweep_store_dir(self, cutoff: float) -> None:
+        """Remove job files (and leftover temp files) last written before cutoff."""
+        try:
+            entries = list(os.scandir(self.store_dir))
+        except OSError:
+            return
+        for entry in entries:
+            if not entry.name.endswith((".json", ".tmp")):
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                # Already removed by another worker, or rewritten meanwhile.
+                pass
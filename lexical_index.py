@@ -0,0 +1,173 @@
+"""
+BM25 index over book titles and authors, built from the local book store.
+
+Used by recommendation_tool to resolve prompts that name a specific book
+("buy Outrageously Alice by Phyllis Reynolds Naylor") without the vector
+search and curator LLM calls, and to fuse lexical with vector rankings.
+"""
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from book_store import BookDocStore, get_book_store
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Dropped from queries (not from titles): request phrasing rather than book words.
+STOPWORDS = frozenset(
+    "a an the of and or by to in on for with about from at is it me my i we you "
+    "want would like buy get order find please some any book books novel called titled named copy".split()
+)
+
+# Prompts that mention a book as a reference, not as the book to buy.
+REFERENCE_CUES = re.compile(
+    r"(?<!would )(?<!'d )\blike\b|\b(similar|such as|style of|reminds?|than|after reading|fans? of|instead of)\b",
+    re.IGNORECASE,
+)
+
+# A title right after one of these names the book to buy ("buy me a copy of ...", "the novel called ...").
+NAMING_CUE = re.compile(
+    r"\b(?:buy|order|purchase|get|called|titled|named)(?:\s+(?:me|us|a|an|the|copy|copies|of|book|novel|please|\d+))*\s*$"
+)
+# Quoted spans: "...", “...”, «...», and '...' not part of a word.
+QUOTED = re.compile(r"[\"“”«»]([^\"“”«»]+)[\"“”«»]|(?<!\w)['‘]([^'‘’]+)['’](?!\w)")
+# Without a cue, quotes or an author, a title must make up at least this share of the query's content words.
+NAMED_BOOK_MIN_COVERAGE = 0.75
+
+NAMED_BOOK_CANDIDATES = 20
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+def title_variants(title: str) -> List[List[str]]:
+    """The full title and its main part before a subtitle (":") or edition note ("(")."""
+    variants = [tokenize(title)]
+    main = re.split(r"[:(\[]", title, maxsplit=1)[0]
+    if main != title and tokenize(main):
+        variants.append(tokenize(main))
+    return variants
+
+
+class BM25Index:
+    """Inverted index over "title authors"; postings are NumPy arrays per term."""
+
+    def __init__(self, store: BookDocStore, k1: float = 1.2, b: float = 0.75):
+        self.store = store
+        self.k1 = k1
+        self.b = b
+
+        postings: Dict[str, Dict[int, int]] = {}
+        lengths = np.zeros(len(store), dtype=np.float32)
+        for row, title in enumerate(store.titles):
+            tokens = tokenize(title) + tokenize(" ".join(store.names[store.author_codes[row]]))
+            lengths[row] = len(tokens)
+            for token in tokens:
+                counts = postings.setdefault(token, {})
+                counts[row] = counts.get(row, 0) + 1
+
+        self.lengths = lengths
+        self.avg_length = float(lengths.mean()) if len(lengths) else 0.0
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {
+            token: (np.fromiter(counts.keys(), dtype=np.int32), np.fromiter(counts.values(), dtype=np.float32))
+            for token, counts in postings.items()
+        }
+
+    @classmethod
+    def from_book_store(cls, store: BookDocStore) -> "BM25Index":
+        return cls(store)
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def search(self, query: str, k: int = 10, excluded: Optional[Set[str]] = None) -> List[Tuple[int, float]]:
+        """Top-k (row, BM25 score) pairs, skipping lower-cased titles in excluded."""
+        terms = [t for t in dict.fromkeys(tokenize(query)) if t not in STOPWORDS and t in self.postings]
+        if not terms or not len(self):
+            return []
+
+        n = len(self)
+        scores = np.zeros(n, dtype=np.float32)
+        for term in terms:
+            rows, tf = self.postings[term]
+            idf = np.log(1.0 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * self.lengths[rows] / self.avg_length)
+            scores[rows] += idf * tf * (self.k1 + 1.0) / (tf + norm)
+
+        excluded = excluded or set()
+        hits = np.flatnonzero(scores)
+        order = hits[np.argsort(-scores[hits], kind="stable")]
+        results = []
+        for row in order:
+            if self.store.titles[row].lower() in excluded:
+                continue
+            results.append((int(row), float(scores[row])))
+            if len(results) == k:
+                break
+        return results
+
+    def match_named_book(self, query: str, excluded: Optional[Set[str]] = None) -> Optional[Tuple[int, float]]:
+        """
+        (row, score) of the book the query asks for by name, or None.
+
+        The book's title (or its main title, without subtitle) must appear in the
+        query as a phrase, and the query must name it rather than describe a topic
+        that happens to be a title ("a history of the civil war"): the title follows
+        a naming cue ("buy", "called", ...), is quoted, comes with one of the
+        authors' names, or makes up nearly all of the query. One-word titles always need
+        an author's name. Prompts that only use a book as a reference ("something
+        like ...") never match. The longest matching title wins, then the highest
+        BM25 score.
+        """
+        if REFERENCE_CUES.search(query):
+            return None
+
+        query_tokens = tokenize(query)
+        query_text = f" {' '.join(query_tokens)} "
+        query_set = set(query_tokens) - STOPWORDS
+        quoted = {" ".join(tokenize(a or b)) for a, b in QUOTED.findall(query)}
+
+        best: Optional[Tuple[int, int, float]] = None
+        for row, score in self.search(query, k=NAMED_BOOK_CANDIDATES, excluded=excluded):
+            authors = {t for t in tokenize(" ".join(self.store.names[self.store.author_codes[row]])) if len(t) > 2}
+            by_author = bool(authors & query_set)
+            for tokens in title_variants(self.store.titles[row]):
+                content = [t for t in tokens if t not in STOPWORDS]
+                phrase = " ".join(tokens)
+                position = query_text.find(f" {phrase} ")
+                if not content or position < 0:
+                    continue
+                if len(content) < 2:
+                    named = by_author
+                else:
+                    named = (
+                        by_author
+                        or phrase in quoted
+                        or bool(NAMING_CUE.search(query_text[:position]))
+                        or len(set(content)) >= NAMED_BOOK_MIN_COVERAGE * len(query_set)
+                    )
+                if not named:
+                    continue
+                if best is None or (len(tokens), score) > (best[1], best[2]):
+                    best = (row, len(tokens), score)
+                break
+
+        return (best[0], best[2]) if best is not None else None
+
+
+def fuse_rankings(rankings: Iterable[Tuple[List[str], float]], k: int, rrf_k: int = 60) -> List[str]:
+    """Weighted reciprocal rank fusion of (titles best first, weight) lists; returns the top-k titles."""
+    scores: Dict[str, float] = {}
+    for titles, weight in rankings:
+        for rank, title in enumerate(titles):
+            scores[title] = scores.get(title, 0.0) + weight / (rrf_k + rank + 1)
+    return sorted(scores, key=lambda t: scores[t], reverse=True)[:k]
+
+
+@lru_cache(maxsize=None)
+def get_lexical_index() -> BM25Index:
+    """Shared per process; empty when the book store is."""
+    return BM25Index.from_book_store(get_book_store())
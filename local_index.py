@@ -0,0 +1,551 @@
+"""
+File-backed local vector index, a drop-in for the Pinecone store (VECTOR_STORE=local).
+
+`INGEST_TARGET=local python ingest.py` writes the chunk embeddings and
+documents to LOCAL_INDEX_DIR. Each worker then keeps only a compressed copy
+of the vectors resident:
+
+  none  - the float32 matrix, exact search
+  int8  - one int8 code per dimension plus a float scale per vector (4x smaller)
+  pq    - product quantization: PQ_SUBSPACES uint8 codes per vector
+
+Quantized scores pick a shortlist of RESCORE_FACTOR * k rows, which is
+re-scored exactly against the float32 matrix, memory-mapped from disk so only
+the shortlisted rows are read.
+
+Quantizer codes and IVF lists saved next to the vectors carry the row count
+and a fingerprint of the vectors they were trained on (BUILD_FILE); files
+from an earlier build of the directory are retrained rather than reused.
+
+Large indexes also get an IVF layer: rows are grouped by their nearest k-means
+centroid and a query only scores the rows of its NPROBE nearest lists.
+"""
+import hashlib
+import json
+import os
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+LOCAL_INDEX_QUANTIZATION = os.getenv("LOCAL_INDEX_QUANTIZATION", "int8")
+RESCORE_FACTOR = int(os.getenv("LOCAL_INDEX_RESCORE_FACTOR", "4"))
+PQ_SUBSPACES = int(os.getenv("LOCAL_INDEX_PQ_SUBSPACES", "32"))
+# Number of IVF lists: "auto" is sqrt(rows) for indexes of IVF_MIN_ROWS or more
+# and none below that, where scanning every row is fast enough; "0" disables IVF.
+IVF_LISTS = os.getenv("LOCAL_INDEX_IVF_LISTS", "auto")
+IVF_MIN_ROWS = 100_000
+NPROBE = int(os.getenv("LOCAL_INDEX_NPROBE", "16"))
+
+# Rows quantized per step when training.
+SCAN_BLOCK_ROWS = 65536
+# int8 codes are widened to float32 in blocks of about this size, small enough
+# to stay in cache so the scan runs at float32 matrix-vector speed.
+INT8_SCAN_BLOCK_BYTES = 2 * 1024 * 1024
+KMEANS_SAMPLE = 20000
+
+VECTORS_FILE = "vectors.npy"
+DOCS_FILE = "docs.jsonl"
+IVF_FILE = "ivf.npz"
+# Row count and vectors fingerprint of the last save(); derived files store the same two keys.
+BUILD_FILE = "build.json"
+BUILD_KEYS = ("rows", "fingerprint")
+
+
+def matches_filter(metadata: Dict[str, Any], metadata_filter: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate the subset of Pinecone metadata filters used by the agent."""
+    if not metadata_filter:
+        return True
+
+    for field, condition in metadata_filter.items():
+        if field == "$and":
+            if not all(matches_filter(metadata, c) for c in condition):
+                return False
+            continue
+        if field == "$or":
+            if not any(matches_filter(metadata, c) for c in condition):
+                return False
+            continue
+
+        value = metadata.get(field)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        for op, expected in condition.items():
+            if op == "$eq" and value != expected:
+                return False
+            if op == "$ne" and value == expected:
+                return False
+            values = value if isinstance(value, list) else [value]
+            if op == "$in" and not any(v in expected for v in values):
+                return False
+            if op == "$nin" and any(v in expected for v in values):
+                return False
+            if op in ("$gt", "$gte", "$lt", "$lte"):
+                if value is None:
+                    return False
+                if op == "$gt" and not value > expected:
+                    return False
+                if op == "$gte" and not value >= expected:
+                    return False
+                if op == "$lt" and not value < expected:
+                    return False
+                if op == "$lte" and not value <= expected:
+                    return False
+
+    return True
+
+
+def vectors_fingerprint(vectors: np.ndarray) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((vectors.shape, vectors.dtype.str)).encode("utf-8"))
+    for start in range(0, len(vectors), SCAN_BLOCK_ROWS):
+        digest.update(np.ascontiguousarray(vectors[start:start + SCAN_BLOCK_ROWS]).tobytes())
+    return digest.hexdigest()
+
+
+def normalize_rows(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return (x / np.where(norms > 0, norms, 1.0)).astype(np.float32)
+
+
+def kmeans(x: np.ndarray, clusters: int, iterations: int = 15, seed: int = 0) -> np.ndarray:
+    """Lloyd's k-means on (a sample of) x; returns float32 centroids."""
+    rng = np.random.default_rng(seed)
+    if len(x) > KMEANS_SAMPLE:
+        x = x[rng.choice(len(x), KMEANS_SAMPLE, replace=False)]
+    x = np.asarray(x, dtype=np.float32)
+    clusters = min(clusters, len(x))
+
+    centroids = x[rng.choice(len(x), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        # argmin ||x - c||^2 == argmax (x.c - ||c||^2 / 2)
+        assign = np.argmax(x @ centroids.T - 0.5 * (centroids ** 2).sum(axis=1), axis=1)
+        counts = np.bincount(assign, minlength=clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, x)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        centroids[empty] = x[rng.integers(len(x), size=int(empty.sum()))]
+    return centroids
+
+
+def ivf_lists_for(rows: int, setting: str = IVF_LISTS) -> int:
+    if setting == "auto":
+        return int(np.sqrt(rows)) if rows >= IVF_MIN_ROWS else 0
+    return int(setting)
+
+
+def top_rows(scores: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the n highest finite scores, best first."""
+    n = min(n, len(scores))
+    if n <= 0:
+        return np.empty(0, dtype=np.int64)
+    idx = np.argpartition(-scores, n - 1)[:n]
+    idx = idx[np.argsort(-scores[idx], kind="stable")]
+    return idx[np.isfinite(scores[idx])]
+
+
+class Int8Quantizer:
+    """Symmetric per-vector int8 codes: v ~= codes * scale."""
+    kind = "int8"
+
+    def __init__(self, codes: np.ndarray, scales: np.ndarray):
+        self.codes = codes
+        self.scales = scales
+
+    @classmethod
+    def train(cls, vectors: np.ndarray) -> "Int8Quantizer":
+        codes = np.empty(vectors.shape, dtype=np.int8)
+        scales = np.empty(len(vectors), dtype=np.float32)
+        for start in range(0, len(vectors), SCAN_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + SCAN_BLOCK_ROWS], dtype=np.float32)
+            scale = np.abs(block).max(axis=1) / 127.0
+            scale[scale == 0] = 1.0
+            codes[start:start + len(block)] = np.round(block / scale[:, None]).astype(np.int8)
+            scales[start:start + len(block)] = scale
+        return cls(codes, scales)
+
+    def scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        if rows is not None:
+            return (self.codes[rows].astype(np.float32) @ query) * self.scales[rows]
+        out = np.empty(len(self.codes), dtype=np.float32)
+        step = max(64, INT8_SCAN_BLOCK_BYTES // (4 * self.codes.shape[1]))
+        for start in range(0, len(self.codes), step):
+            end = start + step
+            out[start:end] = self.codes[start:end].astype(np.float32) @ query
+        out *= self.scales
+        return out
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {"codes": self.codes, "scales": self.scales}
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.scales.nbytes
+
+
+class ProductQuantizer:
+    """Splits vectors into subspaces with a 256-centroid codebook each; scores by table lookup."""
+    kind = "pq"
+
+    def __init__(self, codes: np.ndarray, codebooks: np.ndarray):
+        self.codes = codes  # (n, subspaces) uint8
+        self.codebooks = codebooks  # (subspaces, 256, dim / subspaces) float32
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, subspaces: int = PQ_SUBSPACES, seed: int = 0) -> "ProductQuantizer":
+        dim = vectors.shape[1]
+        if dim % subspaces:
+            raise ValueError(f"Vector dimension {dim} is not divisible by {subspaces} PQ subspaces")
+        width = dim // subspaces
+
+        codebooks = np.zeros((subspaces, 256, width), dtype=np.float32)
+        codes = np.empty((len(vectors), subspaces), dtype=np.uint8)
+        for s in range(subspaces):
+            part = np.asarray(vectors[:, s * width:(s + 1) * width], dtype=np.float32)
+            centroids = kmeans(part, 256, seed=seed + s)
+            codebooks[s, :len(centroids)] = centroids
+            half_norms = 0.5 * (centroids ** 2).sum(axis=1)
+            for start in range(0, len(part), SCAN_BLOCK_ROWS):
+                block = part[start:start + SCAN_BLOCK_ROWS]
+                codes[start:start + len(block), s] = np.argmax(block @ centroids.T - half_norms, axis=1)
+        return cls(codes, codebooks)
+
+    def scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        subspaces, _, width = self.codebooks.shape
+        # tables[s, c] = query part s . centroid c of subspace s
+        tables = np.einsum("scw,sw->sc", self.codebooks, query.reshape(subspaces, width))
+        codes = self.codes if rows is None else self.codes[rows]
+        out = np.zeros(len(codes), dtype=np.float32)
+        for s in range(subspaces):
+            out += tables[s][codes[:, s]]
+        return out
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {"codes": self.codes, "codebooks": self.codebooks}
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.codebooks.nbytes
+
+
+QUANTIZERS = {"int8": Int8Quantizer, "pq": ProductQuantizer}
+
+
+class IVFLists:
+    """Inverted lists: row numbers grouped by nearest centroid, list c at order[offsets[c]:offsets[c + 1]]."""
+
+    def __init__(self, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray):
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, lists: int, seed: int = 0) -> "IVFLists":
+        centroids = normalize_rows(kmeans(vectors, lists, seed=seed))
+        assign = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), SCAN_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + SCAN_BLOCK_ROWS], dtype=np.float32)
+            assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+
+        order = np.argsort(assign, kind="stable").astype(np.int32)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=len(centroids)))]).astype(np.int64)
+        return cls(centroids, order, offsets)
+
+    @property
+    def lists(self) -> int:
+        return len(self.centroids)
+
+    def probe(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Rows of the nprobe lists whose centroids are closest to the query."""
+        nearest = top_rows(self.centroids @ query, nprobe)
+        return np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in nearest])
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {"centroids": self.centroids, "order": self.order, "offsets": self.offsets}
+
+    @property
+    def nbytes(self) -> int:
+        return self.centroids.nbytes + self.order.nbytes + self.offsets.nbytes
+
+
+class LocalVectorIndex:
+    """Cosine-similarity search over normalized chunk vectors with per-row metadata."""
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        quantizer: Optional[Any] = None,
+        rescore_factor: int = RESCORE_FACTOR,
+        ivf: Optional[IVFLists] = None,
+        nprobe: int = NPROBE,
+    ):
+        self.vectors = vectors
+        self.texts = texts
+        self.metadatas = metadatas
+        self.quantizer = quantizer
+        self.rescore_factor = rescore_factor
+        self.ivf = ivf
+        self.nprobe = nprobe
+        # Identifies the vectors derived files were built from; set by save() and load().
+        self.fingerprint = ""
+
+        self.rows_by_title: Dict[str, List[int]] = {}
+        for row, metadata in enumerate(metadatas):
+            self.rows_by_title.setdefault(metadata.get("title", ""), []).append(row)
+
+    @classmethod
+    def build(
+        cls,
+        vectors: Iterable[List[float]],
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        quantization: str = LOCAL_INDEX_QUANTIZATION,
+        ivf_lists: Optional[int] = None,
+    ) -> "LocalVectorIndex":
+        matrix = normalize_rows(np.asarray(list(vectors), dtype=np.float32))
+        quantizer = QUANTIZERS[quantization].train(matrix) if quantization != "none" else None
+        lists = ivf_lists_for(len(matrix)) if ivf_lists is None else ivf_lists
+        ivf = IVFLists.train(matrix, lists) if lists > 0 else None
+        return cls(matrix, texts, metadatas, quantizer, ivf=ivf)
+
+    def save(self, path: str) -> None:
+        """Write the index; quantizer codes and IVF lists of an earlier build in path are removed."""
+        os.makedirs(path, exist_ok=True)
+        self.fingerprint = vectors_fingerprint(self.vectors)
+        for kind in QUANTIZERS:
+            if self.quantizer is None or kind != self.quantizer.kind:
+                _remove(os.path.join(path, f"{kind}.npz"))
+        if self.ivf is None:
+            _remove(os.path.join(path, IVF_FILE))
+        np.save(os.path.join(path, VECTORS_FILE), self.vectors)
+        with open(os.path.join(path, DOCS_FILE), "w", encoding="utf-8") as f:
+            for text, metadata in zip(self.texts, self.metadatas):
+                f.write(json.dumps({"text": text, "metadata": metadata}, ensure_ascii=False) + "\n")
+        with open(os.path.join(path, BUILD_FILE), "w", encoding="utf-8") as f:
+            json.dump({"rows": len(self.vectors), "fingerprint": self.fingerprint}, f)
+        if self.quantizer is not None:
+            self._save_quantizer(path)
+        if self.ivf is not None:
+            self._save_ivf(path)
+
+    def _save_ivf(self, path: str) -> None:
+        np.savez(os.path.join(path, IVF_FILE), **self.ivf.arrays(), **self._build_arrays())
+
+    def _save_quantizer(self, path: str) -> None:
+        np.savez(os.path.join(path, f"{self.quantizer.kind}.npz"), **self.quantizer.arrays(), **self._build_arrays())
+
+    def _build_arrays(self) -> Dict[str, np.ndarray]:
+        return {"rows": np.array(len(self.vectors)), "fingerprint": np.array(self.fingerprint)}
+
+    def _load_derived(self, file_path: str) -> Optional[Dict[str, np.ndarray]]:
+        """Arrays of a saved quantizer / IVF file, or None if it is missing or was built from other vectors."""
+        if not os.path.exists(file_path):
+            return None
+        with np.load(file_path) as arrays:
+            if any(key not in arrays.files for key in BUILD_KEYS):
+                return None
+            if int(arrays["rows"]) != len(self.vectors) or str(arrays["fingerprint"]) != self.fingerprint:
+                return None
+            return {k: arrays[k] for k in arrays.files if k not in BUILD_KEYS}
+
+    @classmethod
+    def load(
+        cls,
+        path: str,
+        quantization: str = LOCAL_INDEX_QUANTIZATION,
+        rescore_factor: int = RESCORE_FACTOR,
+        ivf_lists: str = IVF_LISTS,
+        nprobe: int = NPROBE,
+    ) -> "LocalVectorIndex":
+        """
+        Load an index written by save(). Quantized indexes memory-map the float32
+        vectors; codes and IVF lists missing on disk (or left from an earlier
+        build) are trained now and saved for the next worker.
+        """
+        vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode=None if quantization == "none" else "r")
+        texts, metadatas = [], []
+        with open(os.path.join(path, DOCS_FILE), encoding="utf-8") as f:
+            for line in f:
+                doc = json.loads(line)
+                texts.append(doc["text"])
+                metadatas.append(doc["metadata"])
+
+        index = cls(vectors, texts, metadatas, rescore_factor=rescore_factor, nprobe=nprobe)
+        build_path = os.path.join(path, BUILD_FILE)
+        if os.path.exists(build_path):
+            with open(build_path, encoding="utf-8") as f:
+                build = json.load(f)
+            if build.get("rows") == len(vectors):
+                index.fingerprint = build.get("fingerprint", "")
+        if quantization != "none":
+            codes_path = os.path.join(path, f"{quantization}.npz")
+            codes = index._load_derived(codes_path)
+            if codes is not None:
+                index.quantizer = QUANTIZERS[quantization](**codes)
+            else:
+                index.quantizer = QUANTIZERS[quantization].train(vectors)
+                try:
+                    index._save_quantizer(path)
+                except OSError:
+                    pass
+
+        lists = index._load_derived(os.path.join(path, IVF_FILE)) if ivf_lists != "0" else None
+        if lists is not None:
+            index.ivf = IVFLists(**lists)
+        elif ivf_lists_for(len(vectors), ivf_lists) > 0:
+            index.ivf = IVFLists.train(vectors, ivf_lists_for(len(vectors), ivf_lists))
+            try:
+                index._save_ivf(path)
+            except OSError:
+                pass
+        return index
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    @property
+    def resident_bytes(self) -> int:
+        """Bytes of vector data kept in memory (memory-mapped float vectors excluded)."""
+        ivf_bytes = self.ivf.nbytes if self.ivf is not None else 0
+        if self.quantizer is None:
+            return self.vectors.nbytes + ivf_bytes
+        return self.quantizer.nbytes + ivf_bytes
+
+    def _split_filter(
+        self, metadata_filter: Optional[Dict[str, Any]]
+    ) -> Tuple[List[int], Optional[np.ndarray], Optional[Callable[[Dict[str, Any]], bool]]]:
+        """
+        Title conditions become row sets: excluded rows ($nin) and the only
+        allowed rows ($in, None when unrestricted). Any other condition is
+        checked per candidate.
+        """
+        if not metadata_filter:
+            return [], None, None
+
+        rest = dict(metadata_filter)
+        excluded_rows: List[int] = []
+        allowed_rows: Optional[np.ndarray] = None
+        title = rest.get("title")
+        if isinstance(title, dict) and set(title) <= {"$in", "$nin"}:
+            del rest["title"]
+            for t in title.get("$nin", ()):
+                excluded_rows.extend(self.rows_by_title.get(t, ()))
+            if "$in" in title:
+                allowed_rows = np.array(
+                    sorted({row for t in title["$in"] for row in self.rows_by_title.get(t, ())}), dtype=np.int64
+                )
+
+        predicate = (lambda metadata: matches_filter(metadata, rest)) if rest else None
+        return excluded_rows, allowed_rows, predicate
+
+    def _candidate_scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        if self.quantizer is not None:
+            return self.quantizer.scores(query, rows)
+        if rows is not None:
+            return self.vectors[rows] @ query
+        return self.vectors @ query
+
+    def search(
+        self,
+        query: List[float],
+        k: int = 4,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        nprobe: Optional[int] = None,
+    ) -> List[Tuple[int, float]]:
+        """Top-k (row, cosine similarity) pairs, best first."""
+        if not len(self) or k <= 0:
+            return []
+        q = normalize_rows(np.asarray(query, dtype=np.float32))
+        _, allowed_rows, _ = self._split_filter(metadata_filter)
+        if allowed_rows is not None:
+            # A title $in filter names a few books: score just their rows.
+            return self._select(q, allowed_rows, self._candidate_scores(q, allowed_rows), k, metadata_filter)
+        if self.ivf is None:
+            return self._select(q, np.arange(len(self)), self._candidate_scores(q), k, metadata_filter)
+
+        nprobe = nprobe or self.nprobe
+        while True:
+            rows = self.ivf.probe(q, nprobe)
+            found = self._select(q, rows, self._candidate_scores(q, rows), k, metadata_filter)
+            # Filters can empty the probed lists; widen the probe rather than return too few.
+            if len(found) >= k or nprobe >= self.ivf.lists:
+                return found
+            nprobe *= 4
+
+    def _select(
+        self,
+        q: np.ndarray,
+        rows: np.ndarray,
+        scores: np.ndarray,
+        k: int,
+        metadata_filter: Optional[Dict[str, Any]],
+    ) -> List[Tuple[int, float]]:
+        """Filter and (for quantized scores) re-score candidate rows with approximate scores."""
+        excluded_rows, allowed_rows, predicate = self._split_filter(metadata_filter)
+        if excluded_rows or allowed_rows is not None:
+            scores = scores.copy()
+            if excluded_rows:
+                scores[np.isin(rows, excluded_rows)] = -np.inf
+            if allowed_rows is not None:
+                scores[~np.isin(rows, allowed_rows)] = -np.inf
+
+        rescore = self.quantizer is not None and self.rescore_factor > 0
+        wanted = k * self.rescore_factor if rescore else k
+
+        pool = wanted
+        while True:
+            picked = top_rows(scores, pool)
+            if predicate is not None:
+                picked = picked[np.fromiter((predicate(self.metadatas[rows[i]]) for i in picked), dtype=bool, count=len(picked))]
+            if len(picked) >= wanted or pool >= len(rows):
+                break
+            pool *= 4
+        picked = picked[:wanted]
+
+        if rescore:
+            candidates = np.sort(rows[picked])
+            exact = np.asarray(self.vectors[candidates], dtype=np.float32) @ q
+            best = np.argsort(-exact, kind="stable")[:k]
+            return [(int(candidates[i]), float(exact[i])) for i in best]
+        return [(int(rows[i]), float(scores[i])) for i in picked[:k]]
+
+
+def _remove(file_path: str) -> None:
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+
+
+class LocalVectorStore:
+    """The subset of PineconeVectorStore used by recommendation_tool, over a LocalVectorIndex."""
+
+    def __init__(self, index: LocalVectorIndex, embedding: Any):
+        self.index = index
+        self._embedding = embedding
+
+    @property
+    def embeddings(self) -> Any:
+        return self._embedding
+
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        return [
+            (Document(page_content=self.index.texts[row], metadata=dict(self.index.metadatas[row])), score)
+            for row, score in self.index.search(embedding, k=k, metadata_filter=filter)
+        ]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter=None, **kwargs) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k=k, filter=filter)
+
+    def similarity_search(self, query: str, k: int = 4, filter=None, **kwargs) -> List[Document]:
+        return [d for d, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
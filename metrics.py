@@ -0,0 +1,215 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Tuple, List, Callable, Optional
+
+STAGE_DURATION = "bookbuy_stage_duration_seconds"
+
+# Upper bounds in seconds, spanning a cache hit up to the 40s shop timeout.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 60.0)
+
+HELP = {
+    STAGE_DURATION: "Time spent in each agent stage.",
+    "bookbuy_shop_hedges_total": "Second search requests sent to shops that were slow to answer.",
+    "bookbuy_find_prices_missing_shops_total": "Shops that did not answer before the find_prices deadline.",
+    "bookbuy_shop_breaker_state": "Shop circuit breaker state (0 closed, 1 half-open, 2 open).",
+    "bookbuy_shop_breaker_skips_total": "Shop requests skipped because the circuit breaker was open.",
+    "bookbuy_shop_error_rate": "Shop error rate over the breaker's rolling window.",
+    "bookbuy_shop_latency_ewma_seconds": "Exponentially weighted moving average of shop search latency.",
+    "bookbuy_shop_health_score": "Shop health score: (1 - error rate) / (1 + latency EWMA).",
+    "bookbuy_singleflight_executions_total": "Calls that ran the underlying work (single-flight leaders).",
+    "bookbuy_singleflight_shared_total": "Calls that received the result of an identical in-flight call.",
+    "bookbuy_singleflight_in_flight": "Distinct keys currently in flight.",
+    "bookbuy_jobs_queued": "Agent jobs waiting for a worker.",
+    "bookbuy_jobs_rejected_total": "Jobs rejected with HTTP 429 because the queue was full.",
+    "bookbuy_jobs_finished_total": "Agent jobs finished, by final status.",
+    "bookbuy_best_offer_fallbacks_total": "Price lookups that fell back to searching every shop because the best-offer index failed.",
+    "bookbuy_buy_retries_total": "Purchases retried with the same idempotency key after a transient failure.",
+    "bookbuy_buy_hedges_total": "Second purchase requests sent (same idempotency key) to shops that were slow to answer.",
+    "bookbuy_rag_refetch_total": "Vector searches repeated with a larger k because excluded titles or repeated chunks left too few distinct books.",
+    "bookbuy_constraint_relaxations_total": "Vector searches repeated with a looser constraint filter because too few books matched.",
+    "bookbuy_curator_degraded_total": "Recommendations answered without a curator LLM call, by stage and reason (budget, timeout, error).",
+    "bookbuy_curator_latency_ewma_seconds": "Exponentially weighted moving average of curator LLM call latency, by stage.",
+    "bookbuy_exclusion_full_filter_total": "Vector searches that fell back to sending the whole exclusion list as a filter.",
+    "bookbuy_cache_operations_total": "Cache lookups and writes, by namespace and result (hits, misses, sets).",
+    "bookbuy_cache_errors_total": "Shared cache operations that failed (e.g. database is locked) and were treated as a miss or skipped.",
+    "bookbuy_cache_evictions_total": "Cache entries removed by expiry or size-based eviction.",
+    "bookbuy_cache_bytes": "Bytes of cached payload in the shared SQLite cache after the last eviction pass.",
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect plus two additions under a lock."""
+    __slots__ = ("buckets", "counts", "total", "count", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.total += value
+            self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Bucket upper bound containing the q-quantile (coarse, for dashboards and logs)."""
+        with self._lock:
+            counts = list(self.counts)
+            count = self.count
+        if not count:
+            return 0.0
+
+        target = q * count
+        seen = 0
+        for bound, c in zip(self.buckets + (float("inf"),), counts):
+            seen += c
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+class MetricsRegistry:
+    """
+    Process-local registry of histograms, counters and gauges.
+    Each uvicorn worker exposes its own registry.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self.counters: Dict[str, Dict[LabelKey, float]] = {}
+        self.gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._observers: List[Callable[[str, float, Dict[str, str]], None]] = []
+
+    @staticmethod
+    def _key(labels: Optional[Dict[str, str]]) -> LabelKey:
+        return tuple(sorted((k, str(v)) for k, v in (labels or {}).items()))
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        key = self._key(labels)
+        family = self.histograms.get(name)
+        hist = family.get(key) if family is not None else None
+
+        if hist is None:
+            with self._lock:
+                family = self.histograms.setdefault(name, {})
+                hist = family.setdefault(key, Histogram())
+
+        hist.observe(value)
+
+        for observer in self._observers:
+            observer(name, value, dict(key))
+
+    def inc(self, name: str, value: float = 1.0, labels: Optional[Dict[str, str]] = None) -> None:
+        key = self._key(labels)
+        with self._lock:
+            family = self.counters.setdefault(name, {})
+            family[key] = family.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self.gauges.setdefault(name, {})[key] = value
+
+    def add_observer(self, observer: Callable[[str, float, Dict[str, str]], None]) -> None:
+        """Register a callback that receives every histogram observation (used by benchmarks)."""
+        self._observers.append(observer)
+
+    def remove_observer(self, observer: Callable[[str, float, Dict[str, str]], None]) -> None:
+        if observer in self._observers:
+            self._observers.remove(observer)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.histograms = {}
+            self.counters = {}
+            self.gauges = {}
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format (0.0.4)."""
+        lines: List[str] = []
+
+        with self._lock:
+            histograms = {n: dict(f) for n, f in self.histograms.items()}
+            counters = {n: dict(f) for n, f in self.counters.items()}
+            gauges = {n: dict(f) for n, f in self.gauges.items()}
+
+        for name in sorted(histograms):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, hist in sorted(histograms[name].items()):
+                with hist._lock:
+                    counts = list(hist.counts)
+                    total = hist.total
+                    count = hist.count
+                cumulative = 0
+                for bound, c in zip(hist.buckets, counts):
+                    cumulative += c
+                    lines.append(f"{name}_bucket{_labels(key, le=_fmt(bound))} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(key, le='+Inf')} {count}")
+                lines.append(f"{name}_sum{_labels(key)} {_fmt(total)}")
+                lines.append(f"{name}_count{_labels(key)} {count}")
+
+        for kind, families in (("counter", counters), ("gauge", gauges)):
+            for name in sorted(families):
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, value in sorted(families[name].items()):
+                    lines.append(f"{name}{_labels(key)} {_fmt(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _fmt(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() and abs(value) < 1e15 else repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(key: LabelKey, **extra: str) -> str:
+    pairs = list(key) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+REGISTRY = MetricsRegistry()
+
+
+class timed:
+    """
+    Context manager recording the block's duration under bookbuy_stage_duration_seconds.
+
+        with timed("embedding") as span:
+            ...
+        span.duration_ms
+    """
+    __slots__ = ("stage", "labels", "start", "duration")
+
+    def __init__(self, stage: str, **labels: str):
+        self.stage = stage
+        self.labels = labels
+        self.start = 0.0
+        self.duration = 0.0
+
+    def __enter__(self) -> "timed":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.duration = time.perf_counter() - self.start
+        REGISTRY.observe(STAGE_DURATION, self.duration, {"stage": self.stage, **self.labels})
+        return False
+
+    @property
+    def duration_ms(self) -> float:
+        return round(self.duration * 1000, 1)
@@ -0,0 +1,36 @@
+"""
+Cross-shop best offer for one title.
+
+Every lookup asks each shop's catalog for that single key (a binary search in
+the shared mmap file, a dict probe in a compact catalog, one pipe round trip in
+sharded mode), so there is no per-worker copy of the catalogs to build or keep
+in sync with purchases and restocks made by other workers.
+"""
+from typing import Iterable, Mapping, Optional
+
+
+def lookup_offers(catalogs: Mapping[str, Mapping], key: str, shops: Optional[Iterable[str]] = None) -> Optional[dict]:
+    """
+    Offers of the given shops (default: all) for a normalized title, cheapest
+    first (then in shop order), and the cheapest one in stock; None if no shop
+    carries the title.
+    """
+    offers = []
+    for shop_idx, shop in enumerate(shops if shops is not None else catalogs):
+        book = catalogs[shop].get(key)
+        if book is None:
+            continue
+        offers.append((book["price"], shop_idx, {
+            "shop_id": shop,
+            "title": book["Title"],
+            "price": book["price"],
+            "stock": book["quantity"] > 0,
+            "quantity": book["quantity"],
+        }))
+
+    if not offers:
+        return None
+
+    offers.sort(key=lambda o: o[:2])
+    result = [offer for _, _, offer in offers]
+    return {"offers": result, "best": next((o for o in result if o["stock"]), None)}
@@ -0,0 +1,32 @@
+"""Reading shop catalog CSVs into (title, price, quantity, categories) rows."""
+import os
+from typing import Iterator, Tuple
+
+import pandas as pd
+
+# Copies of each in-stock book when the catalog has no "quantity" column.
+DEFAULT_STOCK_QUANTITY = int(os.getenv("MOCK_RETAILER_DEFAULT_STOCK", "20"))
+
+
+def read_catalog_rows(file_path: str) -> Iterator[Tuple[str, float, int, str]]:
+    """Yield (title, price, quantity, categories) for every titled row of a catalog CSV."""
+    df = pd.read_csv(file_path)
+    has_categories = "categories" in df.columns
+    has_quantity = "quantity" in df.columns
+
+    for _, row in df.iterrows():
+        title = str(row["Title"]).strip()
+        if not title:
+            continue
+
+        if has_quantity and pd.notna(row["quantity"]):
+            quantity = int(row["quantity"])
+        else:
+            quantity = DEFAULT_STOCK_QUANTITY if bool(row["stock"]) else 0
+
+        yield (
+            title,
+            float(row["price"]),
+            quantity,
+            str(row["categories"]) if has_categories and pd.notna(row["categories"]) else "Unknown",
+        )
@@ -0,0 +1,148 @@
+"""
+In-process catalog stored as parallel arrays instead of one dict per book.
+
+Per book this keeps the title string, one index entry, a float32 price, a
+category code and an int32 stock quantity, instead of a four-key dict with its
+own price/bool/category objects.
+"""
+import os
+import threading
+from array import array
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+# Purchases lock one of these stripes (row % STOCK_LOCK_STRIPES), so buys of
+# different titles rarely wait on each other.
+STOCK_LOCK_STRIPES = int(os.getenv("MOCK_RETAILER_STOCK_LOCK_STRIPES", "64"))
+
+
+class BookRecord:
+    """One catalog row; supports book["Title"] like the old per-book dicts."""
+    __slots__ = ("Title", "price", "stock", "categories", "quantity")
+
+    def __init__(self, title: str, price: float, quantity: int, categories: str):
+        self.Title = title
+        self.price = price
+        self.stock = quantity > 0
+        self.categories = categories
+        self.quantity = quantity
+
+    def __getitem__(self, field: str):
+        try:
+            return getattr(self, field)
+        except AttributeError:
+            raise KeyError(field) from None
+
+    def get(self, field: str, default=None):
+        return getattr(self, field, default)
+
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"BookRecord({self.to_dict()!r})"
+
+
+class CompactCatalog(Mapping):
+    """Read API of a dict keyed by lower-cased title; values are built on access."""
+
+    def __init__(self):
+        self.titles: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.prices = array("f")
+        self.category_codes = array("H")
+        self.categories: List[str] = []
+        self._category_index: Dict[str, int] = {}
+        self.quantities = array("i")
+        self.initial_quantities = array("i")
+        self._stock_locks = [threading.Lock() for _ in range(STOCK_LOCK_STRIPES)]
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[str, float, int, str]]) -> "CompactCatalog":
+        """Build from (title, price, quantity, categories); later rows win for duplicate titles."""
+        catalog = cls()
+        for title, price, quantity, categories in rows:
+            catalog.add(title, price, quantity, categories)
+        return catalog
+
+    def add(self, title: str, price: float, quantity: int, categories: str) -> None:
+        key = title.strip().lower()
+        code = self._category_index.get(categories)
+        if code is None:
+            code = self._category_index[categories] = len(self.categories)
+            self.categories.append(categories)
+
+        row = self.index.get(key)
+        if row is None:
+            self.index[key] = len(self.titles)
+            # Reuse the title object as the key when it is already normalized.
+            self.titles.append(key if key == title else title)
+            self.prices.append(price)
+            self.category_codes.append(code)
+            self.quantities.append(quantity)
+            self.initial_quantities.append(quantity)
+        else:
+            self.titles[row] = title
+            self.prices[row] = price
+            self.category_codes[row] = code
+            self.quantities[row] = quantity
+            self.initial_quantities[row] = quantity
+
+    def find_row(self, key: str) -> Optional[int]:
+        return self.index.get(key)
+
+    def record(self, row: int) -> BookRecord:
+        return BookRecord(
+            self.titles[row],
+            # float32 storage; catalog prices have two decimals.
+            round(self.prices[row], 2),
+            self.quantities[row],
+            self.categories[self.category_codes[row]],
+        )
+
+    def decrement_stock(self, key: str, amount: int = 1) -> Optional[int]:
+        """
+        Atomically take amount copies of a book.
+        Returns the remaining quantity, or None if there were not enough copies.
+        Raises KeyError for unknown titles.
+        """
+        row = self.index[key]
+        with self._stock_locks[row % STOCK_LOCK_STRIPES]:
+            remaining = self.quantities[row] - amount
+            if remaining < 0:
+                return None
+            self.quantities[row] = remaining
+        return remaining
+
+    def set_quantity(self, key: str, quantity: int) -> None:
+        row = self.index[key]
+        with self._stock_locks[row % STOCK_LOCK_STRIPES]:
+            self.quantities[row] = quantity
+
+    def reset_stock(self) -> None:
+        """Restore every quantity to its catalog value."""
+        for lock in self._stock_locks:
+            lock.acquire()
+        try:
+            self.quantities[:] = self.initial_quantities
+        finally:
+            for lock in self._stock_locks:
+                lock.release()
+
+    def get(self, key: str, default=None):
+        row = self.index.get(key)
+        return default if row is None else self.record(row)
+
+    def __getitem__(self, key: str) -> BookRecord:
+        row = self.index.get(key)
+        if row is None:
+            raise KeyError(key)
+        return self.record(row)
+
+    def __contains__(self, key) -> bool:
+        return key in self.index
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.index)
@@ -81,6 +81,7 @@ def generate_catalogs():
 
 
 def split_mega_market():
+    # Fixed manual split; for catalogs too large for one process see MOCK_RETAILER_CATALOG=sharded (sharding.py).
     df = pd.read_csv("catalogs/mega_market2.csv")
 
     parts = 5
@@ -0,0 +1,131 @@
+"""
+Idempotency keys for purchases.
+
+A buy request carrying an Idempotency-Key header is executed at most once per
+(shop, key); repeats get the stored response. Keys live in a small SQLite file
+so every uvicorn worker sees them, whichever worker a retry lands on.
+
+A claim still in progress after IDEMPOTENCY_STALE_SECONDS is assumed to belong
+to a crashed worker, and the next request with the key takes it over. That
+request runs the purchase again if the crash came after the stock was taken.
+The timeout is long next to the purchase itself, which runs after the shop
+profile's injected latency.
+
+The methods block on SQLite; async callers run them in a thread.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("MOCK_RETAILER_IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+IDEMPOTENCY_STALE_SECONDS = float(os.getenv("MOCK_RETAILER_IDEMPOTENCY_STALE_SECONDS", "30"))
+
+CLAIMED = "claimed"
+COMPLETED = "completed"
+IN_PROGRESS = "in_progress"
+MISMATCH = "mismatch"
+
+
+class IdempotencyStore:
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: float = IDEMPOTENCY_TTL_SECONDS,
+        stale_seconds: float = IDEMPOTENCY_STALE_SECONDS,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._local = threading.local()
+        self._last_purge = 0.0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS idempotency (
+                scope TEXT NOT NULL,
+                key TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                status_code INTEGER,
+                body TEXT,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (scope, key)
+            )
+            """
+        )
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def claim(self, scope: str, key: str, fingerprint: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        Try to become the request that executes (scope, key).
+
+        Returns (CLAIMED, None) for the first request (or the one taking over a
+        stale claim), (COMPLETED, {"status_code", "body"}) once it has finished,
+        (IN_PROGRESS, None) while it is still running, and (MISMATCH, None) when
+        the key was used for a different request.
+        """
+        conn = self._conn()
+        now = time.time()
+        self._purge_expired(conn, now)
+        try:
+            conn.execute(
+                "INSERT INTO idempotency (scope, key, fingerprint, created_at) VALUES (?, ?, ?, ?)",
+                (scope, key, fingerprint, now),
+            )
+            return CLAIMED, None
+        except sqlite3.IntegrityError:
+            pass
+
+        row = conn.execute(
+            "SELECT fingerprint, status_code, body, created_at FROM idempotency WHERE scope = ? AND key = ?",
+            (scope, key),
+        ).fetchone()
+        if row is None:
+            # Released between our insert and select; let the caller try again.
+            return IN_PROGRESS, None
+
+        stored_fingerprint, status_code, body, created_at = row
+        if stored_fingerprint != fingerprint:
+            return MISMATCH, None
+        if status_code is None:
+            if now - created_at < self.stale_seconds:
+                return IN_PROGRESS, None
+            # Only one of several concurrent takers matches the old created_at.
+            taken = conn.execute(
+                "UPDATE idempotency SET created_at = ? "
+                "WHERE scope = ? AND key = ? AND status_code IS NULL AND created_at = ?",
+                (now, scope, key, created_at),
+            ).rowcount
+            return (CLAIMED, None) if taken else (IN_PROGRESS, None)
+        return COMPLETED, {"status_code": status_code, "body": json.loads(body)}
+
+    def complete(self, scope: str, key: str, status_code: int, body: Dict[str, Any]) -> None:
+        self._conn().execute(
+            "UPDATE idempotency SET status_code = ?, body = ? WHERE scope = ? AND key = ?",
+            (status_code, json.dumps(body, ensure_ascii=False), scope, key),
+        )
+
+    def release(self, scope: str, key: str) -> None:
+        """Forget a claimed key whose request failed without a response to replay."""
+        self._conn().execute(
+            "DELETE FROM idempotency WHERE scope = ? AND key = ? AND status_code IS NULL",
+            (scope, key),
+        )
+
+    def _purge_expired(self, conn: sqlite3.Connection, now: float) -> None:
+        if now - self._last_purge < 60:
+            return
+        self._last_purge = now
+        conn.execute("DELETE FROM idempotency WHERE created_at < ?", (now - self.ttl_seconds,))
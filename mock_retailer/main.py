@@ -1,9 +1,26 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Header
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
+import asyncio
+import functools
+import hashlib
+import hmac
+import json
+import time
 import uuid
-import pandas as pd
 import os
 import logging
+from typing import Dict, List, Optional
+
+from mock_retailer import profiles
+from mock_retailer.profiles import ShopProfile, apply_profile, load_profiles_from_env
+from mock_retailer.shared_catalog import open_shared_catalog
+from mock_retailer.compact_catalog import CompactCatalog
+from mock_retailer import idempotency
+from mock_retailer.best_offers import lookup_offers
+from mock_retailer.catalog_source import read_catalog_rows
+from mock_retailer.sharding import ShardedCatalogService
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
@@ -11,16 +28,36 @@ logger = logging.getLogger(__name__)
 app = FastAPI(title="Mock Retailer API")
 
 CATALOG_DIR = os.path.join(os.path.dirname(__file__), "catalogs")
+# "shared": one memory-mapped file per shop, shared by all workers (see shared_catalog.py).
+# "compact": a private struct-of-arrays catalog per worker (see compact_catalog.py).
+# "sharded": titles partitioned across MOCK_RETAILER_SHARDS processes (see sharding.py);
+#            meant for very large catalogs served by a single worker.
+CATALOG_MODE = os.getenv("MOCK_RETAILER_CATALOG", "shared")
+SHARED_CATALOG_DIR = os.getenv("MOCK_RETAILER_SHARED_CATALOG_DIR", os.path.join(CATALOG_DIR, ".shared"))
+# How long a repeated Idempotency-Key waits for the original request before answering 409
+# (claims abandoned by a crashed worker are taken over, see idempotency.py).
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("MOCK_RETAILER_IDEMPOTENCY_WAIT_SECONDS", "5"))
+# How long /best-offer waits for the shops (their profiles) before answering for
+# those that are done; a request can ask for less with ?deadline=.
+BEST_OFFER_DEADLINE_SECONDS = float(os.getenv("MOCK_RETAILER_BEST_OFFER_DEADLINE_SECONDS", "4"))
+# The /admin endpoints (profiles, restock) answer 404 unless this is set, and then
+# only to requests carrying it in X-Admin-Token.
+ADMIN_TOKEN = os.getenv("MOCK_RETAILER_ADMIN_TOKEN", "")
 CATALOGS = {}
 
+IDEMPOTENCY = idempotency.IdempotencyStore(
+    os.getenv("MOCK_RETAILER_IDEMPOTENCY_DB", os.path.join(SHARED_CATALOG_DIR, "idempotency.sqlite3"))
+)
+
 
 def load_catalogs():
-    """Load CSV catalogs into memory as dicts for O(1) exact-title lookup."""
+    """Load CSV catalogs for O(1) exact-title lookup (keys are lower-cased titles)."""
     global CATALOGS
     shops = ["fiction_boutique", "knowledge_store", "mega_market1", "mega_market2"]
 
     print("Loading catalogs...")
     loaded = {}
+    sources = {}
 
     for shop in shops:
         file_path = os.path.join(CATALOG_DIR, f"{shop}.csv")
@@ -29,22 +66,19 @@ def load_catalogs():
             logger.warning(f"  - Warning: {file_path} not found.")
             continue
 
+        if CATALOG_MODE == "sharded":
+            sources[shop] = functools.partial(read_catalog_rows, file_path)
+            continue
+
         try:
-            df = pd.read_csv(file_path)
-
-            catalog = {}
-            for _, row in df.iterrows():
-                title = str(row["Title"]).strip()
-                if not title:
-                    continue
-
-                key = title.lower()
-                catalog[key] = {
-                    "Title": title,
-                    "price": float(row["price"]),
-                    "stock": bool(row["stock"]),
-                    "categories": str(row["categories"]) if "categories" in row and pd.notna(row["categories"]) else "Unknown",
-                }
+            if CATALOG_MODE == "shared":
+                catalog = open_shared_catalog(
+                    file_path,
+                    os.path.join(SHARED_CATALOG_DIR, f"{shop}.bbcat"),
+                    lambda: read_catalog_rows(file_path),
+                )
+            else:
+                catalog = CompactCatalog.from_rows(read_catalog_rows(file_path))
 
             loaded[shop] = catalog
             logger.info(f"  - Loaded {shop} ({len(catalog)} items)")
@@ -52,10 +86,18 @@ def load_catalogs():
         except Exception as e:
             logger.error(f"  - Error loading {shop}: {e}")
 
+    if sources:
+        service = ShardedCatalogService(sources)
+        for shop in sources:
+            loaded[shop] = service.catalog(shop)
+            logger.info(f"  - Loaded {shop} ({len(loaded[shop])} items in {service.shards} shards)")
+
     CATALOGS = loaded
 
 
 load_catalogs()
+load_profiles_from_env()
+profiles.PROFILES_FILE = os.getenv("MOCK_RETAILER_PROFILES_FILE", os.path.join(SHARED_CATALOG_DIR, "profiles.json"))
 
 
 class BuyRequest(BaseModel):
@@ -70,10 +112,32 @@ class BuyResponse(BaseModel):
     eta: str
 
 
+class Offer(BaseModel):
+    shop_id: str
+    title: str
+    price: float
+    stock: bool
+    quantity: int
+
+
+class ShopError(BaseModel):
+    shop_id: str
+    status_code: int
+    detail: str
+
+
+class BestOfferResponse(BaseModel):
+    offers: List[Offer]
+    best: Optional[Offer]
+    # Shops whose injected failure fired (see profiles.py); their offers are missing.
+    errors: List[ShopError] = []
+
+
 class SearchResponse(BaseModel):
     title: str
     price: float
     stock: bool
+    quantity: int
     shop_id: str
     category: str
 
@@ -83,7 +147,10 @@ async def search_book(shop_id: str, title: str):
     if shop_id not in CATALOGS:
         raise HTTPException(status_code=404, detail="Shop not found")
 
-    book = CATALOGS[shop_id].get(title.strip().lower())
+    await apply_profile(shop_id)
+
+    # Catalog calls can block (a pipe round trip in sharded mode); keep them off the event loop.
+    book = await run_in_threadpool(CATALOGS[shop_id].get, title.strip().lower())
     if not book:
         raise HTTPException(status_code=404, detail="Book not found in this shop")
 
@@ -91,21 +158,109 @@ async def search_book(shop_id: str, title: str):
         title=book["Title"],
         price=book["price"],
         stock=book["stock"],
+        quantity=book["quantity"],
         shop_id=shop_id,
         category=book["categories"],
     )
 
 
+@app.get("/best-offer", response_model=BestOfferResponse)
+async def best_offer(title: str, shops: Optional[str] = None, deadline: Optional[float] = None):
+    """
+    Offers of all shops (or the comma-separated shops) for a title, cheapest
+    first, and the cheapest one in stock. Every shop's profile applies
+    (concurrently), as if each shop had been searched; shops whose injected
+    failure fires, or that are not done by the deadline, are listed in errors
+    instead. Unknown shops carry nothing.
+    """
+    requested = [s.strip() for s in shops.split(",")] if shops else list(CATALOGS)
+    shops = [s for s in requested if s in CATALOGS]
+    wait_seconds = BEST_OFFER_DEADLINE_SECONDS if deadline is None else min(max(deadline, 0.0), BEST_OFFER_DEADLINE_SECONDS)
+    # A slow shop only costs its own offer, not the whole answer.
+    tasks = {shop: asyncio.ensure_future(apply_profile(shop)) for shop in shops}
+    if tasks:
+        await asyncio.wait(tasks.values(), timeout=wait_seconds)
+
+    errors = []
+    answering = []
+    for shop, task in tasks.items():
+        if not task.done():
+            task.cancel()
+            errors.append(ShopError(shop_id=shop, status_code=504, detail=f"No answer within {wait_seconds:g}s"))
+            continue
+        error = task.exception()
+        if isinstance(error, HTTPException):
+            errors.append(ShopError(shop_id=shop, status_code=error.status_code, detail=error.detail))
+        elif error is not None:
+            raise error
+        else:
+            answering.append(shop)
+
+    result = await run_in_threadpool(lookup_offers, CATALOGS, title.strip().lower(), answering)
+    if result is None:
+        if errors:
+            raise HTTPException(status_code=503, detail="Book not found in the shops that answered")
+        raise HTTPException(status_code=404, detail="Book not found in any shop")
+    result["errors"] = errors
+    return result
+
+
 @app.post("/shops/{shop_id}/buy", response_model=BuyResponse)
-async def buy_book(shop_id: str, payload: BuyRequest):
+async def buy_book(shop_id: str, payload: BuyRequest, idempotency_key: Optional[str] = Header(None)):
+    """
+    With an Idempotency-Key header the purchase runs at most once per shop and key;
+    repeats get the original response (also for errors such as out of stock).
+    """
     if shop_id not in CATALOGS:
         raise HTTPException(status_code=404, detail="Shop not found")
 
-    book = CATALOGS[shop_id].get(payload.title.strip().lower())
-    if not book:
+    await apply_profile(shop_id)
+
+    if not idempotency_key:
+        return await run_in_threadpool(_purchase, shop_id, payload)
+
+    fingerprint = hashlib.sha256(
+        json.dumps([payload.title.strip().lower(), payload.user_address, payload.payment_token]).encode("utf-8")
+    ).hexdigest()
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+
+    while True:
+        state, stored = await run_in_threadpool(IDEMPOTENCY.claim, shop_id, idempotency_key, fingerprint)
+        if state == idempotency.CLAIMED:
+            break
+        if state == idempotency.COMPLETED:
+            logger.info(f"Replaying purchase for idempotency key {idempotency_key} at {shop_id}")
+            return JSONResponse(
+                status_code=stored["status_code"],
+                content=stored["body"],
+                headers={"Idempotent-Replayed": "true"},
+            )
+        if state == idempotency.MISMATCH:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different purchase")
+        if time.monotonic() >= deadline:
+            raise HTTPException(status_code=409, detail="A purchase with this Idempotency-Key is still in progress")
+        await asyncio.sleep(0.05)
+
+    try:
+        response = await run_in_threadpool(_purchase, shop_id, payload)
+    except HTTPException as e:
+        await run_in_threadpool(IDEMPOTENCY.complete, shop_id, idempotency_key, e.status_code, {"detail": e.detail})
+        raise
+    except Exception:
+        await run_in_threadpool(IDEMPOTENCY.release, shop_id, idempotency_key)
+        raise
+
+    await run_in_threadpool(IDEMPOTENCY.complete, shop_id, idempotency_key, 200, response.model_dump())
+    return response
+
+
+def _purchase(shop_id: str, payload: BuyRequest) -> BuyResponse:
+    catalog = CATALOGS[shop_id]
+    key = payload.title.strip().lower()
+    if key not in catalog:
         raise HTTPException(status_code=404, detail="Book title not found in this shop")
 
-    if not book["stock"]:
+    if catalog.decrement_stock(key) is None:
         raise HTTPException(status_code=400, detail="Book is out of stock")
 
     transaction_id = f"TXN-{uuid.uuid4().hex[:8].upper()}"
@@ -117,6 +272,50 @@ async def buy_book(shop_id: str, payload: BuyRequest):
     )
 
 
+def _require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+admin = APIRouter(prefix="/admin", dependencies=[Depends(_require_admin)])
+
+
+@admin.get("/profiles", response_model=Dict[str, ShopProfile])
+async def list_profiles():
+    profiles.refresh_profiles()
+    return profiles.PROFILES
+
+
+@admin.put("/profiles/{shop_id}", response_model=ShopProfile)
+async def set_profile(shop_id: str, profile: ShopProfile):
+    """Set latency/failure injection for a shop ("*" for all shops without their own profile)."""
+    if shop_id != "*" and shop_id not in CATALOGS:
+        raise HTTPException(status_code=404, detail="Shop not found")
+
+    await run_in_threadpool(profiles.set_profile, shop_id, profile)
+    logger.info(f"Profile for {shop_id} set to {profile.model_dump()}")
+    return profile
+
+
+@admin.delete("/profiles/{shop_id}")
+async def clear_profile(shop_id: str):
+    await run_in_threadpool(profiles.set_profile, shop_id, None)
+    return {"shop_id": shop_id, "profile": None}
+
+
+@admin.post("/restock")
+async def restock():
+    """Reset every shop's stock quantities to the catalog values."""
+    for catalog in CATALOGS.values():
+        catalog.reset_stock()
+    return {"shops": list(CATALOGS.keys())}
+
+
+app.include_router(admin)
+
+
 @app.get("/")
 async def root():
     return {
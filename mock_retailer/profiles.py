@@ -0,0 +1,187 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+from pydantic import BaseModel, Field, field_validator
+
+from mock_retailer.shared_catalog import fcntl, server_id
+
+logger = logging.getLogger(__name__)
+
+LATENCY_PARAMS = {"none": 0, "const": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exp": 1}
+
+_rng = random.Random(int(os.getenv("MOCK_RETAILER_SEED", "0")))
+
+
+class ShopProfile(BaseModel):
+    """
+    Latency and failure injection for one shop.
+
+    latency uses the same spec strings as the offline benchmark, in milliseconds:
+    "none", "const:MS", "uniform:LO:HI", "normal:MEAN:STD", "lognormal:MEDIAN:SIGMA", "exp:MEAN".
+    """
+    latency: str = "none"
+    error_rate: float = Field(0.0, ge=0.0, le=1.0)
+    timeout_rate: float = Field(0.0, ge=0.0, le=1.0)
+    slow_tail_pct: float = Field(0.0, ge=0.0, le=100.0)
+    slow_tail_ms: float = Field(5000.0, ge=0.0)
+    # Longer than the agent's 40s client timeout, so a "timeout" really times out.
+    timeout_hold_seconds: float = Field(60.0, ge=0.0)
+
+    @field_validator("latency")
+    @classmethod
+    def _check_latency(cls, value: str) -> str:
+        parts = value.split(":")
+        kind = parts[0].strip().lower()
+        if kind not in LATENCY_PARAMS:
+            raise ValueError(f"Unknown latency distribution: {value}")
+        if len(parts) - 1 != LATENCY_PARAMS[kind]:
+            raise ValueError(f"Latency distribution '{kind}' needs {LATENCY_PARAMS[kind]} parameters")
+        for p in parts[1:]:
+            float(p)
+        return value
+
+    def sample_latency_ms(self) -> float:
+        parts = self.latency.split(":")
+        kind = parts[0].strip().lower()
+        params = [float(p) for p in parts[1:]]
+
+        if kind == "none":
+            delay = 0.0
+        elif kind == "const":
+            delay = params[0]
+        elif kind == "uniform":
+            delay = _rng.uniform(params[0], params[1])
+        elif kind == "normal":
+            delay = max(0.0, _rng.gauss(params[0], params[1]))
+        elif kind == "lognormal":
+            delay = params[0] * math.exp(_rng.gauss(0.0, params[1]))
+        else:
+            delay = _rng.expovariate(1.0 / params[0]) if params[0] > 0 else 0.0
+
+        if self.slow_tail_pct and _rng.random() * 100.0 < self.slow_tail_pct:
+            delay += self.slow_tail_ms
+        return delay
+
+
+PROFILES: Dict[str, ShopProfile] = {}
+
+# Profiles set at runtime are written here (see set_profile) so that every worker
+# of the server applies them; None keeps them in this process only.
+PROFILES_FILE: Optional[str] = None
+_profiles_file_version = None
+
+
+def load_profiles_from_env() -> None:
+    """
+    MOCK_RETAILER_PROFILES holds either a JSON object or a path to a JSON file:
+      {"mega_market1": {"latency": "lognormal:80:0.5", "timeout_rate": 0.05}, "*": {...}}
+    "*" applies to every shop without its own profile.
+    """
+    raw = os.getenv("MOCK_RETAILER_PROFILES")
+    if not raw:
+        return
+
+    try:
+        if os.path.exists(raw):
+            with open(raw, encoding="utf-8") as f:
+                raw = f.read()
+        data = json.loads(raw)
+        for shop_id, profile in data.items():
+            PROFILES[shop_id] = ShopProfile(**profile)
+        logger.info(f"  - Loaded shop profiles for: {', '.join(PROFILES)}")
+    except Exception as e:
+        logger.error(f"  - Error loading MOCK_RETAILER_PROFILES: {e}")
+
+
+def refresh_profiles() -> None:
+    """
+    Pick up profiles another worker wrote to PROFILES_FILE. A file left by an
+    earlier server is ignored; the startup profiles stay in effect.
+    """
+    global _profiles_file_version
+    if PROFILES_FILE is None:
+        return
+    try:
+        st = os.stat(PROFILES_FILE)
+    except OSError:
+        return
+    version = (st.st_ino, st.st_mtime_ns, st.st_size)
+    if version == _profiles_file_version:
+        return
+    _profiles_file_version = version
+
+    try:
+        with open(PROFILES_FILE, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("server") != server_id():
+            return
+        profiles = {shop_id: ShopProfile(**profile) for shop_id, profile in data["profiles"].items()}
+    except Exception as e:
+        logger.error(f"Error reading {PROFILES_FILE}: {e}")
+        return
+    PROFILES.clear()
+    PROFILES.update(profiles)
+
+
+def set_profile(shop_id: str, profile: Optional[ShopProfile]) -> None:
+    """Set (None clears) a shop's profile for every worker sharing PROFILES_FILE."""
+    if PROFILES_FILE is None:
+        _set(shop_id, profile)
+        return
+
+    os.makedirs(os.path.dirname(PROFILES_FILE) or ".", exist_ok=True)
+    with open(f"{PROFILES_FILE}.lock", "a+b") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            refresh_profiles()
+            _set(shop_id, profile)
+            data = {
+                "server": server_id(),
+                "profiles": {key: value.model_dump() for key, value in PROFILES.items()},
+            }
+            tmp_path = f"{PROFILES_FILE}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, PROFILES_FILE)
+            # This worker already has the change.
+            refresh_profiles()
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _set(shop_id: str, profile: Optional[ShopProfile]) -> None:
+    if profile is None:
+        PROFILES.pop(shop_id, None)
+    else:
+        PROFILES[shop_id] = profile
+
+
+def get_profile(shop_id: str) -> Optional[ShopProfile]:
+    return PROFILES.get(shop_id) or PROFILES.get("*")
+
+
+async def apply_profile(shop_id: str) -> None:
+    """Sleep and/or fail according to the shop's profile. No-op when none is set."""
+    refresh_profiles()
+    profile = get_profile(shop_id)
+    if profile is None:
+        return
+
+    if profile.timeout_rate and _rng.random() < profile.timeout_rate:
+        await asyncio.sleep(profile.timeout_hold_seconds)
+        raise HTTPException(status_code=504, detail="Injected timeout")
+
+    delay_ms = profile.sample_latency_ms()
+    if delay_ms > 0:
+        await asyncio.sleep(delay_ms / 1000.0)
+
+    if profile.error_rate and _rng.random() < profile.error_rate:
+        raise HTTPException(status_code=503, detail="Injected failure")
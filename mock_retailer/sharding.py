@@ -0,0 +1,230 @@
+"""
+Catalogs partitioned by title hash across worker processes.
+
+The parent reads every shop's rows once and streams each row, in batches, to
+the shard process its title hashes to, which adds it to its CompactCatalogs;
+shards build while the parent keeps reading. A ShardedCatalog is the per-shop
+router: single-title operations go to the owning shard over a pipe,
+whole-catalog operations fan out to all shards.
+"""
+import multiprocessing
+import os
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from mock_retailer.compact_catalog import BookRecord, CompactCatalog
+from mock_retailer.shared_catalog import normalize_title, title_hash
+
+SHARD_COUNT = int(os.getenv("MOCK_RETAILER_SHARDS", "4"))
+# Rows sent to a shard per pipe message while loading.
+LOAD_BATCH_ROWS = 5000
+
+# Called once, in the parent: e.g. functools.partial(read_catalog_rows, path).
+RowSource = Callable[[], Iterable[Tuple[str, float, int, str]]]
+
+
+def shard_of(key: str, shards: int) -> int:
+    return title_hash(key) % shards
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _as_tuple(record: BookRecord) -> Tuple[str, float, int, str]:
+    return record.Title, record.price, record.quantity, record.categories
+
+
+def _serve_shard(conn, shops: List[str]) -> None:
+    catalogs: Dict[str, CompactCatalog] = {shop: CompactCatalog() for shop in shops}
+    # Loading: ("rows", shop, batch) messages until ("loaded", None, ()).
+    while True:
+        op, shop, rows = conn.recv()
+        if op == "loaded":
+            break
+        for row in rows:
+            catalogs[shop].add(*row)
+    conn.send(("ok", None))
+
+    while True:
+        try:
+            op, shop, args = conn.recv()
+        except EOFError:
+            break
+        if op == "stop":
+            break
+
+        try:
+            catalog = catalogs.get(shop)
+            if op == "get":
+                result = {key: _as_tuple(catalog[key]) for key in args if key in catalog}
+            elif op == "decrement":
+                result = catalog.decrement_stock(*args)
+            elif op == "set_quantity":
+                result = catalog.set_quantity(*args)
+            elif op == "reset":
+                result = catalog.reset_stock()
+            elif op == "len":
+                result = len(catalog)
+            elif op == "keys":
+                result = list(catalog)
+            elif op == "items":
+                result = [(key, _as_tuple(catalog.record(row))) for key, row in catalog.index.items()]
+            elif op == "memory":
+                result = _rss_bytes()
+            else:
+                raise ValueError(f"Unknown shard operation: {op}")
+            conn.send(("ok", result))
+        except KeyError as e:
+            conn.send(("key_error", e.args[0] if e.args else None))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class ShardedCatalogService:
+    """Owns the shard processes; catalog(shop) returns the router for one shop."""
+
+    def __init__(self, sources: Dict[str, RowSource], shards: int = SHARD_COUNT):
+        self.shards = shards
+        self.shops = list(sources)
+        ctx = multiprocessing.get_context("spawn")
+
+        self._conns = []
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self._processes = []
+        for shard in range(shards):
+            parent, child = ctx.Pipe()
+            process = ctx.Process(
+                target=_serve_shard, args=(child, self.shops), daemon=True, name=f"catalog-shard-{shard}"
+            )
+            process.start()
+            child.close()
+            self._conns.append(parent)
+            self._processes.append(process)
+
+        for shop, source in sources.items():
+            self._load(shop, source)
+        for conn in self._conns:
+            conn.send(("loaded", None, ()))
+        # Shards build while rows stream in; wait for the last batches.
+        for conn in self._conns:
+            self._unwrap(conn.recv())
+
+    def _load(self, shop: str, source: RowSource) -> None:
+        """Partition one shop's rows by title hash, sending each shard its rows in batches."""
+        batches: List[List[Tuple[str, float, int, str]]] = [[] for _ in range(self.shards)]
+        for row in source():
+            shard = shard_of(normalize_title(row[0]), self.shards)
+            batches[shard].append(row)
+            if len(batches[shard]) >= LOAD_BATCH_ROWS:
+                self._conns[shard].send(("rows", shop, batches[shard]))
+                batches[shard] = []
+        for shard, batch in enumerate(batches):
+            if batch:
+                self._conns[shard].send(("rows", shop, batch))
+
+    @staticmethod
+    def _unwrap(reply: Tuple[str, Any]) -> Any:
+        status, value = reply
+        if status == "key_error":
+            raise KeyError(value)
+        if status == "error":
+            raise RuntimeError(value)
+        return value
+
+    def call(self, shard: int, op: str, shop: Optional[str], *args: Any) -> Any:
+        with self._locks[shard]:
+            self._conns[shard].send((op, shop, args))
+            return self._unwrap(self._conns[shard].recv())
+
+    def fan_out(self, op: str, shop: Optional[str], args_by_shard: Optional[Dict[int, tuple]] = None) -> Dict[int, Any]:
+        """Send op to several shards at once (all of them by default), then collect the replies."""
+        targets = sorted(args_by_shard) if args_by_shard is not None else range(self.shards)
+        # Locks are always taken in shard order, so concurrent fan-outs cannot deadlock.
+        for shard in targets:
+            self._locks[shard].acquire()
+        try:
+            for shard in targets:
+                args = args_by_shard[shard] if args_by_shard is not None else ()
+                self._conns[shard].send((op, shop, args))
+            return {shard: self._unwrap(self._conns[shard].recv()) for shard in targets}
+        finally:
+            for shard in targets:
+                self._locks[shard].release()
+
+    def catalog(self, shop: str) -> "ShardedCatalog":
+        return ShardedCatalog(self, shop)
+
+    def memory(self) -> List[int]:
+        """Resident memory of each shard process, in bytes."""
+        return [rss for _, rss in sorted(self.fan_out("memory", None).items())]
+
+    def close(self) -> None:
+        for shard, conn in enumerate(self._conns):
+            with self._locks[shard]:
+                try:
+                    conn.send(("stop", None, ()))
+                except OSError:
+                    pass
+        for process in self._processes:
+            process.join(timeout=5)
+
+
+class ShardedCatalog(Mapping):
+    """Dict-like view of one shop's catalog, routed to the shard owning each title."""
+
+    def __init__(self, service: ShardedCatalogService, shop: str):
+        self.service = service
+        self.shop = shop
+
+    def _shard(self, key: str) -> int:
+        return shard_of(key, self.service.shards)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, BookRecord]:
+        """Look up several titles with one round trip per shard involved."""
+        by_shard: Dict[int, List[str]] = {}
+        for key in keys:
+            by_shard.setdefault(self._shard(key), []).append(key)
+        found = self.service.fan_out("get", self.shop, {s: tuple(k) for s, k in by_shard.items()})
+        return {key: BookRecord(*row) for rows in found.values() for key, row in rows.items()}
+
+    def get(self, key: str, default=None):
+        rows = self.service.call(self._shard(key), "get", self.shop, key)
+        return BookRecord(*rows[key]) if key in rows else default
+
+    def __getitem__(self, key: str) -> BookRecord:
+        record = self.get(key)
+        if record is None:
+            raise KeyError(key)
+        return record
+
+    def __contains__(self, key) -> bool:
+        return isinstance(key, str) and self.get(key) is not None
+
+    def decrement_stock(self, key: str, amount: int = 1) -> Optional[int]:
+        return self.service.call(self._shard(key), "decrement", self.shop, key, amount)
+
+    def set_quantity(self, key: str, quantity: int) -> None:
+        self.service.call(self._shard(key), "set_quantity", self.shop, key, quantity)
+
+    def reset_stock(self) -> None:
+        self.service.fan_out("reset", self.shop)
+
+    def items(self) -> List[Tuple[str, BookRecord]]:
+        return [
+            (key, BookRecord(*row))
+            for rows in self.service.fan_out("items", self.shop).values()
+            for key, row in rows
+        ]
+
+    def __len__(self) -> int:
+        return sum(self.service.fan_out("len", self.shop).values())
+
+    def __iter__(self) -> Iterator[str]:
+        for keys in self.service.fan_out("keys", self.shop).values():
+            yield from keys
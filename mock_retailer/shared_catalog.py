@@ -0,0 +1,301 @@
+"""
+Catalog stored in one memory-mapped file that every uvicorn worker maps.
+
+The file is built once from the shop CSV (to a temp file, then renamed into
+place, by whichever worker gets the build lock first), so pages live once in
+the OS page cache however many workers run.
+
+Layout: 8-byte magic, uint64 header length, JSON header, then 8-byte aligned
+columns. Rows are sorted by a 64-bit hash of the normalized title, so a lookup
+is a binary search over the hash column plus one title comparison.
+
+Only the stock column is written after the build. A purchase takes a thread
+lock stripe (threads of one worker) and a byte-range lock on the row's stock
+slot (other workers), so concurrent buys never oversell.
+"""
+import hashlib
+import json
+import mmap
+import multiprocessing
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from mock_retailer.compact_catalog import BookRecord, STOCK_LOCK_STRIPES
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single worker only needs the thread locks.
+    fcntl = None
+
+MAGIC = b"BBCAT\x00\x00\x02"
+_HEADER_LEN = struct.Struct("<Q")
+_STOCK_DTYPE = np.dtype("<i4")
+
+
+def normalize_title(title: str) -> str:
+    return title.strip().lower()
+
+
+def title_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def build_shared_catalog(rows: Iterable[Tuple[str, float, int, str]], path: str) -> None:
+    """
+    Write (title, price, quantity, categories) rows to path.
+    Later rows win for duplicate titles, like the dict loader.
+    """
+    by_key: Dict[str, Tuple[str, float, int, str]] = {}
+    for row in rows:
+        by_key[normalize_title(row[0])] = row
+
+    keys = list(by_key)
+    hashes = np.fromiter((title_hash(k) for k in keys), dtype=np.uint64, count=len(keys))
+    order = np.argsort(hashes, kind="stable")
+
+    category_codes: Dict[str, int] = {}
+    titles: List[bytes] = []
+    prices = np.empty(len(keys), dtype=np.float32)
+    stock = np.empty(len(keys), dtype=_STOCK_DTYPE)
+    categories = np.empty(len(keys), dtype=np.uint32)
+    for i, row_idx in enumerate(order):
+        title, price, quantity, category = by_key[keys[row_idx]]
+        titles.append(title.encode("utf-8"))
+        prices[i] = price
+        stock[i] = quantity
+        categories[i] = category_codes.setdefault(category, len(category_codes))
+
+    title_offsets = np.zeros(len(titles) + 1, dtype=np.int64)
+    np.cumsum([len(t) for t in titles], out=title_offsets[1:])
+
+    columns = {
+        "hash": hashes[order],
+        "title_offsets": title_offsets,
+        "price": prices,
+        "stock": stock,
+        "initial_stock": stock.copy(),
+        "category": categories,
+        "title_blob": np.frombuffer(b"".join(titles), dtype=np.uint8),
+    }
+
+    header = {"count": len(keys), "categories": list(category_codes), "columns": {}}
+    # Offsets depend on the header size, which depends on the offsets; two passes settle it.
+    for _ in range(2):
+        offset = _align(len(MAGIC) + _HEADER_LEN.size + len(json.dumps(header).encode("utf-8")))
+        for name, array in columns.items():
+            header["columns"][name] = [array.dtype.str, offset, int(array.size)]
+            offset = _align(offset + array.nbytes)
+    header_bytes = json.dumps(header).encode("utf-8")
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(_HEADER_LEN.pack(len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in columns.items():
+            f.write(b"\x00" * (header["columns"][name][1] - f.tell()))
+            f.write(array.tobytes())
+    os.replace(tmp_path, path)
+
+
+class SharedCatalog(Mapping):
+    """Dict-like view (normalized title -> BookRecord) over a catalog file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        # Kept open: the mapping and the stock byte-range locks both use it.
+        self._file = open(path, "r+b")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_WRITE)
+
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a shared catalog file of this version")
+        (header_len,) = _HEADER_LEN.unpack_from(self._mm, len(MAGIC))
+        start = len(MAGIC) + _HEADER_LEN.size
+        header = json.loads(self._mm[start:start + header_len])
+
+        self.count: int = header["count"]
+        self.categories: List[str] = header["categories"]
+        # Zero-copy views into the mapping; everything but stock is read-only.
+        cols = {}
+        for name, (dtype, offset, count) in header["columns"].items():
+            cols[name] = np.frombuffer(self._mm, dtype=np.dtype(dtype), count=count, offset=offset)
+            if name != "stock":
+                cols[name].flags.writeable = False
+        self.hashes = cols["hash"]
+        self.title_offsets = cols["title_offsets"]
+        self.prices = cols["price"]
+        self.stock = cols["stock"]
+        self.initial_stock = cols["initial_stock"]
+        self.category_codes = cols["category"]
+        self._title_blob_offset = header["columns"]["title_blob"][1]
+        self._stock_offset = header["columns"]["stock"][1]
+        self._stock_locks = [threading.Lock() for _ in range(STOCK_LOCK_STRIPES)]
+
+    def title_at(self, row: int) -> str:
+        begin = self._title_blob_offset + int(self.title_offsets[row])
+        end = self._title_blob_offset + int(self.title_offsets[row + 1])
+        return self._mm[begin:end].decode("utf-8")
+
+    def find_row(self, key: str) -> Optional[int]:
+        h = np.uint64(title_hash(key))
+        row = int(np.searchsorted(self.hashes, h))
+        while row < self.count and self.hashes[row] == h:
+            if normalize_title(self.title_at(row)) == key:
+                return row
+            row += 1
+        return None
+
+    def record(self, row: int) -> BookRecord:
+        return BookRecord(
+            self.title_at(row),
+            # Prices are stored as float32; catalog prices have two decimals.
+            round(float(self.prices[row]), 2),
+            int(self.stock[row]),
+            self.categories[int(self.category_codes[row])],
+        )
+
+    def _lockf(self, exclusive: bool, length: int, offset: int) -> None:
+        if fcntl is not None:
+            cmd = fcntl.LOCK_EX if exclusive else fcntl.LOCK_UN
+            fcntl.lockf(self._file.fileno(), cmd, length, offset, os.SEEK_SET)
+
+    @contextmanager
+    def _row_locked(self, row: int):
+        offset = self._stock_offset + row * _STOCK_DTYPE.itemsize
+        with self._stock_locks[row % STOCK_LOCK_STRIPES]:
+            self._lockf(True, _STOCK_DTYPE.itemsize, offset)
+            try:
+                yield
+            finally:
+                self._lockf(False, _STOCK_DTYPE.itemsize, offset)
+
+    def decrement_stock(self, key: str, amount: int = 1) -> Optional[int]:
+        """
+        Atomically take amount copies of a book, across threads and worker processes.
+        Returns the remaining quantity, or None if there were not enough copies.
+        Raises KeyError for unknown titles.
+        """
+        row = self.find_row(key)
+        if row is None:
+            raise KeyError(key)
+
+        with self._row_locked(row):
+            remaining = int(self.stock[row]) - amount
+            if remaining < 0:
+                return None
+            self.stock[row] = remaining
+        return remaining
+
+    def set_quantity(self, key: str, quantity: int) -> None:
+        row = self.find_row(key)
+        if row is None:
+            raise KeyError(key)
+        with self._row_locked(row):
+            self.stock[row] = quantity
+
+    def reset_stock(self) -> None:
+        """Restore every quantity to its catalog value (for all workers)."""
+        for lock in self._stock_locks:
+            lock.acquire()
+        self._lockf(True, self.stock.nbytes, self._stock_offset)
+        try:
+            self.stock[:] = self.initial_stock
+        finally:
+            self._lockf(False, self.stock.nbytes, self._stock_offset)
+            for lock in self._stock_locks:
+                lock.release()
+
+    def get(self, key: str, default=None):
+        row = self.find_row(key)
+        return default if row is None else self.record(row)
+
+    def __getitem__(self, key: str) -> BookRecord:
+        row = self.find_row(key)
+        if row is None:
+            raise KeyError(key)
+        return self.record(row)
+
+    def __contains__(self, key) -> bool:
+        return isinstance(key, str) and self.find_row(key) is not None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[str]:
+        for row in range(self.count):
+            yield normalize_title(self.title_at(row))
+
+
+def open_shared_catalog(
+    source_path: str,
+    path: str,
+    load_rows: Callable[[], Iterable[Tuple[str, float, int, str]]],
+) -> SharedCatalog:
+    """
+    Map the catalog file at path, (re)building it from load_rows() first when it
+    is missing, from an older format, or older than source_path.
+
+    The check and build run under an exclusive lock on path + ".lock": every
+    worker must map the same file, since stock is written in place. The first
+    worker of a server start restores the catalog quantities (stock bought
+    against an earlier server would otherwise carry over); workers respawned
+    by the same server keep the current stock.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.lock", "a+b") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            if not _is_current(path, source_path):
+                build_shared_catalog(load_rows(), path)
+            catalog = SharedCatalog(path)
+            server = server_id()
+            marker_path = f"{path}.server"
+            if _read_text(marker_path) != server:
+                catalog.reset_stock()
+                with open(marker_path, "w", encoding="utf-8") as f:
+                    f.write(server)
+            return catalog
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _is_current(path: str, source_path: str) -> bool:
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(source_path):
+        return False
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def server_id() -> str:
+    """
+    Identify the running server: the uvicorn master for a worker process, else
+    this process. The process start time tells a reused pid apart.
+    """
+    parent = multiprocessing.parent_process()
+    pid = parent.pid if parent is not None else os.getpid()
+    try:
+        with open(f"/proc/{pid}/stat", encoding="utf-8") as f:
+            # Field 22 (starttime); the command name before it may contain spaces.
+            started = f.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        started = ""
+    return f"{pid}:{started}"
+
+
+def _read_text(path: str) -> Optional[str]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
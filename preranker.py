@@ -0,0 +1,97 @@
+"""
+Local pre-ranking of RAG candidates before the curator LLM.
+
+RAG retrieves a wide candidate set (PRERANK_CANDIDATES books in config.py);
+prerank() scores them all at once from vector relevance, similarity to the
+user's preferences, fit to the page / year constraints, membership in the
+wanted categories and average review score, and only the top PRERANK_TOP_N go
+into the LLM prompt.
+"""
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from constraints import Constraints, published_year
+
+REVIEW_SCORE_MAX = float(os.getenv("REVIEW_SCORE_MAX", "5"))
+
+PRERANK_WEIGHTS = {
+    "relevance": 1.0,
+    "preference": 0.5,
+    "length": 0.3,
+    "year": 0.2,
+    "category": 0.3,
+    "reviews": 0.3,
+}
+
+# Distance outside a page / year range at which the fit has dropped to 1/e.
+LENGTH_FIT_SCALE = 100.0
+YEAR_FIT_SCALE = 10.0
+# Fit for books whose length or year is unknown, between in-range (1) and far off (0).
+UNKNOWN_FIT = 0.5
+
+
+def _min_max(values: np.ndarray) -> np.ndarray:
+    """Scale to [0, 1] across the candidates; NaN (missing) becomes 0."""
+    finite = np.isfinite(values)
+    if not finite.any():
+        return np.zeros_like(values)
+    low, high = values[finite].min(), values[finite].max()
+    scaled = (values - low) / (high - low) if high > low else np.ones_like(values)
+    return np.where(finite, scaled, 0.0)
+
+
+def range_fit(values: np.ndarray, low: Optional[int], high: Optional[int], scale: float) -> np.ndarray:
+    """1 inside [low, high], decaying exponentially with the distance outside it."""
+    if low is None and high is None:
+        return np.ones_like(values)
+    below = np.maximum(0.0, (low if low is not None else -np.inf) - values)
+    above = np.maximum(0.0, values - (high if high is not None else np.inf))
+    fit = np.exp(-(below + above) / scale)
+    return np.where(np.isfinite(values), fit, UNKNOWN_FIT)
+
+
+def feature_matrix(
+    books: Sequence[Dict[str, Any]],
+    relevance: Sequence[float],
+    preference: Optional[Sequence[Optional[float]]],
+    constraints: Constraints,
+    review_averages: Sequence[Optional[float]],
+) -> Dict[str, np.ndarray]:
+    """One float array per feature, aligned with books."""
+    def as_array(values) -> np.ndarray:
+        return np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+
+    lengths = as_array(b.get("bookLength") for b in books)
+    years = as_array(published_year(b.get("publishedDate")) for b in books)
+    reviews = as_array(review_averages) / REVIEW_SCORE_MAX
+
+    return {
+        "relevance": _min_max(as_array(relevance)),
+        "preference": _min_max(as_array(preference)) if preference is not None else np.zeros(len(books)),
+        "length": range_fit(lengths, constraints.min_pages, constraints.max_pages, LENGTH_FIT_SCALE),
+        "year": range_fit(years, constraints.min_year, constraints.max_year, YEAR_FIT_SCALE),
+        "category": np.array([float(constraints.category_match(b)) for b in books]),
+        # Unreviewed books score as average rather than as badly reviewed.
+        "reviews": np.where(np.isfinite(reviews), reviews, 0.5),
+    }
+
+
+def prerank(
+    books: Sequence[Dict[str, Any]],
+    relevance: Sequence[float],
+    preference: Optional[Sequence[Optional[float]]],
+    constraints: Constraints,
+    review_averages: Sequence[Optional[float]],
+    top_n: Optional[int] = None,
+    weights: Optional[Dict[str, float]] = None,
+) -> List[Tuple[int, float]]:
+    """(candidate index, combined score) pairs, best first (top_n of them); ties keep retrieval order."""
+    if not books:
+        return []
+    weights = weights or PRERANK_WEIGHTS
+    features = feature_matrix(books, relevance, preference, constraints, review_averages)
+    scores = sum(weights[name] * values for name, values in features.items())
+    order = np.argsort(-scores, kind="stable")[:top_n]
+    return [(int(i), float(scores[i])) for i in order]
@@ -1,4 +1,5 @@
 import json
+from functools import lru_cache
 from typing import List, Dict, Any, Optional, Tuple
 from pinecone import Pinecone
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
@@ -8,54 +9,236 @@ from config import (
     OPENAI_BASE_URL,
     PINECONE_API_KEY,
     PINECONE_INDEX_NAME,
+    VECTOR_STORE,
+    LOCAL_INDEX_DIR,
     LLM_MODEL,
     EMBEDDING_MODEL,
     TOP_K_RETURN_BOOKS,
     TOP_K_REVIEWS,
+    RAG_CHUNK_OVERFETCH,
+    RAG_GROUP_SCORING,
+    NAMED_BOOK_FAST_PATH,
+    LEXICAL_FUSION_WEIGHT,
+    PRERANK_CANDIDATES,
+    PRERANK_TOP_N,
+    EMBEDDING_CACHE_TTL_SECONDS,
+    REVIEWS_CACHE_TTL_SECONDS,
+    RECOMMENDATION_CACHE_TTL_SECONDS,
+    EXCLUSION_SERVER_FILTER_MAX_TITLES,
+    EXCLUSION_MAX_FETCH,
     supabase_client,
 )
 from langchain_core.tools import tool
+from metrics import timed, REGISTRY
+from singleflight import SingleFlight
+from cache_backend import CacheLayer
+from book_store import get_book_store, split_names
+from local_index import LocalVectorIndex, LocalVectorStore
+from lexical_index import fuse_rankings, get_lexical_index
+from constraints import Constraints, extract_constraints
+from preranker import prerank
+from curator_budget import CuratorUnavailable, LatencyBudget
 
 
-def get_vector_store() -> PineconeVectorStore:
-    pc = Pinecone(api_key=PINECONE_API_KEY)
-    index = pc.Index(PINECONE_INDEX_NAME)
+# Identical concurrent recommendation requests share one pipeline run.
+recommendation_flight = SingleFlight("recommendation")
+
+# Caches shared by all workers on the host when CACHE_BACKEND=sqlite.
+embedding_cache = CacheLayer("embedding", EMBEDDING_CACHE_TTL_SECONDS)
+reviews_cache = CacheLayer("reviews", REVIEWS_CACHE_TTL_SECONDS)
+recommendation_cache = CacheLayer("recommendation", RECOMMENDATION_CACHE_TTL_SECONDS)
 
+
+@lru_cache(maxsize=None)
+def get_vector_store() -> PineconeVectorStore:
+    """Shared per process: the Pinecone and OpenAI clients keep their connection pools."""
     embeddings = OpenAIEmbeddings(
         model=EMBEDDING_MODEL,
         api_key=OPENAI_API_KEY,
         base_url=OPENAI_BASE_URL,
     )
 
+    if VECTOR_STORE == "local":
+        return LocalVectorStore(LocalVectorIndex.load(LOCAL_INDEX_DIR), embeddings)
+
+    pc = Pinecone(api_key=PINECONE_API_KEY)
+    index = pc.Index(PINECONE_INDEX_NAME)
+
     return PineconeVectorStore(
         index=index,
         embedding=embeddings,
     )
 
 
-def rag_books_by_description(user_prompt: str, excluded_titles: List[str]) -> List[dict]:
+@lru_cache(maxsize=None)
+def get_curator_llm() -> ChatOpenAI:
+    """Shared per process by both curator steps."""
+    return ChatOpenAI(
+        model=LLM_MODEL,
+        api_key=OPENAI_API_KEY,
+        base_url=OPENAI_BASE_URL,
+        max_tokens=1024,
+        temperature=1,
+    )
+
+
+def group_by_title(
+    docs_with_scores: List[Tuple[Any, float]],
+    excluded: Optional[set] = None,
+    scoring: str = RAG_GROUP_SCORING,
+) -> List[Tuple[Any, float]]:
+    """
+    Collapse chunks of the same book into one (best chunk, score) pair per title,
+    ranked by the best chunk's score ("max") or by the sum over the book's chunks ("sum").
+    Expects matches sorted by descending score, as the vector store returns them.
+    """
+    excluded = excluded or set()
+    groups: Dict[str, List[Any]] = {}
+    for d, score in docs_with_scores:
+        key = d.metadata.get("title", "").strip().lower()
+        if key in excluded:
+            continue
+        group = groups.get(key)
+        if group is None:
+            groups[key] = [d, score, score]
+        else:
+            group[2] += score
+
+    if scoring == "sum":
+        return sorted(((d, total) for d, _, total in groups.values()), key=lambda g: g[1], reverse=True)
+    return [(d, best) for d, best, _ in groups.values()]
+
+
+def _with_excluded_titles(metadata_filter: Optional[Dict[str, Any]], titles: List[str]) -> Optional[Dict[str, Any]]:
+    combined = dict(metadata_filter or {})
+    if titles:
+        combined["title"] = {"$nin": titles}
+    return combined or None
+
+
+def search_excluding(
+    store: PineconeVectorStore,
+    query_embedding: List[float],
+    excluded_titles: List[str],
+    k: int = TOP_K_RETURN_BOOKS,
+    metadata_filter: Optional[Dict[str, Any]] = None,
+) -> List[Tuple[Any, float]]:
+    """
+    Top-k distinct books as (document, score) pairs whose title is not excluded
+    and whose metadata matches metadata_filter (chunks grouped by group_by_title).
+
+    Short exclusion lists are sent as a $nin filter. Long ones keep only the most
+    recent titles (the runner appends failed attempts last) in the filter and
+    drop the rest locally. The first query fetches RAG_CHUNK_OVERFETCH matches per
+    book plus one per local exclusion, later ones grow k fourfold up to
+    EXCLUSION_MAX_FETCH. If that still leaves fewer than k books, one last query
+    sends the whole list.
     """
-    RAG step:
+    server_side = excluded_titles[-EXCLUSION_SERVER_FILTER_MAX_TITLES:] if EXCLUSION_SERVER_FILTER_MAX_TITLES > 0 else []
+    local = {t.strip().lower() for t in excluded_titles[:len(excluded_titles) - len(server_side)]}
+    pinecone_filter = _with_excluded_titles(metadata_filter, server_side)
+
+    fetch = min(k * max(1, RAG_CHUNK_OVERFETCH) + len(local), max(k, EXCLUSION_MAX_FETCH))
+    while True:
+        with timed("vector_search"):
+            docs_with_scores = store.similarity_search_by_vector_with_score(
+                query_embedding,
+                k=fetch,
+                filter=pinecone_filter,
+            )
+
+        eligible = group_by_title(docs_with_scores, local)
+
+        if len(eligible) >= k or len(docs_with_scores) < fetch:
+            return eligible[:k]
+
+        if fetch >= EXCLUSION_MAX_FETCH:
+            if not local:
+                return eligible[:k]
+            # Over-fetching hit its cap; let the index apply the whole list.
+            REGISTRY.inc("bookbuy_exclusion_full_filter_total")
+            local = set()
+            pinecone_filter = _with_excluded_titles(metadata_filter, excluded_titles)
+            fetch = k * max(1, RAG_CHUNK_OVERFETCH)
+            continue
+
+        REGISTRY.inc("bookbuy_rag_refetch_total")
+        fetch = min(4 * fetch, EXCLUSION_MAX_FETCH)
+
+
+def embed_text(store: PineconeVectorStore, text: str) -> List[float]:
+    with timed("embedding"):
+        return embedding_cache.get_or_compute(
+            f"{EMBEDDING_MODEL}|{text}",
+            lambda: store.embeddings.embed_query(text),
+        )
+
+
+def rag_candidates(
+    user_prompt: str,
+    excluded_titles: List[str],
+    constraints: Constraints,
+    k: int = TOP_K_RETURN_BOOKS,
+) -> List[Tuple[Dict[str, Any], Optional[float]]]:
+    """
+    RAG step, as (book, vector score) pairs; the score is None for books found
+    only by the lexical search.
     - Semantic search on description
-    - Metadata filter on title
-    - Returns exactly TOP_K_RETURN_BOOKS results (if available)
+    - Excluded titles filtered on the server or locally (see search_excluding)
+    - Constraints pushed down as metadata filters, relaxed step by step
+      (year, then pages; rejected categories stay excluded) while fewer than
+      TOP_K_RETURN_BOOKS books match
+    - Chunks collapsed per title, full records taken from the local book store
+      (the matched chunk's metadata and text when the store lacks the title)
+    - Vector ranking fused with BM25 over titles and authors (LEXICAL_FUSION_WEIGHT)
+    - Returns up to k distinct books
     """
     store = get_vector_store()
+    query_embedding = embed_text(store, user_prompt)
+    book_store = get_book_store()
+
+    docs_with_scores: List[Tuple[Any, float]] = []
+    for level, metadata_filter in enumerate(constraints.relaxations()):
+        if level:
+            REGISTRY.inc("bookbuy_constraint_relaxations_total")
+        # Books found under a stricter filter stay first; looser levels only fill up.
+        found_titles = [d.metadata.get("title", "") for d, _ in docs_with_scores]
+        docs_with_scores += search_excluding(
+            store,
+            query_embedding,
+            (excluded_titles or []) + found_titles,
+            k=k - len(docs_with_scores),
+            metadata_filter=metadata_filter,
+        )
+        if len(docs_with_scores) >= min(k, TOP_K_RETURN_BOOKS):
+            break
 
-    pinecone_filter = (
-        {"title": {"$nin": excluded_titles}}
-        if excluded_titles
-        else None
-    )
+    docs_by_title = {d.metadata.get("title", ""): d for d, _ in docs_with_scores}
+    vector_scores = {d.metadata.get("title", ""): score for d, score in docs_with_scores}
+    titles = list(docs_by_title)
+
+    lexical = get_lexical_index()
+    if LEXICAL_FUSION_WEIGHT > 0 and len(lexical):
+        excluded = {t.strip().lower() for t in excluded_titles or []}
+        with timed("lexical_search"):
+            hits = lexical.search(user_prompt, k=k, excluded=excluded)
+        lexical_titles = [
+            book_store.titles[row] for row, _ in hits
+            if constraints.is_empty() or constraints.matches(book_store.record(row))
+        ]
+        titles = fuse_rankings([(titles, 1.0), (lexical_titles, LEXICAL_FUSION_WEIGHT)], k)
 
-    docs = store.similarity_search(
-        query=user_prompt,
-        k=TOP_K_RETURN_BOOKS,
-        filter=pinecone_filter,
-    )
+    with timed("book_store_lookup"):
+        records = book_store.get_many(titles)
 
     results = []
-    for d in docs:
+    for title in titles:
+        if title in records:
+            results.append((records[title], vector_scores.get(title)))
+            continue
+
+        d = docs_by_title[title]
+
         page_content = d.page_content or ""
         description = (
             page_content.split("Description:", 1)[-1].strip()
@@ -63,38 +246,120 @@ def rag_books_by_description(user_prompt: str, excluded_titles: List[str]) -> Li
             else page_content.strip()
         )
 
-        results.append({
-            "title": d.metadata.get("title", ""),
-            "authors": d.metadata.get("authors", []),
+        results.append(({
+            "title": title,
+            "authors": list(split_names(d.metadata.get("authors"))),
             "publishedDate": d.metadata.get("publishedDate", ""),
-            "categories": d.metadata.get("categories", []),
+            "categories": list(split_names(d.metadata.get("categories"))),
             "bookLength": d.metadata.get("bookLength"),
             "description": description,
-        })
+        }, vector_scores.get(title)))
 
     return results
 
 
+def rag_books_by_description(
+    user_prompt: str,
+    excluded_titles: List[str],
+    user_preferences: Optional[List[str]] = None,
+) -> List[dict]:
+    """
+    RAG step with the page count, year and category constraints of the prompt
+    and preferences (see rag_candidates).
+    Returns exactly TOP_K_RETURN_BOOKS distinct books (if available).
+    """
+    constraints = extract_constraints(user_prompt, user_preferences, get_book_store().category_names())
+    return [book for book, _ in rag_candidates(user_prompt, excluded_titles, constraints)]
+
+
+def preference_scores(titles: List[str], user_preferences: Optional[List[str]]) -> Optional[List[Optional[float]]]:
+    """
+    Similarity of each title's best matching chunk to the embedded preferences,
+    from a vector search restricted to the titles (RAG_CHUNK_OVERFETCH matches per
+    title). Titles crowded out by other titles' chunks are searched again on their
+    own, so only titles without any chunk score None. None without preferences.
+    """
+    if not user_preferences or not titles:
+        return None
+    store = get_vector_store()
+    preference_embedding = embed_text(store, "; ".join(user_preferences))
+    scores: Dict[str, float] = {}
+    missing = list(dict.fromkeys(titles))
+    with timed("preference_search"):
+        while missing:
+            docs_with_scores = store.similarity_search_by_vector_with_score(
+                preference_embedding,
+                k=len(missing) * max(1, RAG_CHUNK_OVERFETCH),
+                filter={"title": {"$in": missing}},
+            )
+            found = {d.metadata.get("title", ""): score for d, score in group_by_title(docs_with_scores, scoring="max")}
+            if not found:
+                break
+            scores.update(found)
+            missing = [title for title in missing if title not in scores]
+    return [scores.get(title) for title in titles]
+
+
+def prerank_candidates(
+    user_prompt: str,
+    excluded_titles: List[str],
+    user_preferences: Optional[List[str]] = None,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Wide RAG retrieval (PRERANK_CANDIDATES books) scored locally by preranker.prerank
+    from vector score, preference similarity, constraint fit and review averages.
+    Returns:
+      - the top PRERANK_TOP_N books
+      - a trace step with the scores
+    """
+    constraints = extract_constraints(user_prompt, user_preferences, get_book_store().category_names())
+    candidates = rag_candidates(user_prompt, excluded_titles, constraints, k=PRERANK_CANDIDATES)
+    books = [book for book, _ in candidates]
+    titles = [book["title"] for book in books]
+
+    preferences = preference_scores(titles, user_preferences)
+    rows_by_title = fetch_review_rows(titles)
+
+    with timed("prerank") as span:
+        ranked = prerank(
+            books,
+            [score for _, score in candidates],
+            preferences,
+            constraints,
+            [review_average(rows_by_title.get(title, [])) for title in titles],
+            top_n=PRERANK_TOP_N,
+        )
+
+    step = {
+        "module": "PreRanker",
+        "prompt": {
+            "user_prompt": user_prompt,
+            "user_preferences": user_preferences or [],
+            "constraints": constraints.to_dict(),
+            "candidates": len(books),
+        },
+        "response": {"ranked": [{"title": titles[i], "score": round(score, 4)} for i, score in ranked]},
+        "duration_ms": span.duration_ms,
+    }
+    return [books[i] for i, _ in ranked], [step]
+
+
 def llm_select_books_by_description(
     user_prompt: str,
     rag_books: List[Dict[str, Any]],
     user_preferences: Optional[List[str]] = None,
+    budget: Optional[LatencyBudget] = None,
 ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
     """
     LLM step: select up to 4 books from the RAG results.
+    Raises CuratorUnavailable when the call does not fit the latency budget.
     Returns:
       - selected books
       - llm steps for tracing
     """
     user_preferences = user_preferences or []
 
-    llm = ChatOpenAI(
-        model=LLM_MODEL,
-        api_key=OPENAI_API_KEY,
-        base_url=OPENAI_BASE_URL,
-        max_tokens=1024,
-        temperature=1,
-    )
+    llm = get_curator_llm()
 
     prompt = f"""
     You are an expert book curator.
@@ -126,7 +391,8 @@ def llm_select_books_by_description(
     {json.dumps(rag_books, ensure_ascii=False)}
     """.strip()
 
-    response = llm.invoke(prompt)
+    with timed("llm_description_select") as span:
+        response = (budget or LatencyBudget(0)).call("DescriptionSelector", llm.invoke, prompt)
     raw = (response.content or "").strip()
 
     llm_step = {
@@ -138,7 +404,8 @@ def llm_select_books_by_description(
         },
         "response": {
             "raw_output": response.content or ""
-        }
+        },
+        "duration_ms": span.duration_ms,
     }
 
     if not raw:
@@ -160,36 +427,57 @@ def llm_select_books_by_description(
     return selected_books, [llm_step]
 
 
-def attach_reviews(books: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def fetch_review_rows(titles: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """Review rows per title, from reviews_cache or one Supabase query for the rest."""
     # Handle missing Supabase client
     if not supabase_client:
-        for book in books:
-            book["summary_reviews"] = []
-            book["avg_score"] = None
-        return books
+        return {}
+
+    rows_by_title = {}
+    for title in dict.fromkeys(titles):
+        cached = reviews_cache.get(title)
+        if cached is not None:
+            rows_by_title[title] = cached
 
-    titles = [b["title"] for b in books]
+    titles = [t for t in dict.fromkeys(titles) if t not in rows_by_title]
 
-    rows = (
-        supabase_client.table("books_ratings")
-        .select("title,review_summary,review_score")
-        .in_("title", titles)
-        .execute()
-        .data
-    ) or []
+    if titles:
+        with timed("reviews_fetch"):
+            rows = (
+                supabase_client.table("books_ratings")
+                .select("title,review_summary,review_score")
+                .in_("title", titles)
+                .execute()
+                .data
+            ) or []
+
+        for title in titles:
+            rows_by_title[title] = [r for r in rows if r["title"] == title]
+            # Books without reviews are cached too, so they are not fetched again.
+            reviews_cache.set(title, rows_by_title[title])
+
+    return rows_by_title
+
+
+def review_average(rows: List[Dict[str, Any]]) -> Optional[float]:
+    scores = [r["review_score"] for r in rows if r["review_score"] is not None]
+    return sum(scores) / len(scores) if scores else None
+
+
+def attach_reviews(books: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    rows_by_title = fetch_review_rows([b["title"] for b in books])
 
     for book in books:
         title = book["title"]
 
-        relevant = [r for r in rows if r["title"] == title]
+        relevant = rows_by_title.get(title, [])
 
         book["summary_reviews"] = [
             f"{r['review_summary']}, {r['review_score']}"
             for r in relevant
         ]
 
-        scores = [r["review_score"] for r in relevant if r["review_score"] is not None]
-        book["avg_score"] = sum(scores) / len(scores) if scores else None
+        book["avg_score"] = review_average(relevant)
 
     return books
 
@@ -197,9 +485,11 @@ def attach_reviews(books: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
 def llm_choose_book_by_reviews(
     user_prompt: str,
     description_books: List[dict],
+    budget: Optional[LatencyBudget] = None,
 ) -> Tuple[str, List[Dict[str, Any]]]:
     """
     Chooses ONE book title based on request + reviews.
+    Raises CuratorUnavailable when the call does not fit the latency budget.
     Returns:
       - selected title
       - llm steps for tracing
@@ -209,13 +499,7 @@ def llm_choose_book_by_reviews(
     if not description_books:
         return "", []
 
-    llm = ChatOpenAI(
-        model=LLM_MODEL,
-        api_key=OPENAI_API_KEY,
-        base_url=OPENAI_BASE_URL,
-        max_tokens=1024,
-        temperature=1,
-    )
+    llm = get_curator_llm()
 
     prompt = f"""
     You are an expert reader and book curator. Choose ONE final book for the user.
@@ -254,7 +538,8 @@ def llm_choose_book_by_reviews(
     {json.dumps(description_books, ensure_ascii=False)}
     """.strip()
 
-    response = llm.invoke(prompt)
+    with timed("llm_review_select") as span:
+        response = (budget or LatencyBudget(0)).call("ReviewFinalSelector", llm.invoke, prompt)
     raw = (response.content or "").strip()
 
     llm_step = {
@@ -265,7 +550,8 @@ def llm_choose_book_by_reviews(
         },
         "response": {
             "raw_output": response.content or ""
-        }
+        },
+        "duration_ms": span.duration_ms,
     }
 
     if not raw:
@@ -315,6 +601,8 @@ def recommendation_tool(
             "description": "Short description of the book",
             "llm_steps": [...]
         }
+        plus "degraded": true when the curator LLM did not answer within the
+        latency budget and the pre-ranker's top book was returned instead.
 
         If not found:
         {
@@ -322,18 +610,122 @@ def recommendation_tool(
             "llm_steps": [...]
         }
     """
+    key = json.dumps(
+        [user_prompt.strip(), sorted(excluded_titles or []), user_preferences or []],
+        ensure_ascii=False,
+    )
+    with timed("recommendation"):
+        cached = recommendation_cache.get(key)
+        if cached is not None:
+            return cached
+        result = recommendation_flight.do(
+            key, lambda: _recommend(user_prompt, excluded_titles, user_preferences)
+        )
+        # Degraded answers are not cached: the next request may reach the LLM again.
+        if not result.get("degraded"):
+            recommendation_cache.set(key, result)
+        return result
+
+
+def _found(book: Dict[str, Any], llm_steps: List[Dict[str, Any]]) -> dict:
+    return {
+        "status": "found",
+        "title": book.get("title"),
+        "authors": book.get("authors"),
+        "published_date": book.get("publishedDate"),
+        "categories": book.get("categories"),
+        "book_length": book.get("bookLength"),
+        "description": book.get("description"),
+        "llm_steps": llm_steps,
+    }
+
+
+def _degraded(
+    ranked_books: List[Dict[str, Any]],
+    error: CuratorUnavailable,
+    llm_steps: List[Dict[str, Any]],
+) -> dict:
+    """
+    Answer without the curator LLM: the first of ranked_books, which are in
+    pre-ranker order (vector score, preference match, constraint fit, reviews),
+    or RAG order when PRERANK_CANDIDATES=0.
+    """
+    if not ranked_books:
+        return {"status": "no_match", "llm_steps": llm_steps}
+
+    book = ranked_books[0]
+    step = {
+        "module": "DegradedFallback",
+        "prompt": {"stage": error.stage, "reason": error.reason, "budget_left_ms": round(error.remaining * 1000, 1)},
+        "response": {"title": book.get("title"), "candidates": [b.get("title") for b in ranked_books]},
+        "duration_ms": 0.0,
+    }
+    result = _found(book, llm_steps + [step])
+    result["degraded"] = True
+    return result
+
+
+def named_book(user_prompt: str, excluded_titles: List[str]) -> Optional[dict]:
+    """
+    Fast path for prompts that name a specific book: resolved from the BM25
+    title/author index, with no vector search or curator LLM calls.
+    """
+    lexical = get_lexical_index()
+    if not NAMED_BOOK_FAST_PATH or not len(lexical):
+        return None
+
+    excluded = {t.strip().lower() for t in excluded_titles or []}
+    with timed("named_book_lookup") as span:
+        match = lexical.match_named_book(user_prompt, excluded=excluded)
+    if match is None:
+        return None
+
+    row, score = match
+    book = lexical.store.record(row)
+    step = {
+        "module": "NamedBookResolver",
+        "prompt": {"user_prompt": user_prompt},
+        "response": {"title": book["title"], "bm25_score": round(score, 3)},
+        "duration_ms": span.duration_ms,
+    }
+    return _found(book, [step])
+
+
+def _recommend(
+    user_prompt: str,
+    excluded_titles: List[str],
+    user_preferences: Optional[List[str]] = None
+) -> dict:
+    named = named_book(user_prompt, excluded_titles)
+    if named is not None:
+        return named
+
     llm_steps: List[Dict[str, Any]] = []
+    budget = LatencyBudget()
 
-    rag_books = rag_books_by_description(
-        user_prompt=user_prompt,
-        excluded_titles=excluded_titles,
-    )
+    if PRERANK_CANDIDATES > 0:
+        rag_books, prerank_steps = prerank_candidates(
+            user_prompt=user_prompt,
+            excluded_titles=excluded_titles,
+            user_preferences=user_preferences,
+        )
+        llm_steps.extend(prerank_steps)
+    else:
+        rag_books = rag_books_by_description(
+            user_prompt=user_prompt,
+            excluded_titles=excluded_titles,
+            user_preferences=user_preferences,
+        )
 
-    description_books, description_steps = llm_select_books_by_description(
-        user_prompt=user_prompt,
-        rag_books=rag_books,
-        user_preferences=user_preferences,
-    )
+    try:
+        description_books, description_steps = llm_select_books_by_description(
+            user_prompt=user_prompt,
+            rag_books=rag_books,
+            user_preferences=user_preferences,
+            budget=budget,
+        )
+    except CuratorUnavailable as e:
+        return _degraded(rag_books, e, llm_steps)
     llm_steps.extend(description_steps)
 
     if not description_books:
@@ -342,10 +734,15 @@ def recommendation_tool(
             "llm_steps": llm_steps,
         }
 
-    rating_book, review_steps = llm_choose_book_by_reviews(
-        user_prompt=user_prompt,
-        description_books=description_books,
-    )
+    try:
+        rating_book, review_steps = llm_choose_book_by_reviews(
+            user_prompt=user_prompt,
+            description_books=description_books,
+            budget=budget,
+        )
+    except CuratorUnavailable as e:
+        # description_books keep the pre-ranker order of rag_books.
+        return _degraded(description_books, e, llm_steps)
     llm_steps.extend(review_steps)
 
     if not rating_book:
@@ -366,14 +763,5 @@ def recommendation_tool(
             "llm_steps": llm_steps,
         }
 
-    return {
-        "status": "found",
-        "title": selected_book.get("title"),
-        "authors": selected_book.get("authors"),
-        "published_date": selected_book.get("publishedDate"),
-        "categories": selected_book.get("categories"),
-        "book_length": selected_book.get("bookLength"),
-        "description": selected_book.get("description"),
-        "llm_steps": llm_steps,
-    }
+    return _found(selected_book, llm_steps)
 
@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Any
+
+from metrics import REGISTRY
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+BREAKER_WINDOW = int(os.getenv("SHOP_BREAKER_WINDOW", "20"))
+BREAKER_MIN_REQUESTS = int(os.getenv("SHOP_BREAKER_MIN_REQUESTS", "5"))
+BREAKER_FAILURE_RATE = float(os.getenv("SHOP_BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_OPEN_SECONDS = float(os.getenv("SHOP_BREAKER_OPEN_SECONDS", "30"))
+LATENCY_EWMA_ALPHA = 0.2
+
+
+class ShopHealth:
+    """
+    Rolling health of one shop plus a circuit breaker.
+
+    - closed: every request goes through; opens when the error rate over the
+      last BREAKER_WINDOW outcomes reaches BREAKER_FAILURE_RATE.
+    - open: requests are skipped until BREAKER_OPEN_SECONDS have passed.
+    - half_open: a single probe request is let through; success closes the
+      breaker, failure opens it again.
+    """
+    def __init__(self, shop: str):
+        self.shop = shop
+        self.state = CLOSED
+        self.outcomes = deque(maxlen=BREAKER_WINDOW)
+        self.latency_ewma = None
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    @property
+    def score(self) -> float:
+        """1.0 for a fast, healthy shop; falls with errors and latency."""
+        latency = self.latency_ewma or 0.0
+        return round((1.0 - self.error_rate) / (1.0 + latency), 4)
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < BREAKER_OPEN_SECONDS:
+                    REGISTRY.inc("bookbuy_shop_breaker_skips_total", labels={"shop": self.shop})
+                    return False
+                self._set_state(HALF_OPEN)
+
+            if self.probe_in_flight:
+                REGISTRY.inc("bookbuy_shop_breaker_skips_total", labels={"shop": self.shop})
+                return False
+            self.probe_in_flight = True
+            return True
+
+    def record(self, success: bool, latency: float) -> None:
+        with self._lock:
+            self.outcomes.append(success)
+            if self.latency_ewma is None:
+                self.latency_ewma = latency
+            else:
+                self.latency_ewma += LATENCY_EWMA_ALPHA * (latency - self.latency_ewma)
+
+            if self.state == HALF_OPEN:
+                self.probe_in_flight = False
+                if success:
+                    self.outcomes.clear()
+                    self._set_state(CLOSED)
+                else:
+                    self._open()
+            elif (
+                self.state == CLOSED
+                and len(self.outcomes) >= BREAKER_MIN_REQUESTS
+                and self.error_rate >= BREAKER_FAILURE_RATE
+            ):
+                self._open()
+
+            labels = {"shop": self.shop}
+            REGISTRY.set_gauge("bookbuy_shop_error_rate", self.error_rate, labels)
+            REGISTRY.set_gauge("bookbuy_shop_latency_ewma_seconds", self.latency_ewma, labels)
+            REGISTRY.set_gauge("bookbuy_shop_health_score", self.score, labels)
+
+    def _open(self) -> None:
+        self.opened_at = time.monotonic()
+        self._set_state(OPEN)
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        REGISTRY.set_gauge("bookbuy_shop_breaker_state", STATE_VALUES[state], {"shop": self.shop})
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "shop": self.shop,
+                "breaker_state": self.state,
+                "error_rate": round(self.error_rate, 4),
+                "latency_ewma_ms": round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+                "score": self.score,
+            }
+
+
+_health: Dict[str, ShopHealth] = {}
+_health_lock = threading.Lock()
+
+
+def get_shop_health(shop: str) -> ShopHealth:
+    health = _health.get(shop)
+    if health is None:
+        with _health_lock:
+            health = _health.setdefault(shop, ShopHealth(shop))
+    return health
+
+
+def shop_health_snapshot() -> Dict[str, Dict[str, Any]]:
+    return {shop: health.snapshot() for shop, health in list(_health.items())}
@@ -0,0 +1,75 @@
+import copy
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from metrics import REGISTRY
+
+MAX_TRACKED_KEYS = 1000
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Collapses identical concurrent calls into one execution.
+
+    The first caller for a key (the leader) runs fn; callers arriving while it
+    is in flight wait and receive a deep copy of the leader's result, or the
+    same exception.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self._key_stats: "OrderedDict[str, Dict[str, int]]" = OrderedDict()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                REGISTRY.set_gauge("bookbuy_singleflight_in_flight", len(self._calls), {"flight": self.name})
+            self._count(key, leader)
+
+        if not leader:
+            REGISTRY.inc("bookbuy_singleflight_shared_total", labels={"flight": self.name})
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        REGISTRY.inc("bookbuy_singleflight_executions_total", labels={"flight": self.name})
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                REGISTRY.set_gauge("bookbuy_singleflight_in_flight", len(self._calls), {"flight": self.name})
+            call.event.set()
+
+    def _count(self, key: str, leader: bool) -> None:
+        stats = self._key_stats.pop(key, None) or {"executions": 0, "shared": 0}
+        stats["executions" if leader else "shared"] += 1
+        self._key_stats[key] = stats
+        if len(self._key_stats) > MAX_TRACKED_KEYS:
+            self._key_stats.popitem(last=False)
+
+    def key_stats(self, limit: int = 50) -> Dict[str, Dict[str, int]]:
+        """Most recently used keys with their execution and shared-result counts."""
+        with self._lock:
+            items = list(self._key_stats.items())[-limit:]
+        return dict(reversed(items))
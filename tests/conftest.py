@@ -0,0 +1,13 @@
+import pytest
+
+
+@pytest.fixture(scope="session")
+def retailer(tmp_path_factory):
+    """mock_retailer.main, imported with compact catalogs and no startup profiles."""
+    with pytest.MonkeyPatch.context() as mp:
+        # Keep the import-time catalog load away from the repo's shared catalog files.
+        mp.setenv("MOCK_RETAILER_CATALOG", "compact")
+        mp.setenv("MOCK_RETAILER_IDEMPOTENCY_DB", str(tmp_path_factory.mktemp("idem") / "unused.sqlite3"))
+        mp.setenv("MOCK_RETAILER_PROFILES", "")
+        from mock_retailer import main
+    return main
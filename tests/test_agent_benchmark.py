@@ -0,0 +1,24 @@
+import pytest
+
+from benchmarks.agent_benchmark import percentile
+
+
+@pytest.mark.parametrize(
+    "values, pct, expected",
+    [
+        (list(range(1, 11)), 50, 5),
+        (list(range(1, 5)), 50, 2),
+        (list(range(1, 11)), 95, 10),
+        (list(range(1, 101)), 99, 99),
+        (list(range(1, 101)), 1, 1),
+        ([3.0], 99, 3.0),
+        ([5, 1, 3], 0, 1),
+        ([5, 1, 3], 100, 5),
+    ],
+)
+def test_percentile_is_nearest_rank(values, pct, expected):
+    assert percentile(values, pct) == expected
+
+
+def test_percentile_of_nothing():
+    assert percentile([], 50) == 0.0
@@ -0,0 +1,54 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from mock_retailer.best_offers import lookup_offers
+from mock_retailer.compact_catalog import CompactCatalog
+from mock_retailer.profiles import ShopProfile
+
+CATALOGS = {
+    "cheap_but_empty": CompactCatalog.from_rows([("Dune", 5.0, 0, "Fiction")]),
+    "pricey": CompactCatalog.from_rows([("Dune", 12.0, 3, "Fiction"), ("Emma", 4.0, 1, "Classics")]),
+    "middle": CompactCatalog.from_rows([("Dune", 8.0, 1, "Fiction")]),
+    "tied": CompactCatalog.from_rows([("Dune", 8.0, 2, "Fiction")]),
+}
+
+
+def test_offers_cheapest_first_and_best_in_stock():
+    result = lookup_offers(CATALOGS, "dune")
+    assert [o["shop_id"] for o in result["offers"]] == ["cheap_but_empty", "middle", "tied", "pricey"]
+    assert result["offers"][0]["stock"] is False
+    assert result["best"] == {"shop_id": "middle", "title": "Dune", "price": 8.0, "stock": True, "quantity": 1}
+
+
+def test_only_the_given_shops_are_asked():
+    result = lookup_offers(CATALOGS, "dune", ["pricey", "cheap_but_empty"])
+    assert [o["shop_id"] for o in result["offers"]] == ["cheap_but_empty", "pricey"]
+    assert result["best"]["shop_id"] == "pricey"
+
+
+def test_lookups_see_purchases():
+    catalogs = {"shop": CompactCatalog.from_rows([("Dune", 8.0, 1, "Fiction")])}
+    catalogs["shop"].decrement_stock("dune")
+    result = lookup_offers(catalogs, "dune")
+    assert result["best"] is None
+    assert result["offers"][0]["quantity"] == 0
+
+
+def test_unknown_title_or_no_shops():
+    assert lookup_offers(CATALOGS, "unknown") is None
+    assert lookup_offers(CATALOGS, "dune", []) is None
+
+
+def test_endpoint_answers_for_the_shops_done_by_the_deadline(retailer, monkeypatch):
+    monkeypatch.setattr(retailer, "CATALOGS", {"middle": CATALOGS["middle"], "pricey": CATALOGS["pricey"]})
+    monkeypatch.setattr("mock_retailer.profiles.PROFILES", {"middle": ShopProfile(latency="const:5000")})
+    monkeypatch.setattr("mock_retailer.profiles.PROFILES_FILE", None)
+    client = TestClient(retailer.app)
+
+    start = time.monotonic()
+    res = client.get("/best-offer", params={"title": "Dune", "deadline": 0.2})
+    assert time.monotonic() - start < 2.0
+    assert res.status_code == 200
+    assert [o["shop_id"] for o in res.json()["offers"]] == ["pricey"]
+    assert res.json()["errors"] == [{"shop_id": "middle", "status_code": 504, "detail": "No answer within 0.2s"}]
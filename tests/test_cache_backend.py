@@ -0,0 +1,84 @@
+import sqlite3
+
+import pytest
+
+from cache_backend import MemoryCache, NullCache, SQLiteCache
+from metrics import REGISTRY
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, tmp_path):
+    if request.param == "memory":
+        return MemoryCache(max_entries=3)
+    return SQLiteCache(str(tmp_path / "cache.sqlite3"))
+
+
+def test_round_trip_and_namespaces(cache):
+    cache.set("offers", "dune", {"price": 9.99}, ttl=60)
+    assert cache.get("offers", "dune") == {"price": 9.99}
+    assert cache.get("reviews", "dune") is None
+    assert cache.get("offers", "emma", default="miss") == "miss"
+
+    cache.delete("offers", "dune")
+    assert cache.get("offers", "dune") is None
+    assert cache.stats()["offers"] == {"hits": 1, "misses": 2, "sets": 1, "hit_rate": 0.3333}
+
+
+def test_values_are_copies(cache):
+    cache.set("offers", "dune", {"shops": []}, ttl=60)
+    cache.get("offers", "dune")["shops"].append("mutated")
+    assert cache.get("offers", "dune") == {"shops": []}
+
+
+def test_expired_and_zero_ttl_entries_miss(cache):
+    cache.set("offers", "expired", 1, ttl=-1)
+    cache.set("offers", "zero", 1, ttl=0)
+    assert cache.get("offers", "expired") is None
+    assert cache.get("offers", "zero") is None
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(max_entries=2)
+    cache.set("ns", "a", 1, ttl=60)
+    cache.set("ns", "b", 2, ttl=60)
+    cache.get("ns", "a")
+    cache.set("ns", "c", 3, ttl=60)
+    assert cache.get("ns", "a") == 1
+    assert cache.get("ns", "b") is None
+    assert cache.get("ns", "c") == 3
+
+
+def test_sqlite_cache_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    SQLiteCache(path).set("embeddings", "query", [0.1, 0.2], ttl=60)
+    assert SQLiteCache(path).get("embeddings", "query") == [0.1, 0.2]
+
+
+def test_sqlite_errors_degrade_to_misses(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SQLiteCache(path)
+    cache.set("reviews", "dune", [5], ttl=60)
+    # Another process breaking the file: every statement now fails.
+    other = sqlite3.connect(path)
+    other.execute("DROP TABLE cache")
+    other.commit()
+    other.close()
+
+    def errors(operation):
+        key = REGISTRY._key({"namespace": "reviews", "operation": operation})
+        return REGISTRY.counters.get("bookbuy_cache_errors_total", {}).get(key, 0.0)
+
+    before = {op: errors(op) for op in ("get", "set", "delete")}
+
+    assert cache.get("reviews", "dune", default="miss") == "miss"
+    cache.set("reviews", "dune", [4], ttl=60)
+    cache.delete("reviews", "dune")
+
+    assert {op: errors(op) - before[op] for op in before} == {"get": 1, "set": 1, "delete": 1}
+    assert cache.stats()["reviews"]["misses"] == 1
+
+
+def test_null_cache_never_hits():
+    cache = NullCache()
+    cache.set("offers", "dune", 1, ttl=60)
+    assert cache.get("offers", "dune") is None
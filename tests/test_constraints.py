@@ -0,0 +1,133 @@
+import pytest
+
+from constraints import extract_constraints, published_year
+
+CATEGORIES = ["Fiction", "Romance", "Horror", "History", "Science", "Biography & Autobiography", "Juvenile Fiction"]
+
+
+def _pages(prompt):
+    c = extract_constraints(prompt)
+    return c.min_pages, c.max_pages
+
+
+def _years(prompt):
+    c = extract_constraints(prompt)
+    return c.min_year, c.max_year
+
+
+def _categories(prompt, preferences=None):
+    c = extract_constraints(prompt, preferences, CATEGORIES)
+    return c.categories, c.excluded_categories
+
+
+@pytest.mark.parametrize(
+    "prompt, pages",
+    [
+        ("a thriller under 300 pages", (None, 300)),
+        ("at least 500 pages please", (500, None)),
+        ("between 200 and 400 pages", (200, 400)),
+        ("book length: 400-150 pages", (150, 400)),
+        ("around 200 pages", (150, 250)),
+        ("a short novel for the train", (None, 250)),
+        ("a short novel, no more than 180 pages", (None, 180)),
+        ("more than 100 pages but under 300 pages", (100, 300)),
+        ("no less than 350 pages", (350, None)),
+        ("not more than 120 pages", (None, 120)),
+        ("a good mystery", (None, None)),
+    ],
+)
+def test_page_constraints(prompt, pages):
+    assert _pages(prompt) == pages
+
+
+@pytest.mark.parametrize(
+    "prompt, years",
+    [
+        ("published after 2010", (2011, None)),
+        ("published since 2010", (2010, None)),
+        ("written before 1900", (None, 1899)),
+        ("something that came out after 2015", (2016, None)),
+        ("books newer than 2015", (2016, None)),
+        # Years describing the story are not publication years.
+        ("a novel set after 1945 in Berlin", (None, None)),
+        ("anything since 2010", (None, None)),
+        ("a mystery set in the 1920s", (None, None)),
+        ("a war story that takes place between 1939 and 1945", (None, None)),
+        ("a novel set in the 1920s, published in the 1990s", (1990, 1999)),
+        ("from the 1990s", (1990, 1999)),
+        ("published in 1984", (1984, 1984)),
+        ("between 1950 and 1960", (1950, 1960)),
+        ("the 300 page epic", (None, None)),
+    ],
+)
+def test_year_constraints(prompt, years):
+    assert _years(prompt) == years
+
+
+@pytest.mark.parametrize(
+    "prompt, preferences, wanted, rejected",
+    [
+        ("a history book", None, ["History"], []),
+        ("no romance please", None, [], ["Romance"]),
+        ("no romance or horror", None, [], ["Romance", "Horror"]),
+        ("I don't want horror, but history is fine", None, ["History"], ["Horror"]),
+        ("anything but romance", None, [], ["Romance"]),
+        ("history without any romance", None, ["History"], ["Romance"]),
+        # "not too" is about degree, not a rejection.
+        ("science that is not too dense", None, ["Science"], []),
+        # Hyphenated words and genre compounds name neither category.
+        ("some non-fiction", None, [], []),
+        ("science fiction", None, [], []),
+        # Either part of a combined category name matches it.
+        ("a biography of a chemist", None, ["Biography & Autobiography"], []),
+        # The longest category name wins over the words inside it.
+        ("juvenile fiction for my nephew", None, ["Juvenile Fiction"], []),
+        # Preferences are checked one by one; a dislike list negates all it names.
+        ("something new", ["likes: history", "dislikes: romance, horror"], ["History"], ["Romance", "Horror"]),
+        # A category both wanted and rejected is rejected.
+        ("horror, or actually no horror", None, [], ["Horror"]),
+    ],
+)
+def test_category_constraints(prompt, preferences, wanted, rejected):
+    assert _categories(prompt, preferences) == (wanted, rejected)
+
+
+def test_filters_exclude_rejected_categories_at_every_level():
+    c = extract_constraints("no horror, under 300 pages, published after 2000", categories=CATEGORIES)
+    assert c.to_filter() == {
+        "bookLength": {"$lte": 300},
+        "publishedYear": {"$gte": 2001},
+        "categories": {"$nin": ["Horror"]},
+    }
+    assert c.relaxations() == [
+        c.to_filter(),
+        {"bookLength": {"$lte": 300}, "categories": {"$nin": ["Horror"]}},
+        {"categories": {"$nin": ["Horror"]}},
+    ]
+
+
+def test_wanted_categories_are_not_filtered_on():
+    c = extract_constraints("a history book", categories=CATEGORIES)
+    assert c.to_filter() is None
+    assert c.relaxations() == [None]
+    assert not c.is_empty()
+
+
+def test_matches_and_category_match():
+    c = extract_constraints("history under 300 pages from the 1990s, no horror", categories=CATEGORIES)
+    book = {"bookLength": 250, "publishedDate": "1994-05-01", "categories": ["History"]}
+    assert c.matches(book) and c.category_match(book)
+
+    assert not c.matches({**book, "bookLength": 301})
+    assert not c.matches({**book, "bookLength": None})
+    assert not c.matches({**book, "publishedDate": "2001"})
+    assert not c.matches({**book, "categories": ["History", "Horror"]})
+    assert c.matches({**book, "categories": ["Science"]})
+    assert not c.category_match({**book, "categories": ["Science"]})
+
+
+def test_published_year():
+    assert published_year("2014-06-05") == 2014
+    assert published_year(1996) == 1996
+    assert published_year("") is None
+    assert published_year(None) is None
@@ -0,0 +1,81 @@
+import threading
+import time
+
+import httpx
+import openai
+import pytest
+
+import curator_budget
+from curator_budget import CuratorUnavailable, LatencyBudget, expected_latency, record_latency
+
+
+@pytest.fixture(autouse=True)
+def fresh_latencies(monkeypatch):
+    monkeypatch.setattr(curator_budget, "_latency_ewma", {})
+    monkeypatch.setattr(curator_budget, "_latency_updated", {})
+
+
+def test_unlimited_budget_calls_inline_and_records_latency():
+    budget = LatencyBudget(0)
+    assert budget.call("rank", lambda x: x * 2, 21) == 42
+    assert budget.call("rank", threading.current_thread) is threading.current_thread()
+    assert budget.remaining() is None
+    assert expected_latency("rank") is not None
+
+
+def test_budget_starts_at_the_first_call():
+    budget = LatencyBudget(1.0)
+    time.sleep(0.05)
+    assert budget.remaining() == 1.0
+    budget.call("rank", lambda: None)
+    assert 0.9 < budget.remaining() < 1.0
+
+
+def test_slow_call_times_out():
+    release = threading.Event()
+    budget = LatencyBudget(0.05)
+    with pytest.raises(CuratorUnavailable) as e:
+        budget.call("rank", release.wait, 5)
+    release.set()
+    assert e.value.reason == "timeout"
+    assert e.value.stage == "rank"
+
+
+def test_call_is_skipped_when_the_stage_is_known_to_be_slower_than_the_budget():
+    record_latency("rank", 2.0)
+    calls = []
+    with pytest.raises(CuratorUnavailable) as e:
+        LatencyBudget(1.0).call("rank", calls.append, 1)
+    assert e.value.reason == "budget"
+    assert not calls
+    # Other stages are unaffected.
+    assert LatencyBudget(1.0).call("select", lambda: "ok") == "ok"
+
+
+def test_stale_latency_estimate_lets_a_probe_through(monkeypatch):
+    record_latency("rank", 2.0)
+    monkeypatch.setattr(curator_budget, "CURATOR_LATENCY_STALE_SECONDS", 0.0)
+    assert expected_latency("rank") is None
+    assert LatencyBudget(1.0).call("rank", lambda: "ok") == "ok"
+
+
+def test_latency_ewma():
+    record_latency("rank", 1.0)
+    record_latency("rank", 2.0)
+    assert expected_latency("rank") == pytest.approx(1.0 + curator_budget.LATENCY_EWMA_ALPHA)
+
+
+def test_api_errors_degrade_and_other_errors_propagate():
+    def api_error():
+        raise openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+
+    def bug():
+        raise ZeroDivisionError()
+
+    with pytest.raises(CuratorUnavailable) as e:
+        LatencyBudget(1.0).call("rank", api_error)
+    assert e.value.reason == "error"
+    assert isinstance(e.value.__cause__, openai.APIError)
+
+    with pytest.raises(ZeroDivisionError):
+        LatencyBudget(1.0).call("rank", bug)
@@ -0,0 +1,67 @@
+import threading
+import time
+
+import pytest
+
+import find_and_buy_tools
+from cache_backend import NullCache, set_cache, get_cache
+from find_and_buy_tools import SHOPS, _find_prices
+
+STALLED = SHOPS[0]
+
+
+@pytest.fixture(autouse=True)
+def no_cache():
+    previous = get_cache()
+    set_cache(NullCache())
+    yield
+    set_cache(previous)
+
+
+@pytest.fixture
+def stalled_shop(monkeypatch):
+    """STALLED never answers until the test ends; the other shops answer at once."""
+    release = threading.Event()
+
+    def search(shop, book_title, timeout=None):
+        if shop == STALLED:
+            release.wait(30)
+            return {"ok": False, "shop": shop, "error": "timed out", "shop_failure": False}
+        return {"ok": True, "offer": {"shop": shop, "price": 10.0, "in_stock": True, "store_title": book_title}}
+
+    monkeypatch.setattr(find_and_buy_tools, "_search_shop_request", search)
+    monkeypatch.setattr(find_and_buy_tools, "BEST_OFFER_FAST_PATH", False)
+    monkeypatch.setattr(find_and_buy_tools, "FIND_PRICES_DEADLINE_SECONDS", 0.5)
+    yield
+    release.set()
+
+
+def test_stalled_shop_does_not_delay_the_other_shops(stalled_shop):
+    # Earlier sweeps whose searches of the stalled shop still hold threads.
+    for i in range(find_and_buy_tools.SHOP_SEARCH_THREADS):
+        find_and_buy_tools._shop_executors[STALLED].submit(find_and_buy_tools._search_shop, STALLED, f"Book {i}")
+
+    start = time.monotonic()
+    result = _find_prices("Dune")
+    assert time.monotonic() - start < 2.0
+    assert result["missing_shops"] == [STALLED]
+    assert [o["shop"] for o in result["offers"]] == SHOPS[1:]
+
+
+def test_deadline_covers_a_failed_best_offer_request(stalled_shop, monkeypatch):
+    timeouts = []
+
+    def lookup(book_title, shops, timeout):
+        timeouts.append(timeout)
+        time.sleep(timeout)
+        return None
+
+    monkeypatch.setattr(find_and_buy_tools, "_best_offer_lookup", lookup)
+    monkeypatch.setattr(find_and_buy_tools, "BEST_OFFER_FAST_PATH", True)
+
+    start = time.monotonic()
+    result = _find_prices("Dune")
+    assert time.monotonic() - start < 0.5 + 0.2
+    assert timeouts == [0.5 * find_and_buy_tools.BEST_OFFER_DEADLINE_FRACTION]
+    # The other shops still answer in the time that is left.
+    assert result["missing_shops"] == [STALLED]
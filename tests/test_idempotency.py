@@ -0,0 +1,103 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from mock_retailer.compact_catalog import CompactCatalog
+from mock_retailer.idempotency import CLAIMED, COMPLETED, IN_PROGRESS, MISMATCH, IdempotencyStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return IdempotencyStore(str(tmp_path / "idempotency.sqlite3"))
+
+
+def test_first_claim_wins_and_repeats_wait(store):
+    assert store.claim("shop", "key-1", "fp") == (CLAIMED, None)
+    assert store.claim("shop", "key-1", "fp") == (IN_PROGRESS, None)
+    # Keys are scoped per shop.
+    assert store.claim("other-shop", "key-1", "fp") == (CLAIMED, None)
+
+
+def test_completed_claim_replays_the_response(store):
+    store.claim("shop", "key-1", "fp")
+    store.complete("shop", "key-1", 400, {"detail": "Book is out of stock"})
+    assert store.claim("shop", "key-1", "fp") == (
+        COMPLETED,
+        {"status_code": 400, "body": {"detail": "Book is out of stock"}},
+    )
+
+
+def test_key_reused_for_another_request_is_a_mismatch(store):
+    store.claim("shop", "key-1", "fp")
+    assert store.claim("shop", "key-1", "other-fp") == (MISMATCH, None)
+    store.complete("shop", "key-1", 200, {})
+    assert store.claim("shop", "key-1", "other-fp") == (MISMATCH, None)
+
+
+def test_released_claim_can_be_claimed_again(store):
+    store.claim("shop", "key-1", "fp")
+    store.release("shop", "key-1")
+    assert store.claim("shop", "key-1", "fp") == (CLAIMED, None)
+
+    # Completed keys are never released.
+    store.complete("shop", "key-1", 200, {"status": "confirmed"})
+    store.release("shop", "key-1")
+    assert store.claim("shop", "key-1", "fp")[0] == COMPLETED
+
+
+def test_stale_claim_is_taken_over_once(tmp_path):
+    store = IdempotencyStore(str(tmp_path / "idempotency.sqlite3"), stale_seconds=0.05)
+    other_worker = IdempotencyStore(store.path, stale_seconds=0.05)
+    store.claim("shop", "key-1", "fp")
+    time.sleep(0.1)
+
+    assert other_worker.claim("shop", "key-1", "fp") == (CLAIMED, None)
+    assert store.claim("shop", "key-1", "fp") == (IN_PROGRESS, None)
+
+
+def test_expired_keys_are_purged(tmp_path):
+    store = IdempotencyStore(str(tmp_path / "idempotency.sqlite3"), ttl_seconds=0.05)
+    store.claim("shop", "key-1", "fp")
+    store.complete("shop", "key-1", 200, {})
+    time.sleep(0.1)
+    store._last_purge = 0.0
+    assert store.claim("shop", "key-1", "other-fp") == (CLAIMED, None)
+
+
+@pytest.fixture
+def client(retailer, tmp_path, monkeypatch):
+    catalog = CompactCatalog.from_rows([("Dune", 9.99, 1, "Fiction")])
+    monkeypatch.setattr(retailer, "CATALOGS", {"test_shop": catalog})
+    monkeypatch.setattr(retailer, "IDEMPOTENCY", IdempotencyStore(str(tmp_path / "idempotency.sqlite3")))
+    monkeypatch.setattr("mock_retailer.profiles.PROFILES", {})
+    return TestClient(retailer.app)
+
+
+def _buy(client, key, title="Dune"):
+    return client.post(
+        "/shops/test_shop/buy",
+        json={"title": title, "user_address": "1 Main St", "payment_token": "tok"},
+        headers={"Idempotency-Key": key},
+    )
+
+
+def test_buy_endpoint_replays_instead_of_buying_again(client):
+    first = _buy(client, "order-1")
+    replay = _buy(client, "order-1")
+
+    assert first.status_code == 200
+    assert replay.status_code == 200
+    assert replay.json() == first.json()
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    # The single copy was bought once; a new key finds it sold out.
+    assert _buy(client, "order-2").status_code == 400
+
+
+def test_buy_endpoint_replays_errors_and_rejects_reused_keys(client):
+    assert _buy(client, "order-1", title="Unknown").status_code == 404
+    replay = _buy(client, "order-1", title="Unknown")
+    assert replay.status_code == 404
+    assert replay.headers["Idempotent-Replayed"] == "true"
+
+    assert _buy(client, "order-1").status_code == 422
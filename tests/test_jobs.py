@@ -0,0 +1,67 @@
+import os
+import time
+
+import jobs
+from jobs import DONE, FAILED, JobStore
+
+
+def _wait(store, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = store.get(job_id)
+        if job["status"] in (DONE, FAILED):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def _run(request, on_step):
+    on_step({"tool": "test", "input": request["prompt"]})
+    return {"status": "ok", "response": request["prompt"].upper()}
+
+
+def test_other_workers_read_jobs_from_the_store_dir(tmp_path):
+    worker, other_worker = JobStore(store_dir=str(tmp_path)), JobStore(store_dir=str(tmp_path))
+    job = worker.submit({"prompt": "dune"}, _run)
+
+    assert _wait(worker, job.job_id)["result"] == {"status": "ok", "response": "DUNE"}
+    from_file = other_worker.get(job.job_id)
+    assert from_file["status"] == DONE
+    assert from_file["steps"] == [{"tool": "test", "input": "dune"}]
+    assert other_worker.get("0" * 32) is None
+    assert other_worker.get("../etc/passwd") is None
+
+
+def test_failed_runs_are_recorded(tmp_path):
+    def fail(request, on_step):
+        raise RuntimeError("shop down")
+
+    store = JobStore(store_dir=str(tmp_path))
+    job = _wait(store, store.submit({"prompt": "dune"}, fail).job_id)
+    assert job["status"] == FAILED
+    assert job["result"]["error"] == "shop down"
+
+
+def test_sweep_removes_expired_files_of_any_worker(tmp_path):
+    old = time.time() - jobs.JOB_RETENTION_SECONDS - 10
+    for name in ("a" * 32 + ".json", "b" * 32 + ".json.123.tmp"):
+        (tmp_path / name).write_text("{}")
+        os.utime(tmp_path / name, (old, old))
+    (tmp_path / ("c" * 32 + ".json")).write_text("{}")
+    (tmp_path / "notes.txt").write_text("")
+    os.utime(tmp_path / "notes.txt", (old, old))
+
+    store = JobStore(store_dir=str(tmp_path))
+    _wait(store, store.submit({"prompt": "dune"}, _run).job_id)
+
+    names = sorted(os.listdir(tmp_path))
+    assert "a" * 32 + ".json" not in names
+    assert "b" * 32 + ".json.123.tmp" not in names
+    assert "c" * 32 + ".json" in names and "notes.txt" in names
+    assert len(names) == 3
+
+
+def test_in_process_store_without_dir():
+    store = JobStore(store_dir="")
+    job = store.submit({"prompt": "emma"}, _run)
+    assert _wait(store, job.job_id)["result"]["response"] == "EMMA"
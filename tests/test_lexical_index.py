@@ -0,0 +1,94 @@
+import pytest
+
+from book_store import BookDocStore
+from lexical_index import BM25Index, fuse_rankings, tokenize
+
+BOOKS = [
+    ("Outrageously Alice", "Phyllis Reynolds Naylor"),
+    ("Alice", "Someone Else"),
+    ("Dune", "Frank Herbert"),
+    ("Dune Messiah", "Frank Herbert"),
+    ("Good Omens: The Nice and Accurate Prophecies of Agnes Nutter, Witch", "['Terry Pratchett', 'Neil Gaiman']"),
+    ("The Hobbit", "J. R. R. Tolkien"),
+    ("Time Travel", "James Gleick"),
+    ("The Civil War", "Shelby Foote"),
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    store = BookDocStore.from_rows(
+        {"title": title, "authors": authors, "description": f"About {title}."} for title, authors in BOOKS
+    )
+    return BM25Index.from_book_store(store)
+
+
+def _named(index, query, excluded=None):
+    match = index.match_named_book(query, excluded)
+    return None if match is None else index.store.titles[match[0]]
+
+
+@pytest.mark.parametrize(
+    "query, title",
+    [
+        ("buy Outrageously Alice by Phyllis Reynolds Naylor", "Outrageously Alice"),
+        ("I would like to order outrageously alice", "Outrageously Alice"),
+        ("get me Dune by Frank Herbert", "Dune"),
+        ("I want Dune Messiah", "Dune Messiah"),
+        # The main title before the subtitle is enough.
+        ("please buy Good Omens", "Good Omens: The Nice and Accurate Prophecies of Agnes Nutter, Witch"),
+        ("a copy of the hobbit by tolkien please", "The Hobbit"),
+        # Titles that are also topics need a naming cue, quotes, an author or most of the query.
+        ("buy The Civil War", "The Civil War"),
+        ("order me a copy of the civil war", "The Civil War"),
+        ("the civil war", "The Civil War"),
+        ('I\'d love "Time Travel" for my dad', "Time Travel"),
+        ("time travel by gleick, the hardcover", "Time Travel"),
+    ],
+)
+def test_named_books_match(index, query, title):
+    assert _named(index, query) == title
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        # A book used as a reference is not the book to buy.
+        "something like Outrageously Alice",
+        "a book similar to Dune Messiah",
+        "fans of Good Omens would enjoy what?",
+        "anything but The Hobbit, after reading it twice",
+        # One-word titles also need an author's name.
+        "buy Dune",
+        "a copy of the hobbit please",
+        # Title words that are not the title as a phrase.
+        "alice was outrageously funny",
+        "a hobbit story",
+        "recommend a fantasy book",
+        # Descriptive prompts whose topic is some book's title.
+        "I want a science fiction novel about time travel under 300 pages",
+        "Recommend a gripping history of the civil war",
+        "order a history of the civil war",
+    ],
+)
+def test_other_prompts_do_not_match(index, query):
+    assert _named(index, query) is None
+
+
+def test_excluded_titles_do_not_match(index):
+    assert _named(index, "buy Dune Messiah", excluded={"dune messiah"}) is None
+    assert _named(index, "get Dune Messiah by Frank Herbert", excluded={"dune messiah"}) == "Dune"
+
+
+def test_search_ranks_title_and_author_terms(index):
+    titles = [index.store.titles[row] for row, _ in index.search("frank herbert dune messiah", k=3)]
+    assert titles[:2] == ["Dune Messiah", "Dune"]
+    assert index.search("the of and") == []
+    assert tokenize("J. R. R. Tolkien's") == ["j", "r", "r", "tolkien", "s"]
+
+
+def test_fuse_rankings_rewards_agreement():
+    fused = fuse_rankings([(["a", "b", "c"], 1.0), (["b", "d"], 1.0)], k=3)
+    assert fused[0] == "b"
+    assert set(fused) <= {"a", "b", "c", "d"} and len(fused) == 3
+    assert fuse_rankings([(["a"], 1.0), (["z"], 2.0)], k=1) == ["z"]
@@ -0,0 +1,213 @@
+import numpy as np
+import pytest
+
+from local_index import LocalVectorIndex, matches_filter
+
+METADATA = {"title": "Dune", "bookLength": 412, "publishedYear": 1965, "categories": ["Fiction", "Science"]}
+
+
+@pytest.mark.parametrize(
+    "metadata_filter, expected",
+    [
+        (None, True),
+        ({}, True),
+        ({"title": "Dune"}, True),
+        ({"title": {"$eq": "Emma"}}, False),
+        ({"title": {"$ne": "Dune"}}, False),
+        ({"title": {"$in": ["Emma", "Dune"]}}, True),
+        ({"title": {"$nin": ["Dune"]}}, False),
+        # List fields match $in / $nin on any element.
+        ({"categories": {"$in": ["Science"]}}, True),
+        ({"categories": {"$in": ["History"]}}, False),
+        ({"categories": {"$nin": ["Romance", "Horror"]}}, True),
+        ({"categories": {"$nin": ["Fiction"]}}, False),
+        ({"bookLength": {"$gte": 412, "$lte": 500}}, True),
+        ({"bookLength": {"$gt": 412}}, False),
+        ({"bookLength": {"$lt": 412}}, False),
+        ({"publishedYear": {"$gte": 1960}, "bookLength": {"$lte": 300}}, False),
+        # Range conditions on a missing field never match.
+        ({"rating": {"$gte": 0}}, False),
+        ({"$and": [{"bookLength": {"$gte": 400}}, {"publishedYear": {"$lt": 1970}}]}, True),
+        ({"$and": [{"bookLength": {"$gte": 400}}, {"publishedYear": {"$gt": 1970}}]}, False),
+        ({"$or": [{"title": "Emma"}, {"publishedYear": 1965}]}, True),
+        ({"$or": [{"title": "Emma"}, {"publishedYear": 2000}]}, False),
+    ],
+)
+def test_matches_filter(metadata_filter, expected):
+    assert matches_filter(METADATA, metadata_filter) is expected
+
+
+def _index(quantization: str = "none", ivf_lists: int = 0) -> LocalVectorIndex:
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(200, 64)).astype(np.float32)
+    # Two chunks per book.
+    metadatas = [{"title": f"Book {row // 2}", "bookLength": 100 + row} for row in range(len(vectors))]
+    return LocalVectorIndex.build(vectors, [f"chunk {row}" for row in range(len(vectors))], metadatas, quantization, ivf_lists)
+
+
+def test_split_filter_turns_title_conditions_into_rows():
+    index = _index()
+    excluded, allowed, predicate = index._split_filter(
+        {"title": {"$nin": ["Book 1", "Unknown"]}, "bookLength": {"$gte": 150}}
+    )
+    assert sorted(excluded) == [2, 3]
+    assert allowed is None
+    assert predicate({"bookLength": 150}) and not predicate({"bookLength": 149})
+
+
+def test_split_filter_keeps_other_conditions_as_predicate():
+    index = _index()
+    assert index._split_filter(None) == ([], None, None)
+
+    excluded, allowed, predicate = index._split_filter({"title": {"$nin": ["Book 1"]}})
+    assert sorted(excluded) == [2, 3] and allowed is None and predicate is None
+
+    # Other title operators stay in the per-candidate predicate.
+    excluded, allowed, predicate = index._split_filter({"title": {"$eq": "Book 1"}})
+    assert excluded == [] and allowed is None
+    assert predicate({"title": "Book 1"}) and not predicate({"title": "Book 2"})
+
+
+@pytest.mark.parametrize("quantization", ["none", "int8", "pq"])
+def test_search_returns_the_nearest_rows(quantization):
+    index = _index(quantization)
+    query = index.vectors[7] + 0.01
+    exact = np.argsort(-(index.vectors @ (query / np.linalg.norm(query))))[:3]
+
+    found = index.search(query.tolist(), k=3)
+    assert found[0][0] == 7
+    if quantization != "pq":
+        assert [row for row, _ in found] == exact.tolist()
+    assert [s for _, s in found] == sorted((s for _, s in found), reverse=True)
+
+
+def test_search_applies_exclusions_and_filters():
+    index = _index("int8")
+    query = index.vectors[7].tolist()
+
+    found = index.search(query, k=5, metadata_filter={"title": {"$nin": ["Book 3"]}, "bookLength": {"$lte": 199}})
+    rows = [row for row, _ in found]
+    assert len(rows) == 5
+    assert 6 not in rows and 7 not in rows
+    assert all(index.metadatas[row]["bookLength"] <= 199 for row in rows)
+
+
+def test_search_with_no_results_wanted():
+    assert _index().search([1.0] * 64, k=0) == []
+
+
+def test_ivf_search_with_all_lists_probed_is_exact():
+    index = _index("none", ivf_lists=8)
+    assert index.ivf.lists == 8
+    assert sorted(index.ivf.order.tolist()) == list(range(len(index)))
+
+    query = index.vectors[11].tolist()
+    assert index.search(query, k=5, nprobe=8) == _index().search(query, k=5)
+    assert index.search(query, k=1, nprobe=1)[0][0] == 11
+
+
+def test_ivf_search_widens_the_probe_when_filters_leave_too_few_rows():
+    index = _index("int8", ivf_lists=8)
+    query = index.vectors[11].tolist()
+    found = index.search(query, k=10, metadata_filter={"bookLength": {"$gte": 290}}, nprobe=1)
+    assert len(found) == 10
+    assert all(index.metadatas[row]["bookLength"] >= 290 for row, _ in found)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = _index("int8", ivf_lists=8)
+    index.save(str(tmp_path))
+    loaded = LocalVectorIndex.load(str(tmp_path), quantization="int8", ivf_lists="8")
+
+    assert len(loaded) == len(index)
+    assert loaded.metadatas == index.metadatas
+    assert loaded.ivf.lists == 8
+    query = index.vectors[3].tolist()
+    assert loaded.search(query, k=4) == index.search(query, k=4)
+
+
+def test_split_filter_turns_title_in_into_allowed_rows():
+    index = _index()
+    excluded, allowed, predicate = index._split_filter(
+        {"title": {"$in": ["Book 2", "Book 0", "Unknown"], "$nin": ["Book 0"]}}
+    )
+    assert sorted(excluded) == [0, 1]
+    assert allowed.tolist() == [0, 1, 4, 5]
+    assert predicate is None
+
+    _, allowed, _ = index._split_filter({"title": {"$in": ["Unknown"]}})
+    assert allowed.tolist() == []
+
+
+@pytest.mark.parametrize("quantization, ivf_lists", [("none", 0), ("int8", 0), ("int8", 8)])
+def test_search_scores_only_the_allowed_titles(quantization, ivf_lists):
+    index = _index(quantization, ivf_lists)
+    query = index.vectors[50].tolist()
+
+    found = index.search(query, k=10, metadata_filter={"title": {"$in": ["Book 3", "Book 40"]}})
+    assert sorted(row for row, _ in found) == [6, 7, 80, 81]
+    found = index.search(query, k=10, metadata_filter={"title": {"$in": ["Book 3", "Book 40"], "$nin": ["Book 40"]}})
+    assert sorted(row for row, _ in found) == [6, 7]
+    assert index.search(query, k=10, metadata_filter={"title": {"$in": ["Unknown"]}}) == []
+
+
+def _random_index(rows: int, seed: int, quantization: str = "int8", ivf_lists: int = 0) -> LocalVectorIndex:
+    vectors = np.random.default_rng(seed).normal(size=(rows, 64)).astype(np.float32)
+    metadatas = [{"title": f"Book {row}"} for row in range(rows)]
+    return LocalVectorIndex.build(vectors, ["chunk"] * rows, metadatas, quantization, ivf_lists)
+
+
+@pytest.mark.parametrize("rows", [100, 200])
+def test_rebuild_retrains_quantizer_codes_of_the_old_build(tmp_path, rows):
+    _random_index(200, seed=1).save(str(tmp_path))
+    # A worker trains and saves PQ codes for the first build.
+    LocalVectorIndex.load(str(tmp_path), quantization="pq", ivf_lists="0")
+    assert (tmp_path / "pq.npz").exists()
+
+    rebuilt = _random_index(rows, seed=2)
+    rebuilt.save(str(tmp_path))
+    assert not (tmp_path / "pq.npz").exists()
+
+    for quantization in ("int8", "pq", "pq"):
+        loaded = LocalVectorIndex.load(str(tmp_path), quantization=quantization, ivf_lists="0")
+        assert len(loaded.quantizer.codes) == rows
+        query = rebuilt.vectors[rows - 1].tolist()
+        assert loaded.search(query, k=1)[0][0] == rows - 1
+
+
+def test_codes_of_other_vectors_are_not_reused(tmp_path):
+    index = _random_index(100, seed=1)
+    index.save(str(tmp_path))
+    # Codes left by a build whose save() did not clean up (or an older version).
+    stale = _random_index(100, seed=2)
+    stale.fingerprint = "other build"
+    stale._save_quantizer(str(tmp_path))
+
+    loaded = LocalVectorIndex.load(str(tmp_path), quantization="int8", ivf_lists="0")
+    assert np.array_equal(loaded.quantizer.codes, index.quantizer.codes)
+
+
+def test_rebuild_then_search_does_not_reuse_old_ivf_lists(tmp_path):
+    _random_index(200, seed=1, ivf_lists=8).save(str(tmp_path))
+    # The smaller rebuild has no IVF lists of its own; workers still ask for 8.
+    rebuilt = _random_index(100, seed=2)
+    rebuilt.save(str(tmp_path))
+
+    loaded = LocalVectorIndex.load(str(tmp_path), quantization="int8", ivf_lists="8")
+    assert sorted(loaded.ivf.order.tolist()) == list(range(100))
+    query = rebuilt.vectors[99].tolist()
+    assert loaded.search(query, k=5, nprobe=8)[0][0] == 99
+
+
+def test_rebuild_without_ivf_removes_the_old_lists(tmp_path):
+    _random_index(200, seed=1, ivf_lists=8).save(str(tmp_path))
+    _random_index(100, seed=2).save(str(tmp_path))
+    assert not (tmp_path / "ivf.npz").exists()
+
+    # An IVF file trained on other vectors (same row count) is retrained, not reused.
+    stale = _random_index(100, seed=3, ivf_lists=4)
+    stale.fingerprint = "other build"
+    stale._save_ivf(str(tmp_path))
+    loaded = LocalVectorIndex.load(str(tmp_path), quantization="none", ivf_lists="4")
+    assert not np.array_equal(loaded.ivf.centroids, stale.ivf.centroids)
+    assert loaded.search(loaded.vectors[42].tolist(), k=1, nprobe=4)[0][0] == 42
@@ -0,0 +1,59 @@
+import numpy as np
+
+from constraints import Constraints
+from preranker import UNKNOWN_FIT, _min_max, prerank, range_fit
+
+
+def _books(n):
+    return [{"title": f"Book {i}", "bookLength": 300, "publishedDate": "2000", "categories": ["Fiction"]} for i in range(n)]
+
+
+def test_min_max_scales_and_zeroes_missing():
+    assert _min_max(np.array([1.0, 3.0, np.nan])).tolist() == [0.0, 1.0, 0.0]
+    assert _min_max(np.array([2.0, 2.0])).tolist() == [1.0, 1.0]
+    assert _min_max(np.array([np.nan])).tolist() == [0.0]
+
+
+def test_range_fit_decays_outside_the_range():
+    fit = range_fit(np.array([150.0, 300.0, 400.0, np.nan]), 200, 300, 100.0)
+    assert fit[1] == 1.0
+    assert np.isclose(fit[0], np.exp(-0.5))
+    assert np.isclose(fit[2], np.exp(-1.0))
+    assert fit[3] == UNKNOWN_FIT
+    assert range_fit(np.array([1.0, np.nan]), None, None, 1.0).tolist() == [1.0, 1.0]
+
+
+def test_relevance_orders_otherwise_equal_books():
+    ranked = prerank(_books(3), [0.2, 0.9, 0.5], None, Constraints(), [None] * 3)
+    assert [i for i, _ in ranked] == [1, 2, 0]
+
+
+def test_ties_keep_retrieval_order_and_top_n_cuts():
+    ranked = prerank(_books(4), [0.5] * 4, None, Constraints(), [None] * 4, top_n=2)
+    assert [i for i, _ in ranked] == [0, 1]
+    assert prerank([], [], None, Constraints(), []) == []
+
+
+def test_constraint_fit_category_and_reviews_break_relevance_ties():
+    books = _books(4)
+    books[0]["bookLength"] = 900
+    books[1]["categories"] = ["History"]
+    books[3]["bookLength"] = None
+    c = Constraints()
+    c.max_pages = 400
+    c.categories = ["History"]
+
+    ranked = prerank(books, [0.5] * 4, None, c, [None, None, 5.0, None])
+    # In-range history book, then the well-reviewed one, unknown length, far too long.
+    assert [i for i, _ in ranked] == [1, 2, 3, 0]
+
+
+def test_preference_similarity_counts():
+    ranked = prerank(_books(2), [0.5, 0.5], [0.1, 0.8], Constraints(), [None, None])
+    assert [i for i, _ in ranked] == [1, 0]
+
+
+def test_custom_weights():
+    weights = {"relevance": 0.0, "preference": 0.0, "length": 0.0, "year": 0.0, "category": 0.0, "reviews": 1.0}
+    ranked = prerank(_books(2), [0.9, 0.1], None, Constraints(), [1.0, 4.0], weights=weights)
+    assert [i for i, _ in ranked] == [1, 0]
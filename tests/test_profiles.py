@@ -0,0 +1,78 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from mock_retailer import profiles
+from mock_retailer.compact_catalog import CompactCatalog
+from mock_retailer.profiles import ShopProfile
+
+
+@pytest.fixture
+def shared_file(tmp_path, monkeypatch):
+    path = tmp_path / "profiles.json"
+    monkeypatch.setattr(profiles, "PROFILES", {})
+    monkeypatch.setattr(profiles, "PROFILES_FILE", str(path))
+    monkeypatch.setattr(profiles, "_profiles_file_version", None)
+    return path
+
+
+def _other_worker(monkeypatch):
+    # A worker that has not seen the change yet.
+    monkeypatch.setattr(profiles, "PROFILES", {})
+    monkeypatch.setattr(profiles, "_profiles_file_version", None)
+
+
+def test_profiles_set_in_one_worker_reach_the_others(shared_file, monkeypatch):
+    profiles.set_profile("shop", ShopProfile(latency="const:5"))
+    profiles.set_profile("*", ShopProfile(error_rate=0.5))
+    assert profiles.get_profile("other").error_rate == 0.5
+
+    _other_worker(monkeypatch)
+    profiles.refresh_profiles()
+    assert profiles.get_profile("shop").latency == "const:5"
+
+    profiles.set_profile("shop", None)
+    _other_worker(monkeypatch)
+    profiles.refresh_profiles()
+    assert set(profiles.PROFILES) == {"*"}
+
+
+def test_profiles_of_an_earlier_server_are_ignored(shared_file, monkeypatch):
+    shared_file.write_text(json.dumps({"server": "earlier", "profiles": {"shop": {"error_rate": 1.0}}}))
+    profiles.PROFILES["shop"] = ShopProfile(latency="const:1")
+
+    profiles.refresh_profiles()
+    assert profiles.get_profile("shop").latency == "const:1"
+
+    # The first change of this server replaces the old file.
+    profiles.set_profile("other", ShopProfile())
+    assert set(json.loads(shared_file.read_text())["profiles"]) == {"shop", "other"}
+    assert profiles.get_profile("shop").error_rate == 0.0
+
+
+@pytest.fixture
+def client(retailer, shared_file, monkeypatch):
+    monkeypatch.setattr(retailer, "CATALOGS", {"test_shop": CompactCatalog.from_rows([("Dune", 9.99, 1, "Fiction")])})
+    return TestClient(retailer.app)
+
+
+def test_admin_endpoints_are_off_without_a_token(retailer, client, monkeypatch):
+    monkeypatch.setattr(retailer, "ADMIN_TOKEN", "")
+    assert client.post("/admin/restock").status_code == 404
+    assert client.put("/admin/profiles/test_shop", json={}, headers={"X-Admin-Token": ""}).status_code == 404
+
+
+def test_admin_endpoints_require_the_token(retailer, client, monkeypatch):
+    monkeypatch.setattr(retailer, "ADMIN_TOKEN", "secret")
+    assert client.post("/admin/restock").status_code == 401
+    assert client.post("/admin/restock", headers={"X-Admin-Token": "wrong"}).status_code == 401
+
+    headers = {"X-Admin-Token": "secret"}
+    assert client.post("/admin/restock", headers=headers).json() == {"shops": ["test_shop"]}
+    res = client.put("/admin/profiles/test_shop", json={"latency": "const:1"}, headers=headers)
+    assert res.status_code == 200
+    assert client.get("/admin/profiles", headers=headers).json()["test_shop"]["latency"] == "const:1"
+    assert client.put("/admin/profiles/unknown", json={}, headers=headers).status_code == 404
+    assert client.delete("/admin/profiles/test_shop", headers=headers).status_code == 200
+    assert client.get("/admin/profiles", headers=headers).json() == {}
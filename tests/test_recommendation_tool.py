@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+import recommendation_tool
+from local_index import LocalVectorIndex, LocalVectorStore
+
+
+class _FixedEmbedding:
+    def __init__(self, vector):
+        self.vector = vector
+
+    def embed_query(self, text):
+        return self.vector
+
+
+@pytest.fixture
+def store(monkeypatch):
+    rng = np.random.default_rng(0)
+    preference = np.zeros(32, dtype=np.float32)
+    preference[0] = 1.0
+    # "Crowded" has many chunks close to the preferences; the others one weaker chunk each.
+    vectors, metadatas = [], []
+    for _ in range(30):
+        vectors.append(preference + 0.05 * rng.normal(size=32))
+        metadatas.append({"title": "Crowded"})
+    for i, title in enumerate(["Near", "Far"]):
+        vectors.append(preference * (0.5 - 0.4 * i) + rng.normal(size=32))
+        metadatas.append({"title": title})
+    vectors.append(rng.normal(size=32))
+    metadatas.append({"title": "Not a candidate"})
+
+    index = LocalVectorIndex.build(vectors, ["chunk"] * len(vectors), metadatas, quantization="none", ivf_lists=0)
+    store = LocalVectorStore(index, _FixedEmbedding(preference.tolist()))
+    monkeypatch.setattr(recommendation_tool, "get_vector_store", lambda: store)
+    monkeypatch.setattr(recommendation_tool, "embed_text", lambda s, text: s.embeddings.embed_query(text))
+    return store
+
+
+def test_preference_scores_cover_titles_crowded_out_by_other_chunks(store):
+    scores = recommendation_tool.preference_scores(["Near", "Crowded", "Far", "Missing"], ["likes: sea stories"])
+    assert scores[1] > 0.9
+    assert scores[0] is not None and scores[2] is not None
+    assert scores[3] is None
+
+
+def test_preference_scores_without_preferences(store):
+    assert recommendation_tool.preference_scores(["Near"], None) is None
+    assert recommendation_tool.preference_scores([], ["likes: sea stories"]) is None
@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+
+from mock_retailer.sharding import ShardedCatalogService
+
+ROWS = [(f"Book {i}", 1.0 + i, 2, "Fiction") for i in range(50)] + [("Dune", 9.99, 25, "Fiction")]
+
+
+@pytest.fixture(scope="module")
+def service():
+    service = ShardedCatalogService({"shop": lambda: iter(ROWS), "other": lambda: iter(ROWS[:3])}, shards=3)
+    yield service
+    service.close()
+
+
+@pytest.fixture
+def catalog(service):
+    catalog = service.catalog("shop")
+    catalog.reset_stock()
+    return catalog
+
+
+def test_rows_are_partitioned_by_title_hash(service, catalog):
+    assert len(catalog) == len(ROWS)
+    assert len(service.catalog("other")) == 3
+    assert sorted(catalog) == sorted(title.lower() for title, *_ in ROWS)
+
+
+def test_lookups(catalog):
+    assert catalog["dune"].to_dict() == {
+        "Title": "Dune", "price": 9.99, "stock": True, "categories": "Fiction", "quantity": 25,
+    }
+    assert catalog.get("unknown") is None
+    assert "book 7" in catalog and "unknown" not in catalog
+    assert set(catalog.get_many(["book 1", "book 2", "unknown"])) == {"book 1", "book 2"}
+    with pytest.raises(KeyError):
+        catalog["unknown"]
+
+
+def test_stock_updates_and_restock(catalog):
+    assert catalog.decrement_stock("book 3") == 1
+    catalog.set_quantity("book 4", 0)
+    assert catalog["book 4"].stock is False
+    with pytest.raises(KeyError):
+        catalog.decrement_stock("unknown")
+
+    catalog.reset_stock()
+    assert catalog["book 3"].quantity == 2 and catalog["book 4"].quantity == 2
+
+
+def test_no_oversell_under_concurrent_threads(catalog):
+    barrier = threading.Barrier(8)
+    bought = []
+
+    def buyer():
+        barrier.wait()
+        bought.append(sum(catalog.decrement_stock("dune") is not None for _ in range(10)))
+
+    threads = [threading.Thread(target=buyer) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sum(bought) == 25
+    assert catalog["dune"].quantity == 0
@@ -0,0 +1,85 @@
+import shop_health
+from shop_health import CLOSED, HALF_OPEN, OPEN, ShopHealth
+
+
+def _fail(health: ShopHealth, times: int) -> None:
+    for _ in range(times):
+        assert health.allow_request()
+        health.record(False, 0.01)
+
+
+def _expire_open_period(health: ShopHealth) -> None:
+    health.opened_at -= shop_health.BREAKER_OPEN_SECONDS + 1
+
+
+def test_closed_until_min_requests():
+    health = ShopHealth("test-shop")
+    _fail(health, shop_health.BREAKER_MIN_REQUESTS - 1)
+    assert health.state == CLOSED
+    assert health.allow_request()
+
+
+def test_opens_at_failure_rate_and_skips_requests():
+    health = ShopHealth("test-shop")
+    _fail(health, shop_health.BREAKER_MIN_REQUESTS)
+    assert health.state == OPEN
+    assert not health.allow_request()
+
+
+def test_stays_closed_below_failure_rate():
+    health = ShopHealth("test-shop")
+    for i in range(shop_health.BREAKER_MIN_REQUESTS * 2):
+        health.record(i % 3 != 0, 0.01)
+    assert health.error_rate < shop_health.BREAKER_FAILURE_RATE
+    assert health.state == CLOSED
+
+
+def test_half_open_lets_a_single_probe_through():
+    health = ShopHealth("test-shop")
+    _fail(health, shop_health.BREAKER_MIN_REQUESTS)
+    _expire_open_period(health)
+
+    assert health.allow_request()
+    assert health.state == HALF_OPEN
+    assert not health.allow_request()
+
+
+def test_successful_probe_closes_and_resets_window():
+    health = ShopHealth("test-shop")
+    _fail(health, shop_health.BREAKER_MIN_REQUESTS)
+    _expire_open_period(health)
+
+    assert health.allow_request()
+    health.record(True, 0.01)
+    assert health.state == CLOSED
+    assert health.error_rate == 0.0
+    assert health.allow_request()
+
+
+def test_failed_probe_reopens():
+    health = ShopHealth("test-shop")
+    _fail(health, shop_health.BREAKER_MIN_REQUESTS)
+    _expire_open_period(health)
+
+    assert health.allow_request()
+    health.record(False, 0.01)
+    assert health.state == OPEN
+    assert not health.allow_request()
+
+
+def test_score_falls_with_errors_and_latency():
+    fast = ShopHealth("fast")
+    fast.record(True, 0.0)
+    slow = ShopHealth("slow")
+    slow.record(True, 1.0)
+    failing = ShopHealth("failing")
+    failing.record(True, 0.0)
+    failing.record(False, 0.0)
+
+    assert fast.score == 1.0
+    assert slow.score == 0.5
+    assert failing.score == 0.5
+
+
+def test_get_shop_health_is_shared_per_shop():
+    assert shop_health.get_shop_health("shared-shop") is shop_health.get_shop_health("shared-shop")
@@ -0,0 +1,107 @@
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+WAITERS = 4
+
+
+def _run_concurrently(flight: SingleFlight, fn, waiters: int = WAITERS):
+    """Start a leader blocked in fn, then waiters on the same key; returns (results, errors) per caller."""
+    results, errors = {}, {}
+
+    def caller(i):
+        try:
+            results[i] = flight.do("key", fn)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(waiters + 1)]
+    threads[0].start()
+    # The waiters must join while the leader's call is in flight.
+    deadline = time.monotonic() + 5
+    while "key" not in flight._calls and time.monotonic() < deadline:
+        time.sleep(0.001)
+    for t in threads[1:]:
+        t.start()
+    deadline = time.monotonic() + 5
+    while flight.key_stats()["key"]["shared"] < waiters and time.monotonic() < deadline:
+        time.sleep(0.001)
+    return threads, results, errors
+
+
+def test_concurrent_callers_share_one_execution():
+    release = threading.Event()
+    executions = []
+
+    def fn():
+        executions.append(1)
+        release.wait(5)
+        return {"offers": [1, 2]}
+
+    flight = SingleFlight("test")
+    threads, results, errors = _run_concurrently(flight, fn)
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert len(executions) == 1
+    assert not errors
+    assert all(r == {"offers": [1, 2]} for r in results.values()) and len(results) == WAITERS + 1
+    assert flight.key_stats()["key"] == {"executions": 1, "shared": WAITERS}
+
+
+def test_waiters_get_copies_of_the_result():
+    release = threading.Event()
+
+    def fn():
+        release.wait(5)
+        return {"offers": []}
+
+    flight = SingleFlight("test")
+    threads, results, _ = _run_concurrently(flight, fn, waiters=1)
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    results[1]["offers"].append("mutated")
+    assert results[0] == {"offers": []}
+
+
+def test_waiters_get_the_leaders_exception():
+    release = threading.Event()
+    executions = []
+
+    def fn():
+        executions.append(1)
+        release.wait(5)
+        raise ValueError("shop down")
+
+    flight = SingleFlight("test")
+    threads, results, errors = _run_concurrently(flight, fn)
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert len(executions) == 1
+    assert not results
+    assert len(errors) == WAITERS + 1
+    assert all(isinstance(e, ValueError) and str(e) == "shop down" for e in errors.values())
+
+
+def test_sequential_calls_execute_again():
+    def fail():
+        raise RuntimeError("boom")
+
+    flight = SingleFlight("test")
+    calls = []
+    assert flight.do("key", lambda: calls.append(1) or len(calls)) == 1
+    assert flight.do("key", lambda: calls.append(1) or len(calls)) == 2
+
+    with pytest.raises(RuntimeError):
+        flight.do("key", fail)
+    # A failed call does not stay in flight.
+    assert flight.do("key", lambda: "ok") == "ok"
+    assert flight.key_stats()["key"] == {"executions": 4, "shared": 0}
@@ -0,0 +1,114 @@
+import multiprocessing
+import threading
+
+import pytest
+
+from mock_retailer.compact_catalog import CompactCatalog
+from mock_retailer import shared_catalog
+from mock_retailer.shared_catalog import SharedCatalog, build_shared_catalog, fcntl, open_shared_catalog
+
+ROWS = [("Dune", 9.99, 25, "Fiction"), ("Emma", 4.5, 0, "Classics")]
+BUYERS = 16
+ATTEMPTS_PER_BUYER = 10
+
+
+@pytest.fixture(params=["compact", "shared"])
+def catalog(request, tmp_path):
+    if request.param == "compact":
+        return CompactCatalog.from_rows(ROWS)
+    path = str(tmp_path / "shop.bbcat")
+    build_shared_catalog(ROWS, path)
+    return SharedCatalog(path)
+
+
+def _buy_many(catalog, key: str, attempts: int) -> int:
+    return sum(catalog.decrement_stock(key) is not None for _ in range(attempts))
+
+
+def test_decrement_and_restock(catalog):
+    assert catalog.decrement_stock("dune") == 24
+    assert catalog.decrement_stock("dune", 24) == 0
+    assert catalog.decrement_stock("dune") is None
+    assert catalog["dune"].quantity == 0 and not catalog["dune"].stock
+    assert catalog.decrement_stock("emma") is None
+
+    catalog.reset_stock()
+    assert catalog["dune"].quantity == 25
+    with pytest.raises(KeyError):
+        catalog.decrement_stock("unknown title")
+
+
+def test_no_oversell_under_concurrent_threads(catalog):
+    barrier = threading.Barrier(BUYERS)
+    bought = []
+
+    def buyer():
+        barrier.wait()
+        bought.append(_buy_many(catalog, "dune", ATTEMPTS_PER_BUYER))
+
+    threads = [threading.Thread(target=buyer) for _ in range(BUYERS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sum(bought) == 25
+    assert catalog["dune"].quantity == 0
+
+
+def _process_buyer(path: str, start, results) -> None:
+    catalog = SharedCatalog(path)
+    start.wait()
+    results.put(_buy_many(catalog, "dune", ATTEMPTS_PER_BUYER))
+
+
+@pytest.mark.skipif(
+    fcntl is None or "fork" not in multiprocessing.get_all_start_methods(),
+    reason="needs byte-range locks and fork",
+)
+def test_shared_catalog_no_oversell_across_processes(tmp_path):
+    path = str(tmp_path / "shop.bbcat")
+    build_shared_catalog(ROWS, path)
+    ctx = multiprocessing.get_context("fork")
+    start = ctx.Event()
+    results = ctx.Queue()
+
+    workers = [ctx.Process(target=_process_buyer, args=(path, start, results)) for _ in range(4)]
+    for w in workers:
+        w.start()
+    start.set()
+    bought = sum(results.get(timeout=30) for _ in workers)
+    for w in workers:
+        w.join(30)
+
+    assert bought == 25
+    assert SharedCatalog(path)["dune"].quantity == 0
+
+
+def _open(tmp_path):
+    source = tmp_path / "shop.csv"
+    if not source.exists():
+        source.write_text("")
+    return open_shared_catalog(str(source), str(tmp_path / "shop.bbcat"), lambda: iter(ROWS))
+
+
+def _respawned_worker(tmp_path, results) -> None:
+    results.put(_open(tmp_path)["dune"].quantity)
+
+
+def test_stock_is_restored_once_per_server_start(tmp_path, monkeypatch):
+    _open(tmp_path).decrement_stock("dune", 5)
+    # Another worker (or a respawned one) of the same server keeps the stock.
+    assert _open(tmp_path)["dune"].quantity == 20
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("fork")
+        results = ctx.Queue()
+        worker = ctx.Process(target=_respawned_worker, args=(tmp_path, results))
+        worker.start()
+        assert results.get(timeout=30) == 20
+        worker.join(30)
+
+    # A new server starts from the catalog quantities.
+    monkeypatch.setattr(shared_catalog, "server_id", lambda: "next server")
+    assert _open(tmp_path)["dune"].quantity == 25
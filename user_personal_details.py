@@ -22,5 +22,5 @@ class UserPersonalDetails:
         self.payment_token = payment_token
 
     def initial_excluded_titles(self) -> List[str]:
-        """Combine disliked and already read books into one exclusion list."""
-        return list(set(self.disliked_titles + self.already_read_titles))
+        """Combine disliked and already read books into one exclusion list (stable order)."""
+        return list(dict.fromkeys(self.disliked_titles + self.already_read_titles))